@@ -0,0 +1,18 @@
+# dict_counting.py
+def histogram(n: int) -> dict[int, int]:
+    counts = {}
+    for i in range(n):
+        key = (i * 7919) % 1009
+        if key in counts:
+            counts[key] += 1
+        else:
+            counts[key] = 1
+    return counts
+
+
+def bench() -> int:
+    counts = histogram(500000)
+    best = 0
+    for key in counts:
+        best = max(best, counts[key] * key)
+    return best
@@ -0,0 +1,20 @@
+# json_records.py
+import json
+
+
+def make_document(n: int) -> str:
+    text = "["
+    for i in range(n):
+        if i > 0:
+            text += ","
+        text += f'{{"id": {i}, "score": {i % 97}, "name": "user{i}"}}'
+    return text + "]"
+
+
+def bench() -> int:
+    records = json.loads(make_document(50000))
+    total = 0
+    for record in records:
+        score: int = record["score"]
+        total += score
+    return total
@@ -0,0 +1,20 @@
+# list_work.py
+def count_primes(n: int) -> int:
+    flags = []
+    for i in range(n + 1):
+        flags.append(True)
+    count = 0
+    for i in range(2, n + 1):
+        if flags[i]:
+            count += 1
+            j = i * i
+            while j <= n:
+                flags[j] = False
+                j += i
+    return count
+
+
+def bench() -> float:
+    values = [i * 0.5 for i in range(300000)]
+    squares = [v * v for v in values]
+    return sum(squares) / len(squares) + count_primes(300000)
@@ -0,0 +1,17 @@
+# numeric_loops.py
+def collatz_steps(n: int) -> int:
+    steps = 0
+    while n != 1:
+        if n % 2 == 0:
+            n = n // 2
+        else:
+            n = 3 * n + 1
+        steps += 1
+    return steps
+
+
+def bench() -> int:
+    total = 0
+    for i in range(1, 40000):
+        total += collatz_steps(i)
+    return total
@@ -0,0 +1,22 @@
+# string_building.py
+def fizzbuzz(n: int) -> str:
+    out = ""
+    for i in range(n):
+        if i % 15 == 0:
+            out += "FizzBuzz"
+        elif i % 3 == 0:
+            out += "Fizz"
+        elif i % 5 == 0:
+            out += "Buzz"
+        else:
+            out += str(i)
+        out += "\n"
+    return out
+
+
+def bench() -> int:
+    total = 0
+    for r in range(20):
+        text = fizzbuzz(20000 + r)
+        total += len(text)
+    return total
@@ -0,0 +1,452 @@
+#ifndef JSON_SELECT_HPP
+#define JSON_SELECT_HPP
+
+#include <cstddef>
+#include <cstdint>
+#include <initializer_list>
+#include <stdexcept>
+#include <string>
+#include <type_traits>
+#include <unordered_map>
+#include <utility>
+#include <variant>
+#include <vector>
+
+#include "nlohmann/json.hpp"
+
+namespace json_select {
+
+// The parts of a document a function reads, given as JSON pointers in which
+// "*" stands for every item or member. The value at the end of a path is
+// kept whole. Containers on the way keep only the members leading to a
+// path, except that arrays keep every position (unread items become null)
+// so that indices stay valid.
+class Selection {
+public:
+    struct Node {
+        bool whole = false;
+        // Position of the path ending here, when `whole` is set.
+        std::size_t path = 0;
+        std::unordered_map<std::string, std::size_t> children;
+        // Index of the "*" child, or 0 when there is none.
+        std::size_t every = 0;
+    };
+
+    Selection(std::initializer_list<const char*> paths) : nodes_(1) {
+        for (const char* path : paths) {
+            add(path);
+        }
+    }
+
+    const Node* root() const {
+        return &nodes_[0];
+    }
+
+    const std::string& path(std::size_t index) const {
+        return paths_[index];
+    }
+
+    // Returns the selection of member or index `key` of a value selected by
+    // `parent`, or nullptr when it is not read. An exact key takes
+    // precedence over "*".
+    const Node* child(const Node* parent, const std::string& key) const {
+        if (parent->whole) {
+            return parent;
+        }
+        auto it = parent->children.find(key);
+        if (it == parent->children.end()) {
+            it = parent->children.find("*");
+        }
+        return it == parent->children.end() ? nullptr : &nodes_[it->second];
+    }
+
+    // Like child(), for the item at `index` of an array.
+    const Node* item(const Node* parent, std::size_t index) const {
+        if (parent->whole) {
+            return parent;
+        }
+        if (parent->children.size() == (parent->every != 0 ? 1 : 0)) {
+            // Only "*" (or nothing) is selected; skip formatting the index.
+            return parent->every != 0 ? &nodes_[parent->every] : nullptr;
+        }
+        return child(parent, std::to_string(index));
+    }
+
+private:
+    void add(const std::string& path) {
+        paths_.push_back(path);
+        std::size_t node = 0;
+        std::size_t start = 0;
+        while (start < path.size()) {
+            std::size_t end = path.find('/', start + 1);
+            std::string token = unescape(path.substr(start + 1, end == std::string::npos ? end : end - start - 1));
+            std::size_t next = nodes_.size();
+            std::size_t found = nodes_[node].children.emplace(std::move(token), next).first->second;
+            if (found == next) {
+                nodes_.emplace_back();
+                if (path.compare(start, end - start, "/*") == 0) {
+                    nodes_[node].every = found;
+                }
+            }
+            node = found;
+            start = end;
+        }
+        nodes_[node].whole = true;
+        nodes_[node].path = paths_.size() - 1;
+    }
+
+    static std::string unescape(const std::string& token) {
+        std::string result;
+        for (std::size_t i = 0; i < token.size(); ++i) {
+            if (token[i] == '~' && i + 1 < token.size()) {
+                result += token[++i] == '1' ? '/' : '~';
+            } else {
+                result += token[i];
+            }
+        }
+        return result;
+    }
+
+    std::vector<Node> nodes_;
+    std::vector<std::string> paths_;
+};
+
+// SAX handler that builds only the selected parts of a document. Values
+// outside the selection are tokenized but never materialized.
+class Extractor {
+public:
+    using json = nlohmann::json;
+
+    Extractor(const Selection& selection, json& result) : selection_(selection), result_(result) {}
+
+    bool null() {
+        return value(nullptr);
+    }
+
+    bool boolean(bool val) {
+        return value(val);
+    }
+
+    bool number_integer(json::number_integer_t val) {
+        return value(val);
+    }
+
+    bool number_unsigned(json::number_unsigned_t val) {
+        return value(val);
+    }
+
+    bool number_float(json::number_float_t val, const json::string_t&) {
+        return value(val);
+    }
+
+    bool string(json::string_t& val) {
+        return value(std::move(val));
+    }
+
+    bool binary(json::binary_t& val) {
+        return value(json::binary(std::move(val)));
+    }
+
+    bool start_object(std::size_t) {
+        return open(json::value_t::object);
+    }
+
+    bool start_array(std::size_t) {
+        return open(json::value_t::array);
+    }
+
+    bool key(json::string_t& val) {
+        if (skipped_ == 0) {
+            key_ = std::move(val);
+        }
+        return true;
+    }
+
+    bool end_object() {
+        return close();
+    }
+
+    bool end_array() {
+        return close();
+    }
+
+    template <typename Exception>
+    bool parse_error(std::size_t, const std::string&, const Exception& ex) {
+        throw ex;
+    }
+
+private:
+    struct Frame {
+        json* container;
+        const Selection::Node* node;
+        std::size_t index;
+    };
+
+    // Returns the selection of the value being read, or nullptr if unread.
+    const Selection::Node* next() {
+        if (stack_.empty()) {
+            return selection_.root();
+        }
+        Frame& top = stack_.back();
+        if (top.container->is_array()) {
+            return selection_.item(top.node, top.index++);
+        }
+        return selection_.child(top.node, key_);
+    }
+
+    json* place(json&& val) {
+        if (stack_.empty()) {
+            result_ = std::move(val);
+            return &result_;
+        }
+        json& container = *stack_.back().container;
+        if (container.is_array()) {
+            container.push_back(std::move(val));
+            return &container.back();
+        }
+        json& slot = container[key_];
+        slot = std::move(val);
+        return &slot;
+    }
+
+    bool in_array() const {
+        return !stack_.empty() && stack_.back().container->is_array();
+    }
+
+    template <typename T>
+    bool value(T&& val) {
+        if (skipped_ > 0) {
+            return true;
+        }
+        if (next() != nullptr) {
+            place(json(std::forward<T>(val)));
+        } else if (in_array()) {
+            place(json());
+        }
+        return true;
+    }
+
+    bool open(json::value_t type) {
+        if (skipped_ > 0) {
+            ++skipped_;
+            return true;
+        }
+        const Selection::Node* node = next();
+        if (node == nullptr) {
+            if (in_array()) {
+                place(json());
+            }
+            skipped_ = 1;
+            return true;
+        }
+        stack_.push_back({place(json(type)), node, 0});
+        return true;
+    }
+
+    bool close() {
+        if (skipped_ > 0) {
+            --skipped_;
+        } else {
+            stack_.pop_back();
+        }
+        return true;
+    }
+
+    const Selection& selection_;
+    json& result_;
+    std::vector<Frame> stack_;
+    std::string key_;
+    // Depth inside a container that is not read, or 0.
+    std::size_t skipped_ = 0;
+};
+
+// Parses `input` like nlohmann::json::parse, keeping only `selection`.
+template <typename Input>
+nlohmann::json parse(Input&& input, const Selection& selection) {
+    nlohmann::json result;
+    Extractor extractor(selection, result);
+    nlohmann::json::sax_parse(std::forward<Input>(input), &extractor);
+    return result;
+}
+
+// Member of a generated struct that receives the scalar at one path of a
+// Selection. Fields are listed in the order of the selection's paths.
+template <typename Record>
+using Field = std::variant<bool Record::*, int64_t Record::*, double Record::*, std::string Record::*>;
+
+template <typename Record>
+using Fields = std::vector<Field<Record>>;
+
+// SAX handler that stores the scalar at each selected path straight into
+// its field of `record`, without building any DOM nodes. Values convert as
+// nlohmann::json::get would: numbers and booleans to either number type,
+// and otherwise only to a field of their own type.
+template <typename Record>
+class Filler {
+public:
+    using json = nlohmann::json;
+
+    Filler(const Selection& selection, const Fields<Record>& fields, Record& record)
+        : selection_(selection), fields_(fields), record_(record), found_(fields.size(), false) {}
+
+    bool null() {
+        return value(nullptr);
+    }
+
+    bool boolean(bool val) {
+        return value(val);
+    }
+
+    bool number_integer(json::number_integer_t val) {
+        return value(val);
+    }
+
+    bool number_unsigned(json::number_unsigned_t val) {
+        return value(val);
+    }
+
+    bool number_float(json::number_float_t val, const json::string_t&) {
+        return value(val);
+    }
+
+    bool string(json::string_t& val) {
+        return value(std::move(val));
+    }
+
+    bool binary(json::binary_t&) {
+        return value(nullptr);
+    }
+
+    bool start_object(std::size_t) {
+        return open(false);
+    }
+
+    bool start_array(std::size_t) {
+        return open(true);
+    }
+
+    bool key(json::string_t& val) {
+        if (skipped_ == 0) {
+            key_ = std::move(val);
+        }
+        return true;
+    }
+
+    bool end_object() {
+        return close();
+    }
+
+    bool end_array() {
+        return close();
+    }
+
+    template <typename Exception>
+    bool parse_error(std::size_t, const std::string&, const Exception& ex) {
+        throw ex;
+    }
+
+    // Throws unless the document had a value at every selected path.
+    void finish() const {
+        for (std::size_t i = 0; i < found_.size(); ++i) {
+            if (!found_[i]) {
+                throw std::out_of_range("no JSON value at " + selection_.path(i));
+            }
+        }
+    }
+
+private:
+    struct Frame {
+        const Selection::Node* node;
+        bool array;
+        std::size_t index;
+    };
+
+    const Selection::Node* next() {
+        if (stack_.empty()) {
+            return selection_.root();
+        }
+        Frame& top = stack_.back();
+        if (top.array) {
+            return selection_.item(top.node, top.index++);
+        }
+        return selection_.child(top.node, key_);
+    }
+
+    [[noreturn]] void mismatch(const Selection::Node* node) const {
+        throw std::invalid_argument("JSON value at " + selection_.path(node->path) + " has the wrong type");
+    }
+
+    template <typename T>
+    bool value(T&& val) {
+        if (skipped_ > 0) {
+            return true;
+        }
+        const Selection::Node* node = next();
+        if (node == nullptr || !node->whole) {
+            return true;
+        }
+        using Value = std::decay_t<T>;
+        std::visit([&](auto member) {
+            using Target = std::remove_reference_t<decltype(record_.*member)>;
+            if constexpr (std::is_arithmetic_v<Target> && !std::is_same_v<Target, bool>
+                          && std::is_arithmetic_v<Value>) {
+                record_.*member = static_cast<Target>(val);
+            } else if constexpr (std::is_same_v<Target, Value>) {
+                record_.*member = std::forward<T>(val);
+            } else {
+                mismatch(node);
+            }
+        }, fields_[node->path]);
+        found_[node->path] = true;
+        return true;
+    }
+
+    bool open(bool array) {
+        if (skipped_ > 0) {
+            ++skipped_;
+            return true;
+        }
+        const Selection::Node* node = next();
+        if (node == nullptr) {
+            skipped_ = 1;
+            return true;
+        }
+        if (node->whole) {
+            mismatch(node);
+        }
+        stack_.push_back({node, array, 0});
+        return true;
+    }
+
+    bool close() {
+        if (skipped_ > 0) {
+            --skipped_;
+        } else {
+            stack_.pop_back();
+        }
+        return true;
+    }
+
+    const Selection& selection_;
+    const Fields<Record>& fields_;
+    Record& record_;
+    std::vector<bool> found_;
+    std::vector<Frame> stack_;
+    std::string key_;
+    std::size_t skipped_ = 0;
+};
+
+// Parses `input` into a Record whose `fields` hold the scalars at the paths
+// of `selection`, in order.
+template <typename Record, typename Input>
+Record extract(Input&& input, const Selection& selection, const Fields<Record>& fields) {
+    Record record{};
+    Filler<Record> filler(selection, fields, record);
+    nlohmann::json::sax_parse(std::forward<Input>(input), &filler);
+    filler.finish();
+    return record;
+}
+
+} // namespace json_select
+
+#endif // JSON_SELECT_HPP
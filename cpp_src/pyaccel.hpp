@@ -0,0 +1,165 @@
+#ifndef PYACCEL_HPP
+#define PYACCEL_HPP
+
+// Conversions between CPython objects and the native types of transpiled
+// functions, used by the wrappers that `python -m src.accelerate` generates.
+// Every from_python() overload returns false without setting a Python error
+// when the object does not fit, so the caller can fall back to the original
+// Python function.
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <cstdint>
+#include <cstring>
+#include <string>
+#include <type_traits>
+#include <vector>
+
+namespace pyaccel {
+
+inline bool from_python(PyObject* obj, int64_t& out) {
+    if (!PyLong_Check(obj)) {
+        return false;
+    }
+    int overflow = 0;
+    long long value = PyLong_AsLongLongAndOverflow(obj, &overflow);
+    if (overflow || (value == -1 && PyErr_Occurred())) {
+        PyErr_Clear();
+        return false;
+    }
+    out = value;
+    return true;
+}
+
+inline bool from_python(PyObject* obj, double& out) {
+    if (!PyFloat_Check(obj)) {
+        return false;
+    }
+    out = PyFloat_AS_DOUBLE(obj);
+    return true;
+}
+
+inline bool from_python(PyObject* obj, bool& out) {
+    if (!PyBool_Check(obj)) {
+        return false;
+    }
+    out = obj == Py_True;
+    return true;
+}
+
+// Only ASCII strings convert: for them bytes and code points coincide, so
+// len() and comparisons agree with Python.
+inline bool from_python(PyObject* obj, std::string& out) {
+    if (!PyUnicode_Check(obj) || !PyUnicode_IS_ASCII(obj)) {
+        return false;
+    }
+    Py_ssize_t size = 0;
+    const char* data = PyUnicode_AsUTF8AndSize(obj, &size);
+    if (data == nullptr) {
+        PyErr_Clear();
+        return false;
+    }
+    out.assign(data, static_cast<size_t>(size));
+    return true;
+}
+
+// Buffer format characters that describe T on this platform.
+template <typename T>
+bool matches_format(const char* format) {
+    if (format == nullptr) {
+        return false;
+    }
+    if (*format == '@' || *format == '=' || *format == '<') {
+        ++format;
+    }
+    if (format[0] == '\0' || format[1] != '\0') {
+        return false;
+    }
+    if constexpr (std::is_same_v<T, double>) {
+        return *format == 'd';
+    } else {
+        return (*format == 'q' || *format == 'l') && sizeof(T) == 8;
+    }
+}
+
+// Reads a contiguous one-dimensional buffer (array.array, numpy arrays,
+// memoryviews) of exactly T with a single memcpy instead of boxing and
+// unboxing every element.
+template <typename T>
+bool from_buffer(PyObject* obj, std::vector<T>& out) {
+    if (!PyObject_CheckBuffer(obj)) {
+        return false;
+    }
+    Py_buffer view;
+    if (PyObject_GetBuffer(obj, &view, PyBUF_ND | PyBUF_FORMAT) != 0) {
+        PyErr_Clear();
+        return false;
+    }
+    bool ok = view.ndim == 1 && view.itemsize == static_cast<Py_ssize_t>(sizeof(T)) &&
+              matches_format<T>(view.format);
+    if (ok) {
+        out.resize(static_cast<size_t>(view.len / view.itemsize));
+        if (!out.empty()) {
+            std::memcpy(out.data(), view.buf, static_cast<size_t>(view.len));
+        }
+    }
+    PyBuffer_Release(&view);
+    return ok;
+}
+
+template <typename T>
+bool from_python(PyObject* obj, std::vector<T>& out) {
+    if (PyList_Check(obj) || PyTuple_Check(obj)) {
+        Py_ssize_t size = PySequence_Fast_GET_SIZE(obj);
+        PyObject** items = PySequence_Fast_ITEMS(obj);
+        out.resize(static_cast<size_t>(size));
+        for (Py_ssize_t i = 0; i < size; ++i) {
+            if (!from_python(items[i], out[static_cast<size_t>(i)])) {
+                return false;
+            }
+        }
+        return true;
+    }
+    if constexpr (std::is_arithmetic_v<T>) {
+        return from_buffer(obj, out);
+    }
+    return false;
+}
+
+inline PyObject* to_python(int64_t value) {
+    return PyLong_FromLongLong(value);
+}
+
+inline PyObject* to_python(double value) {
+    return PyFloat_FromDouble(value);
+}
+
+inline PyObject* to_python(bool value) {
+    return PyBool_FromLong(value);
+}
+
+inline PyObject* to_python(const std::string& value) {
+    return PyUnicode_FromStringAndSize(value.data(), static_cast<Py_ssize_t>(value.size()));
+}
+
+template <typename T>
+PyObject* to_python(const std::vector<T>& values) {
+    PyObject* list = PyList_New(static_cast<Py_ssize_t>(values.size()));
+    if (list == nullptr) {
+        return nullptr;
+    }
+    for (size_t i = 0; i < values.size(); ++i) {
+        PyObject* item = to_python(values[i]);
+        if (item == nullptr) {
+            Py_DECREF(list);
+            return nullptr;
+        }
+        PyList_SET_ITEM(list, static_cast<Py_ssize_t>(i), item);
+    }
+    return list;
+}
+
+} // namespace pyaccel
+
+#endif // PYACCEL_HPP
@@ -0,0 +1,123 @@
+#ifndef PYJSON_HPP
+#define PYJSON_HPP
+
+// json.dumps() with Python's output format: ", " and ": " separators by
+// default, floats written like repr(), NaN and Infinity spelled out, and
+// non-ASCII characters escaped unless ensure_ascii is false.
+//
+// nlohmann::json keeps object members sorted by key, so objects come out
+// as with sort_keys=True.
+
+#include <charconv>
+#include <cmath>
+#include <cstddef>
+#include <string>
+
+#include "nlohmann/json.hpp"
+
+namespace pyjson {
+
+// Python's repr() of a float: the shortest digits that round-trip, in
+// positional notation unless the exponent is below -4 or above 15.
+inline std::string float_repr(double value) {
+    if (std::isnan(value)) {
+        return "NaN";
+    }
+    if (std::isinf(value)) {
+        return value > 0 ? "Infinity" : "-Infinity";
+    }
+    char buffer[32];
+    auto result = std::to_chars(buffer, buffer + sizeof(buffer), value, std::chars_format::scientific);
+    std::string text(buffer, result.ptr);
+    std::string sign;
+    if (text[0] == '-') {
+        sign = "-";
+        text.erase(0, 1);
+    }
+    std::size_t e = text.find('e');
+    int exponent = std::stoi(text.substr(e + 1));
+    std::string digits = text.substr(0, e);
+    if (digits.size() > 1) {
+        digits.erase(1, 1);
+    }
+    int point = exponent + 1;
+    if (point <= -4 || point > 16) {
+        std::string mantissa = digits.substr(0, 1);
+        if (digits.size() > 1) {
+            mantissa += "." + digits.substr(1);
+        }
+        std::string power = std::to_string(std::abs(exponent));
+        if (power.size() < 2) {
+            power = "0" + power;
+        }
+        return sign + mantissa + (exponent < 0 ? "e-" : "e+") + power;
+    }
+    if (point <= 0) {
+        return sign + "0." + std::string(static_cast<std::size_t>(-point), '0') + digits;
+    }
+    auto whole = static_cast<std::size_t>(point);
+    if (whole >= digits.size()) {
+        return sign + digits + std::string(whole - digits.size(), '0') + ".0";
+    }
+    return sign + digits.substr(0, whole) + "." + digits.substr(whole);
+}
+
+struct Format {
+    // Spaces per level, or -1 to write everything on one line.
+    int indent = -1;
+    std::string item_separator = ", ";
+    std::string key_separator = ": ";
+    bool ensure_ascii = true;
+};
+
+inline void write(std::string& out, const nlohmann::json& value, const Format& format, int level) {
+    switch (value.type()) {
+    case nlohmann::json::value_t::number_float:
+        out += float_repr(value.get<double>());
+        return;
+    case nlohmann::json::value_t::array:
+    case nlohmann::json::value_t::object: {
+        bool object = value.is_object();
+        if (value.empty()) {
+            out += object ? "{}" : "[]";
+            return;
+        }
+        std::string newline;
+        if (format.indent >= 0) {
+            newline = "\n" + std::string(static_cast<std::size_t>(format.indent * (level + 1)), ' ');
+        }
+        out += object ? '{' : '[';
+        out += newline;
+        bool first = true;
+        for (auto it = value.begin(); it != value.end(); ++it) {
+            if (!first) {
+                out += format.item_separator;
+                out += newline;
+            }
+            first = false;
+            if (object) {
+                out += nlohmann::json(it.key()).dump(-1, ' ', format.ensure_ascii);
+                out += format.key_separator;
+            }
+            write(out, *it, format, level + 1);
+        }
+        if (format.indent >= 0) {
+            out += "\n" + std::string(static_cast<std::size_t>(format.indent * level), ' ');
+        }
+        out += object ? '}' : ']';
+        return;
+    }
+    default:
+        out += value.dump(-1, ' ', format.ensure_ascii);
+    }
+}
+
+inline std::string dumps(const nlohmann::json& value, const Format& format = Format()) {
+    std::string out;
+    write(out, value, format, 0);
+    return out;
+}
+
+} // namespace pyjson
+
+#endif // PYJSON_HPP
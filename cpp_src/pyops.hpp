@@ -0,0 +1,370 @@
+#ifndef PYOPS_HPP
+#define PYOPS_HPP
+
+// Arithmetic with Python's semantics where C++ operators differ: `//` and
+// `%` round toward negative infinity rather than toward zero, and dividing
+// by zero raises instead of being undefined.
+//
+// The checked operations further down throw wherever Python would give a
+// result that int64_t cannot hold, or raise, so that accelerated functions
+// can hand such calls back to the interpreter.
+//
+// The str methods at the end work on the bytes of UTF-8 strings. Case
+// mapping and whitespace cover ASCII only; other characters are kept as is.
+
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <limits>
+#include <stdexcept>
+#include <string>
+#include <type_traits>
+#include <vector>
+
+namespace pyops {
+
+template <typename A, typename B>
+constexpr bool integral_operands = std::is_integral_v<A> && std::is_integral_v<B>;
+
+inline void check_divisor(double divisor) {
+    if (divisor == 0) {
+        throw std::domain_error("division by zero");
+    }
+}
+
+// Python's `a // b`.
+template <typename A, typename B>
+auto floordiv(A a, B b) {
+    if constexpr (integral_operands<A, B>) {
+        int64_t x = a;
+        int64_t y = b;
+        check_divisor(static_cast<double>(y));
+        if (x == std::numeric_limits<int64_t>::min() && y == -1) {
+            throw std::overflow_error("integer overflow");
+        }
+        int64_t q = x / y;
+        if (x % y != 0 && ((x < 0) != (y < 0))) {
+            --q;
+        }
+        return q;
+    } else {
+        // Same steps as CPython's float floor division, so results agree
+        // to the last bit.
+        double x = a;
+        double y = b;
+        check_divisor(y);
+        double mod = std::fmod(x, y);
+        double div = (x - mod) / y;
+        if (mod != 0 && ((y < 0) != (mod < 0))) {
+            div -= 1.0;
+        }
+        if (div == 0) {
+            return std::copysign(0.0, x / y);
+        }
+        double floordiv = std::floor(div);
+        if (div - floordiv > 0.5) {
+            floordiv += 1.0;
+        }
+        return floordiv;
+    }
+}
+
+// Python's `a % b`, which takes the sign of `b`.
+template <typename A, typename B>
+auto mod(A a, B b) {
+    if constexpr (integral_operands<A, B>) {
+        int64_t x = a;
+        int64_t y = b;
+        check_divisor(static_cast<double>(y));
+        if (y == -1) {
+            // INT64_MIN % -1 overflows in C++.
+            return int64_t{0};
+        }
+        int64_t r = x % y;
+        if (r != 0 && ((r < 0) != (y < 0))) {
+            r += y;
+        }
+        return r;
+    } else {
+        // Same steps as CPython's float remainder.
+        double x = a;
+        double y = b;
+        check_divisor(y);
+        double r = std::fmod(x, y);
+        if (r == 0) {
+            return std::copysign(0.0, y);
+        }
+        if ((y < 0) != (r < 0)) {
+            r += y;
+        }
+        return r;
+    }
+}
+
+template <typename A, typename B>
+auto add(A a, B b) {
+    if constexpr (integral_operands<A, B>) {
+        int64_t result;
+        if (__builtin_add_overflow(static_cast<int64_t>(a), static_cast<int64_t>(b), &result)) {
+            throw std::overflow_error("integer overflow");
+        }
+        return result;
+    } else {
+        return a + b;
+    }
+}
+
+template <typename A, typename B>
+auto sub(A a, B b) {
+    if constexpr (integral_operands<A, B>) {
+        int64_t result;
+        if (__builtin_sub_overflow(static_cast<int64_t>(a), static_cast<int64_t>(b), &result)) {
+            throw std::overflow_error("integer overflow");
+        }
+        return result;
+    } else {
+        return a - b;
+    }
+}
+
+template <typename A, typename B>
+auto mul(A a, B b) {
+    if constexpr (integral_operands<A, B>) {
+        int64_t result;
+        if (__builtin_mul_overflow(static_cast<int64_t>(a), static_cast<int64_t>(b), &result)) {
+            throw std::overflow_error("integer overflow");
+        }
+        return result;
+    } else {
+        return a * b;
+    }
+}
+
+inline int64_t neg(int64_t x) {
+    if (x == std::numeric_limits<int64_t>::min()) {
+        throw std::overflow_error("integer overflow");
+    }
+    return -x;
+}
+
+// Python's `a / b`. CPython divides ints exactly and rounds once, which
+// converting both to double first only matches below 2**53.
+template <typename A, typename B>
+double truediv(A a, B b) {
+    if constexpr (integral_operands<A, B>) {
+        constexpr int64_t exact = int64_t{1} << 53;
+        int64_t x = a;
+        int64_t y = b;
+        if (x > exact || x < -exact || y > exact || y < -exact) {
+            throw std::overflow_error("integer too large for exact division");
+        }
+    }
+    check_divisor(static_cast<double>(b));
+    return static_cast<double>(a) / static_cast<double>(b);
+}
+
+// `items[index]` with Python's negative indices and bounds check.
+template <typename Vector>
+decltype(auto) at(Vector& items, int64_t index) {
+    int64_t size = static_cast<int64_t>(items.size());
+    if (index < 0) {
+        index += size;
+    }
+    if (index < 0 || index >= size) {
+        throw std::out_of_range("list index out of range");
+    }
+    return items[static_cast<std::size_t>(index)];
+}
+
+// Held by every checked function while it runs. Throws past CPython's
+// default recursion limit, where the interpreter would stop with
+// RecursionError instead of recursing further.
+class CallDepth {
+public:
+    static constexpr int limit = 1000;
+
+    CallDepth() {
+        if (++depth() > limit) {
+            --depth();
+            throw std::overflow_error("maximum recursion depth exceeded");
+        }
+    }
+
+    ~CallDepth() {
+        --depth();
+    }
+
+    CallDepth(const CallDepth&) = delete;
+    CallDepth& operator=(const CallDepth&) = delete;
+
+private:
+    static int& depth() {
+        thread_local int value = 0;
+        return value;
+    }
+};
+
+inline bool is_space(char c) {
+    // The ASCII characters for which str.isspace() is true.
+    return c == ' ' || (c >= '\t' && c <= '\r') || (c >= '\x1c' && c <= '\x1f');
+}
+
+inline std::string upper(std::string s) {
+    for (char& c : s) {
+        if (c >= 'a' && c <= 'z') {
+            c = static_cast<char>(c - 'a' + 'A');
+        }
+    }
+    return s;
+}
+
+inline std::string lower(std::string s) {
+    for (char& c : s) {
+        if (c >= 'A' && c <= 'Z') {
+            c = static_cast<char>(c - 'A' + 'a');
+        }
+    }
+    return s;
+}
+
+// str.strip() and friends: `left` and `right` pick the ends to trim.
+inline std::string trim(const std::string& s, bool left, bool right) {
+    std::size_t begin = 0;
+    std::size_t end = s.size();
+    while (left && begin < end && is_space(s[begin])) {
+        ++begin;
+    }
+    while (right && end > begin && is_space(s[end - 1])) {
+        --end;
+    }
+    return s.substr(begin, end - begin);
+}
+
+inline std::string trim(const std::string& s, const std::string& chars, bool left, bool right) {
+    std::size_t begin = left ? s.find_first_not_of(chars) : 0;
+    if (begin == std::string::npos) {
+        return "";
+    }
+    std::size_t end = right ? s.find_last_not_of(chars) + 1 : s.size();
+    return s.substr(begin, end - begin);
+}
+
+inline std::string strip(const std::string& s) {
+    return trim(s, true, true);
+}
+
+inline std::string strip(const std::string& s, const std::string& chars) {
+    return trim(s, chars, true, true);
+}
+
+inline std::string lstrip(const std::string& s) {
+    return trim(s, true, false);
+}
+
+inline std::string lstrip(const std::string& s, const std::string& chars) {
+    return trim(s, chars, true, false);
+}
+
+inline std::string rstrip(const std::string& s) {
+    return trim(s, false, true);
+}
+
+inline std::string rstrip(const std::string& s, const std::string& chars) {
+    return trim(s, chars, false, true);
+}
+
+// str.split() without a separator: runs of whitespace separate words and
+// no empty strings are produced.
+inline std::vector<std::string> split(const std::string& s) {
+    std::vector<std::string> words;
+    std::size_t i = 0;
+    while (i < s.size()) {
+        while (i < s.size() && is_space(s[i])) {
+            ++i;
+        }
+        std::size_t start = i;
+        while (i < s.size() && !is_space(s[i])) {
+            ++i;
+        }
+        if (i > start) {
+            words.push_back(s.substr(start, i - start));
+        }
+    }
+    return words;
+}
+
+inline std::vector<std::string> split(const std::string& s, const std::string& sep) {
+    if (sep.empty()) {
+        throw std::invalid_argument("empty separator");
+    }
+    std::vector<std::string> parts;
+    std::size_t start = 0;
+    std::size_t found;
+    while ((found = s.find(sep, start)) != std::string::npos) {
+        parts.push_back(s.substr(start, found - start));
+        start = found + sep.size();
+    }
+    parts.push_back(s.substr(start));
+    return parts;
+}
+
+inline std::string join(const std::string& sep, const std::vector<std::string>& items) {
+    std::string result;
+    for (std::size_t i = 0; i < items.size(); ++i) {
+        if (i > 0) {
+            result += sep;
+        }
+        result += items[i];
+    }
+    return result;
+}
+
+inline std::string replace(const std::string& s, const std::string& old, const std::string& replacement) {
+    std::string result;
+    if (old.empty()) {
+        // Python inserts the replacement around every character.
+        for (char c : s) {
+            result += replacement;
+            result += c;
+        }
+        return result + replacement;
+    }
+    std::size_t start = 0;
+    std::size_t found;
+    while ((found = s.find(old, start)) != std::string::npos) {
+        result.append(s, start, found - start);
+        result += replacement;
+        start = found + old.size();
+    }
+    return result.append(s, start, std::string::npos);
+}
+
+inline bool startswith(const std::string& s, const std::string& prefix) {
+    return s.compare(0, prefix.size(), prefix) == 0;
+}
+
+inline bool endswith(const std::string& s, const std::string& suffix) {
+    return s.size() >= suffix.size() && s.compare(s.size() - suffix.size(), suffix.size(), suffix) == 0;
+}
+
+inline int64_t find(const std::string& s, const std::string& sub) {
+    std::size_t found = s.find(sub);
+    return found == std::string::npos ? -1 : static_cast<int64_t>(found);
+}
+
+// Non-overlapping occurrences; the empty string occurs between every
+// two characters and at both ends.
+inline int64_t count(const std::string& s, const std::string& sub) {
+    if (sub.empty()) {
+        return static_cast<int64_t>(s.size()) + 1;
+    }
+    int64_t n = 0;
+    for (std::size_t found = s.find(sub); found != std::string::npos; found = s.find(sub, found + sub.size())) {
+        ++n;
+    }
+    return n;
+}
+
+} // namespace pyops
+
+#endif // PYOPS_HPP
@@ -1,13 +1,285 @@
 #ifndef REQUESTS_HPP
 #define REQUESTS_HPP
 
+#include <algorithm>
+#include <atomic>
+#include <cctype>
+#include <cstddef>
+#include <cstdint>
+#include <exception>
+#include <initializer_list>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
 #include <cpr/cpr.h>
 #include "nlohmann/json.hpp"
 
 namespace requests {
 
-cpr::Response get(const std::string& url) {
-    return cpr::Get(cpr::Url{url});
+using Response = cpr::Response;
+
+// Key/value pairs accepted from dict literals, std::unordered_map or JSON
+// objects, used for query parameters, headers and form bodies.
+struct Pairs {
+    std::vector<std::pair<std::string, std::string>> items;
+
+    Pairs(std::initializer_list<std::pair<std::string, std::string>> pairs) : items(pairs) {}
+
+    template <typename Map>
+    explicit Pairs(const Map& map) {
+        for (const auto& [key, value] : map) {
+            items.emplace_back(key, value);
+        }
+    }
+
+    explicit Pairs(const nlohmann::json& object) {
+        for (const auto& [key, value] : object.items()) {
+            items.emplace_back(key, value.is_string() ? value.get<std::string>() : value.dump());
+        }
+    }
+};
+
+struct Params : Pairs { using Pairs::Pairs; };
+struct Headers : Pairs { using Pairs::Pairs; };
+struct Form : Pairs { using Pairs::Pairs; };
+
+struct Timeout {
+    explicit Timeout(double seconds_) : seconds(seconds_) {}
+    double seconds;
+};
+
+struct Body {
+    std::string text;
+};
+
+struct Json {
+    nlohmann::json value;
+};
+
+inline std::string url_encode(const std::string& text) {
+    static const char* digits = "0123456789ABCDEF";
+    std::string encoded;
+    for (unsigned char c : text) {
+        if (std::isalnum(c) || c == '-' || c == '_' || c == '.' || c == '~') {
+            encoded += static_cast<char>(c);
+        } else {
+            encoded += '%';
+            encoded += digits[c >> 4];
+            encoded += digits[c & 15];
+        }
+    }
+    return encoded;
+}
+
+// Everything a single request needs; built from the keyword arguments of
+// requests.get/post and applied to a pooled session.
+struct RequestOptions {
+    cpr::Parameters params;
+    cpr::Header headers;
+    std::int32_t timeout_ms = 0;
+    std::string body;
+    bool has_body = false;
+
+    void add(const Params& params_) {
+        for (const auto& [key, value] : params_.items) {
+            params.Add(cpr::Parameter{key, value});
+        }
+    }
+
+    void add(const Headers& headers_) {
+        for (const auto& [key, value] : headers_.items) {
+            headers[key] = value;
+        }
+    }
+
+    void add(const Timeout& timeout) {
+        timeout_ms = static_cast<std::int32_t>(timeout.seconds * 1000);
+    }
+
+    void add(const Body& body_) {
+        body = body_.text;
+        has_body = true;
+    }
+
+    void add(const Form& form) {
+        body.clear();
+        for (const auto& [key, value] : form.items) {
+            if (!body.empty()) {
+                body += '&';
+            }
+            body += url_encode(key) + '=' + url_encode(value);
+        }
+        headers.emplace("Content-Type", "application/x-www-form-urlencoded");
+        has_body = true;
+    }
+
+    void add(const Json& json) {
+        body = json.value.dump();
+        headers.emplace("Content-Type", "application/json");
+        has_body = true;
+    }
+};
+
+// Keeps idle sessions per scheme://host[:port] so that consecutive requests
+// to the same host reuse the underlying connection instead of paying for a
+// new TCP/TLS handshake.
+class SessionPool {
+public:
+    static SessionPool& instance() {
+        static SessionPool pool;
+        return pool;
+    }
+
+    void set_max_idle_per_host(std::size_t max_idle) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        max_idle_ = max_idle;
+    }
+
+    std::unique_ptr<cpr::Session> acquire(const std::string& host) {
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            auto& idle = idle_[host];
+            if (!idle.empty()) {
+                auto session = std::move(idle.back());
+                idle.pop_back();
+                return session;
+            }
+        }
+        return std::make_unique<cpr::Session>();
+    }
+
+    void release(const std::string& host, std::unique_ptr<cpr::Session> session) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        auto& idle = idle_[host];
+        if (idle.size() < max_idle_) {
+            idle.push_back(std::move(session));
+        }
+    }
+
+private:
+    std::mutex mutex_;
+    std::unordered_map<std::string, std::vector<std::unique_ptr<cpr::Session>>> idle_;
+    std::size_t max_idle_ = 8;
+};
+
+inline std::atomic<std::size_t>& max_concurrency_setting() {
+    static std::atomic<std::size_t> value{16};
+    return value;
+}
+
+inline void set_pool_size(std::size_t max_idle_per_host) {
+    SessionPool::instance().set_max_idle_per_host(max_idle_per_host);
+}
+
+inline void set_max_concurrency(std::size_t limit) {
+    max_concurrency_setting() = std::max<std::size_t>(limit, 1);
+}
+
+inline std::size_t max_concurrency() {
+    return max_concurrency_setting();
+}
+
+inline std::string host_of(const std::string& url) {
+    auto scheme = url.find("://");
+    auto start = scheme == std::string::npos ? 0 : scheme + 3;
+    auto end = url.find_first_of("/?#", start);
+    return url.substr(0, end);
+}
+
+inline Response perform(const std::string& method, const std::string& url, const RequestOptions& options) {
+    auto host = host_of(url);
+    auto session = SessionPool::instance().acquire(host);
+    // Sessions are reused, so every setting is reset on each request.
+    session->SetUrl(cpr::Url{url});
+    session->SetParameters(options.params);
+    session->SetHeader(options.headers);
+    session->SetTimeout(cpr::Timeout{options.timeout_ms});
+    Response response;
+    if (method == "POST") {
+        session->SetBody(cpr::Body{options.has_body ? options.body : std::string()});
+        response = session->Post();
+    } else {
+        response = session->Get();
+    }
+    SessionPool::instance().release(host, std::move(session));
+    return response;
+}
+
+template <typename... Options>
+RequestOptions make_options(const Options&... options) {
+    RequestOptions result;
+    (result.add(options), ...);
+    return result;
+}
+
+template <typename... Options>
+Response get(const std::string& url, const Options&... options) {
+    return perform("GET", url, make_options(options...));
+}
+
+template <typename... Options>
+Response post(const std::string& url, const Options&... options) {
+    return perform("POST", url, make_options(options...));
+}
+
+// Fetches every URL with at most `limit` requests in flight, returning the
+// responses in the order of `urls`. If a request throws, no further ones
+// are started and the exception of the earliest failed URL is rethrown on
+// the calling thread once every worker has finished.
+inline std::vector<Response> get_many(const std::vector<std::string>& urls, const RequestOptions& options,
+                                      std::size_t limit = max_concurrency()) {
+    std::vector<Response> responses(urls.size());
+    std::vector<std::exception_ptr> errors(urls.size());
+    std::atomic<std::size_t> next{0};
+    std::atomic<bool> failed{false};
+    auto worker = [&] {
+        for (auto i = next++; i < urls.size() && !failed; i = next++) {
+            try {
+                responses[i] = perform("GET", urls[i], options);
+            } catch (...) {
+                errors[i] = std::current_exception();
+                failed = true;
+            }
+        }
+    };
+    std::vector<std::thread> threads;
+    auto count = std::min(std::max<std::size_t>(limit, 1), urls.size());
+    for (std::size_t i = 1; i < count; ++i) {
+        threads.emplace_back(worker);
+    }
+    worker();
+    for (auto& thread : threads) {
+        thread.join();
+    }
+    for (const auto& error : errors) {
+        if (error) {
+            std::rethrow_exception(error);
+        }
+    }
+    return responses;
+}
+
+template <typename Items, typename MakeUrl, typename... Options>
+std::vector<Response> map_get(const Items& items, MakeUrl make_url, const Options&... options) {
+    std::vector<std::string> urls;
+    for (const auto& item : items) {
+        urls.emplace_back(make_url(item));
+    }
+    return get_many(urls, make_options(options...));
+}
+
+inline std::vector<nlohmann::json> json_all(const std::vector<Response>& responses) {
+    std::vector<nlohmann::json> documents;
+    documents.reserve(responses.size());
+    for (const auto& response : responses) {
+        documents.push_back(nlohmann::json::parse(response.text));
+    }
+    return documents;
 }
 
 } // namespace requests
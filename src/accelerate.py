@@ -0,0 +1,399 @@
+# accelerate.py
+import argparse
+import ast
+import glob
+import os
+import shlex
+import subprocess
+import sys
+import sysconfig
+from concurrent.futures import ThreadPoolExecutor
+
+from src.buildfiles import write_if_changed
+from src.exactness import Exactness
+from src.generator import CppGenerator, cpp_string
+from src.inference import BOOL, FLOAT, INT, NONE, STR, annotation_type, infer_module, list_of
+from src.ownership import Ownership
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INCLUDE_DIRS = [os.path.join(ROOT, "cpp_src"), os.path.join(ROOT, "third_party"),
+                sysconfig.get_paths()["include"]]
+# Floating-point contraction (fused multiply-add) would round differently
+# from CPython, so it stays off.
+COMPILE_FLAGS = ["-O3", "-std=c++17", "-fPIC", "-fvisibility=hidden", "-ffp-contract=off"]
+
+# Annotations whose values the wrappers unbox, with the C++ type they
+# convert to. Lists also accept contiguous buffers of the same element type.
+ARGUMENT_TYPES = {
+    INT: "int64_t",
+    FLOAT: "double",
+    BOOL: "bool",
+    STR: "std::string",
+    list_of(INT): "std::vector<int64_t>",
+    list_of(FLOAT): "std::vector<double>",
+    list_of(STR): "std::vector<std::string>",
+}
+RETURN_TYPES = set(ARGUMENT_TYPES) | {NONE}
+
+# Appended to the original source to form the shim module. When the
+# extension cannot be imported the module simply stays pure Python.
+SHIM_FOOTER = """
+
+# Generated by python-cpp-transpiler: the annotated functions above run
+# natively when their arguments convert. Other calls, and native runs that
+# would overflow, divide by zero or index out of range, run them in Python.
+try:
+    import {native}
+except ImportError:
+    pass
+else:
+    {native}.install(globals())
+"""
+
+WRAPPER_PROLOGUE = """#include "{header}"
+#include "pyaccel.hpp"
+
+#include <exception>
+
+namespace {{
+
+// The original Python functions, installed by install(); a call whose
+// arguments do not convert, or whose native run throws, is replayed on them.
+PyObject* fallbacks[{count}] = {{}};
+
+PyObject* fallback(int index, PyObject* const* args, Py_ssize_t nargs, PyObject* kwnames) {{
+    if (fallbacks[index] == nullptr) {{
+        PyErr_SetString(PyExc_TypeError, "unsupported arguments and no Python fallback installed");
+        return nullptr;
+    }}
+    return PyObject_Vectorcall(fallbacks[index], args, nargs, kwnames);
+}}
+"""
+
+WRAPPER_EPILOGUE = """
+const char* names[] = {{{names}}};
+
+// Replaces each accelerated function in `globals` by its native version,
+// keeping the Python definition as the fallback.
+PyObject* install(PyObject* module, PyObject* globals) {{
+    if (!PyDict_Check(globals)) {{
+        PyErr_SetString(PyExc_TypeError, "install() expects a module's globals()");
+        return nullptr;
+    }}
+    for (int i = 0; i < {count}; ++i) {{
+        PyObject* original = PyDict_GetItemString(globals, names[i]);
+        if (original == nullptr) {{
+            continue;
+        }}
+        Py_INCREF(original);
+        Py_XSETREF(fallbacks[i], original);
+        PyObject* native = PyObject_GetAttrString(module, names[i]);
+        if (native == nullptr || PyDict_SetItemString(globals, names[i], native) != 0) {{
+            Py_XDECREF(native);
+            return nullptr;
+        }}
+        Py_DECREF(native);
+    }}
+    Py_RETURN_NONE;
+}}
+
+PyMethodDef methods[] = {{
+{methods}
+    {{"install", install, METH_O, "Installs the native functions into a module namespace."}},
+    {{nullptr, nullptr, 0, nullptr}},
+}};
+
+PyModuleDef module_def = {{PyModuleDef_HEAD_INIT, "{native}", nullptr, -1, methods}};
+
+}} // namespace
+
+PyMODINIT_FUNC PyInit_{native}() {{
+    return PyModule_Create(&module_def);
+}}
+"""
+
+
+class BuildError(Exception):
+    pass
+
+
+def unsupported(node):
+    """
+    Returns why `node` cannot be accelerated, or None when its signature is
+    fully annotated with convertible types.
+    """
+    args = node.args
+    if args.posonlyargs or args.vararg or args.kwonlyargs or args.kwarg or args.defaults:
+        return "only plain positional parameters are supported"
+    if node.decorator_list:
+        return "decorated"
+    if node.returns is None or annotation_type(node.returns) not in RETURN_TYPES:
+        return "return type is not annotated with a supported type"
+    for arg in args.args:
+        if annotation_type(arg.annotation) not in ARGUMENT_TYPES:
+            return f"parameter '{arg.arg}' is not annotated with a supported type"
+    # The native function works on a converted copy, so in-place changes
+    # would not reach the caller's list.
+    ownership = Ownership(node.body, [arg.arg for arg in args.args])
+    for arg in args.args:
+        if annotation_type(arg.annotation).name == "list" and arg.arg in ownership.mutated:
+            return f"mutates its list parameter '{arg.arg}'"
+    return None
+
+
+def module_names(tree):
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names.update(n.id for t in targets for n in ast.walk(t) if isinstance(n, ast.Name))
+    return names
+
+
+def imports(tree):
+    return [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def select_functions(tree):
+    """
+    Returns the top-level functions that can be compiled natively, in source
+    order, and {name: reason} for the ones that stay in Python: those whose
+    native version might not compute what Python does (see Exactness), and
+    those that use a module-level name which is not itself accelerated.
+    """
+    skipped = {}
+    candidates = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            reason = unsupported(node)
+            if reason:
+                skipped[node.name] = reason
+            else:
+                candidates[node.name] = node
+    drop_dependents(tree, candidates, skipped)
+    types = infer_module(ast.Module(body=imports(tree) + list(candidates.values()), type_ignores=[]))
+    signatures = {name: ([annotation_type(arg.annotation) for arg in node.args.args], annotation_type(node.returns))
+                  for name, node in candidates.items()}
+    for name, node in list(candidates.items()):
+        reason = Exactness(node, types, signatures).reason
+        if reason:
+            skipped[name] = reason
+            del candidates[name]
+    drop_dependents(tree, candidates, skipped)
+    return list(candidates.values()), skipped
+
+
+def drop_dependents(tree, candidates, skipped):
+    """
+    Removes from `candidates` every function that uses a module-level name
+    which is not a candidate, until none is left.
+    """
+    defined = module_names(tree)
+    changed = True
+    while changed:
+        changed = False
+        for name, node in list(candidates.items()):
+            used = {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+            missing = sorted((used & defined) - set(candidates))
+            if missing:
+                skipped[name] = f"uses '{missing[0]}', which stays in Python"
+                del candidates[name]
+                changed = True
+
+
+def wrapper_function(index, namespace, node):
+    params = [annotation_type(arg.annotation) for arg in node.args.args]
+    lines = [f"PyObject* py_{node.name}(PyObject*, PyObject* const* args, Py_ssize_t nargs, PyObject* kwnames) {{"]
+    checks = ["kwnames != nullptr", f"nargs != {len(params)}"]
+    for i, t in enumerate(params):
+        lines.append(f"    {ARGUMENT_TYPES[t]} a{i};")
+        checks.append(f"!pyaccel::from_python(args[{i}], a{i})")
+    lines.append(f"    if ({' || '.join(checks)}) {{")
+    lines.append(f"        return fallback({index}, args, nargs, kwnames);")
+    lines.append("    }")
+    call = f"{namespace}::{node.name}({', '.join(f'a{i}' for i in range(len(params)))})"
+    lines.append("    try {")
+    if annotation_type(node.returns) == NONE:
+        lines.append(f"        {call};")
+        lines.append("        Py_RETURN_NONE;")
+    else:
+        lines.append(f"        return pyaccel::to_python({call});")
+    lines.append("    } catch (const std::exception&) {")
+    lines.append(f"        return fallback({index}, args, nargs, kwnames);")
+    lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def wrapper_source(name, functions):
+    """
+    Returns the C++ source of the extension module wrapping `functions`,
+    which live in namespace `name` of the generated `name.hpp`.
+    """
+    native = f"_{name}_native"
+    parts = [WRAPPER_PROLOGUE.format(header=f"{name}.hpp", count=len(functions))]
+    parts += ["\n" + wrapper_function(i, name, node) + "\n" for i, node in enumerate(functions)]
+    methods = []
+    for node in functions:
+        doc = ast.get_docstring(node)
+        methods.append(f"    {{\"{node.name}\", reinterpret_cast<PyCFunction>(reinterpret_cast<void (*)()>(py_{node.name})),"
+                       f" METH_FASTCALL | METH_KEYWORDS, {cpp_string(doc) if doc else 'nullptr'}}},")
+    parts.append(WRAPPER_EPILOGUE.format(
+        native=native, count=len(functions), methods="\n".join(methods),
+        names=", ".join(f'"{node.name}"' for node in functions)))
+    return "".join(parts)
+
+
+def compiler():
+    return shlex.split(os.environ.get("CXX") or sysconfig.get_config_var("CXX") or "c++")
+
+
+def compile_object(source, output, header):
+    """
+    Compiles `source` to the object file `output` unless it is newer than
+    the source, the module header and the runtime headers. Returns the
+    compiler's first error, or None on success.
+    """
+    inputs = [source, header] + glob.glob(os.path.join(ROOT, "cpp_src", "*.hpp"))
+    if os.path.exists(output) and os.path.getmtime(output) >= max(map(os.path.getmtime, inputs)):
+        return None
+    command = compiler() + COMPILE_FLAGS + [f"-I{d}" for d in INCLUDE_DIRS] + ["-c", source, "-o", output]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode == 0:
+        return None
+    lines = (result.stderr or result.stdout).strip().splitlines()
+    error = next((line for line in lines if "error" in line), lines[0] if lines else "compiler failed")
+    return error.split("error: ", 1)[-1]
+
+
+def link_extension(objects, output):
+    command = compiler() + COMPILE_FLAGS + ["-shared"] + objects + ["-o", output]
+    if sys.platform == "darwin":
+        command += ["-undefined", "dynamic_lookup"]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise BuildError((result.stderr or result.stdout).strip())
+
+
+def generate_sources(tree, name, functions):
+    """
+    Transpiles `functions` in checked mode, one translation unit each.
+    Returns {function name: (header, source)}, where the header declares the
+    function and the ones it calls, and {function name: error} for those
+    the generator cannot lower.
+    """
+    names = {node.name for node in functions}
+    units = {}
+    failed = {}
+    for node in functions:
+        called = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)} & names - {node.name}
+        declared = [node] + [other for other in functions if other.name in called]
+        header_name = f"{name}.{node.name}.hpp"
+        try:
+            header, _ = module_generator(name, header_name).generate_module(
+                ast.Module(body=imports(tree) + declared, type_ignores=[]))
+            _, source = module_generator(name, header_name).generate_module(
+                ast.Module(body=imports(tree) + [node], type_ignores=[]))
+        except Exception as e:
+            failed[node.name] = f"cannot be transpiled ({type(e).__name__}: {e})"
+        else:
+            units[node.name] = (header, source)
+    return units, failed
+
+
+def module_generator(name, header):
+    # Hot functions are called many times on small inputs, so stay
+    # sequential rather than paying for parallel algorithm dispatch.
+    return CppGenerator(modules={name: header}, module_name=name, parallel=False, checked=True)
+
+
+def build_functions(tree, name, functions, build_dir):
+    """
+    Compiles each of `functions` to its own object file in `build_dir`, so
+    that one that fails does not take the others with it. Returns
+    {function name: object path} and {function name: error} for the ones
+    that fail.
+    """
+    units, failed = generate_sources(tree, name, functions)
+    jobs = {}
+    for function, (header, source) in units.items():
+        stem = os.path.join(build_dir, f"{name}.{function}")
+        write_if_changed(stem + ".hpp", header)
+        write_if_changed(stem + ".cpp", source)
+        jobs[function] = (stem + ".cpp", stem + ".o", stem + ".hpp")
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        errors = list(pool.map(lambda job: compile_object(*job), jobs.values()))
+    for function, error in zip(jobs, errors):
+        if error:
+            failed[function] = f"does not compile natively: {error}"
+    return {f: jobs[f][1] for f in jobs if f not in failed}, failed
+
+
+def accelerate(path, out_dir):
+    """
+    Compiles the annotated functions of the module at `path` into an
+    extension and writes a shim module of the same name to `out_dir` that
+    dispatches to them. Functions that fail to compile are dropped, along
+    with those that call them. Returns (accelerated names, {name: reason}
+    of the functions left in Python).
+    """
+    with open(path) as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    native = f"_{name}_native"
+    functions, skipped = select_functions(tree)
+    os.makedirs(out_dir, exist_ok=True)
+    extension = os.path.join(out_dir, native + sysconfig.get_config_var("EXT_SUFFIX"))
+    # Write the shim before building, without any stale extension, so that
+    # the module imports as plain Python whatever happens to the build.
+    if os.path.exists(extension):
+        os.remove(extension)
+    shim_path = os.path.join(out_dir, f"{name}.py")
+    write_if_changed(shim_path, source.rstrip("\n") + "\n" + SHIM_FOOTER.format(native=native))
+    build_dir = os.path.join(out_dir, f"{native}.build")
+    objects = {}
+    while functions:
+        objects, failed = build_functions(tree, name, functions, build_dir)
+        if not failed:
+            break
+        skipped.update(failed)
+        candidates = {node.name: node for node in functions if node.name not in failed}
+        drop_dependents(tree, candidates, skipped)
+        functions = list(candidates.values())
+    if not functions:
+        write_if_changed(shim_path, source)
+        return [], skipped
+    header, _ = module_generator(name, f"{name}.hpp").generate_module(
+        ast.Module(body=imports(tree) + functions, type_ignores=[]))
+    header_path = os.path.join(build_dir, f"{name}.hpp")
+    write_if_changed(header_path, header)
+    wrapper_path = os.path.join(build_dir, f"{native}.cpp")
+    write_if_changed(wrapper_path, wrapper_source(name, functions))
+    error = compile_object(wrapper_path, os.path.join(build_dir, f"{native}.o"), header_path)
+    if error:
+        raise BuildError(error)
+    link_extension([objects[node.name] for node in functions] + [os.path.join(build_dir, f"{native}.o")], extension)
+    return [node.name for node in functions], skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile annotated Python functions into a CPython extension")
+    parser.add_argument("path", help="Python module whose annotated functions to accelerate")
+    parser.add_argument("-o", "--out-dir", required=True,
+                        help="Directory for the extension and the shim module that loads it")
+    args = parser.parse_args()
+
+    try:
+        accelerated, skipped = accelerate(args.path, args.out_dir)
+    except BuildError as e:
+        print(f"build failed, the module stays pure Python: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Accelerated: {', '.join(accelerated) or 'nothing'}", file=sys.stderr)
+    for name, reason in skipped.items():
+        print(f"Kept in Python: {name} ({reason})", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
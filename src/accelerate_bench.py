@@ -0,0 +1,88 @@
+# accelerate_bench.py
+import argparse
+import array
+import importlib.util
+import os
+import sys
+import tempfile
+import timeit
+
+from src.accelerate import accelerate
+
+# Functions raced against their own Python definitions: `add` shows the
+# fixed per-call cost, the others how much a kernel's body gains.
+SOURCE = '''
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+def collatz_steps(n: int) -> int:
+    steps = 0
+    while n != 1:
+        if n % 2 == 0:
+            n = n // 2
+        else:
+            n = 3 * n + 1
+        steps += 1
+    return steps
+
+
+def dot(xs: list[float], ys: list[float]) -> float:
+    total = 0.0
+    for i in range(len(xs)):
+        total += xs[i] * ys[i]
+    return total
+'''
+
+
+def load(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def per_call(function, args, number):
+    """
+    Returns the fastest of five timings of one call, in seconds.
+    """
+    return min(timeit.repeat(lambda: function(*args), number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare accelerated functions with pure Python")
+    parser.add_argument("--size", type=int, default=100000, help="Length of the vectors passed to dot()")
+    parser.add_argument("--number", type=int, default=200, help="Calls per timing of the kernels")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        source_path = os.path.join(out_dir, "src", "kernels.py")
+        os.makedirs(os.path.dirname(source_path))
+        with open(source_path, "w") as f:
+            f.write(SOURCE)
+        accelerated, _ = accelerate(source_path, out_dir)
+        python = load(source_path, "kernels_python")
+        sys.path.insert(0, out_dir)
+        try:
+            native = load(os.path.join(out_dir, "kernels.py"), "kernels")
+        finally:
+            sys.path.remove(out_dir)
+    print(f"Accelerated: {', '.join(accelerated)}")
+
+    xs = [float(i % 97) for i in range(args.size)]
+    ys = [float(i % 89) for i in range(args.size)]
+    cases = [
+        ("add(1, 2)", "add", (1, 2), 200000),
+        ("add(1.0, 2) fallback", "add", (1.0, 2), 200000),
+        ("collatz_steps(837799)", "collatz_steps", (837799,), args.number * 10),
+        (f"dot(list x{args.size})", "dot", (xs, ys), args.number),
+        (f"dot(array x{args.size})", "dot", (array.array("d", xs), array.array("d", ys)), args.number),
+    ]
+    print(f"{'call':<28}{'python':>12}{'native':>12}{'speedup':>9}")
+    for label, name, call_args, number in cases:
+        python_s = per_call(getattr(python, name), call_args, number)
+        native_s = per_call(getattr(native, name), call_args, number)
+        print(f"{label:<28}{python_s * 1e9:>10.0f}ns{native_s * 1e9:>10.0f}ns{python_s / native_s:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
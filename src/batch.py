@@ -0,0 +1,212 @@
+# batch.py
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.parser import parse_file
+from src.buildfiles import write_build_files, write_if_changed
+from src.generator import CppGenerator
+from src.inference import format_fallback
+
+# Module table and generator options shared by the worker processes, set
+# once per process by `init_worker` so they are not pickled with every job.
+_modules = {}
+_options = {}
+
+
+def discover(paths):
+    """
+    Expands files, directories and glob patterns into (root, path) pairs,
+    where root is the directory the module names are relative to.
+    """
+    found = {}
+    for pattern in paths:
+        if glob.has_magic(pattern):
+            parts = pattern.split(os.sep)
+            prefix = []
+            for part in parts:
+                if glob.has_magic(part):
+                    break
+                prefix.append(part)
+            root = os.sep.join(prefix) or "."
+            matches = glob.glob(pattern, recursive=True)
+        elif os.path.isdir(pattern):
+            root = pattern
+            matches = glob.glob(os.path.join(pattern, "**", "*.py"), recursive=True)
+        else:
+            root = os.path.dirname(pattern) or "."
+            matches = [pattern]
+        for path in matches:
+            if path.endswith(".py") and os.path.isfile(path):
+                found.setdefault(os.path.normpath(path), os.path.normpath(root))
+    return [(root, path) for path, root in sorted(found.items())]
+
+
+def module_name(root, path):
+    relative = os.path.relpath(path, root)[:-len(".py")]
+    parts = relative.split(os.sep)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def output_stem(root, path):
+    return os.path.relpath(path, root)[:-len(".py")]
+
+
+def init_worker(modules, options):
+    global _modules, _options
+    _modules = modules
+    _options = options
+
+
+def write_outputs(out_dir, stem, header, source):
+    out_path = os.path.join(out_dir, stem)
+    write_if_changed(out_path + ".hpp", header)
+    write_if_changed(out_path + ".cpp", source)
+
+
+def transpile_module(job):
+    """
+    Transpiles one module of a batch and writes its .hpp/.cpp pair. Errors
+    are returned rather than raised so one bad file does not stop the batch.
+    """
+    path, name, out_dir, stem = job
+    result = {"path": path, "module": name, "bytes": 0, "error": None, "entry": None,
+              "fallbacks": [], "headers": []}
+    try:
+        result["bytes"] = os.path.getsize(path)
+        ast_tree = parse_file(path)
+        generator = CppGenerator(modules=_modules, module_name=name, **_options)
+        header, source = generator.generate_module(ast_tree)
+        write_outputs(out_dir, stem, header, source)
+        result["fallbacks"] = generator.types.fallbacks
+        result["headers"] = sorted(generator.headers)
+        result["entry"] = {"header": header, "source": source,
+                           "headers": sorted(generator.headers),
+                           "fallbacks": generator.types.fallbacks}
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def transpile_tree(paths, out_dir, jobs=None, cache=None, options=None, cmake=False):
+    """
+    Transpiles every module found under `paths` into `out_dir`, mirroring the
+    source layout, and returns the per-file results. With a cache, modules
+    whose key is unchanged are served from it instead of being regenerated.
+    `options` are passed on to CppGenerator. With `cmake`, a precompiled
+    header and a CMakeLists.txt building the modules are written as well.
+    """
+    options = options or {}
+    files = discover(paths)
+    modules = {}
+    job_list = []
+    for root, path in files:
+        name = module_name(root, path)
+        stem = output_stem(root, path)
+        modules[name] = stem.replace(os.sep, "/") + ".hpp"
+        job_list.append((path, name, out_dir, stem))
+
+    results = []
+    keys = {}
+    if cache:
+        infos = {}
+        for path, name, _, stem in job_list:
+            is_package = os.path.basename(stem) == "__init__"
+            infos[name] = cache.source_info(path, name, is_package)
+        keys = cache.module_keys(infos, modules)
+        misses = []
+        for job in job_list:
+            path, name, _, stem = job
+            info = cache.manifest[path]
+            entry = cache.get(keys[name])
+            if entry is None:
+                misses.append(job)
+                continue
+            if info["output"] != keys[name] or not all(
+                    os.path.exists(os.path.join(out_dir, stem) + ext) for ext in (".hpp", ".cpp")):
+                write_outputs(out_dir, stem, entry["header"], entry["source"])
+                info["output"] = keys[name]
+            results.append({"path": path, "module": name, "bytes": info["stat"][1],
+                            "error": None, "cached": True, "fallbacks": entry["fallbacks"],
+                            "headers": entry["headers"]})
+        job_list = misses
+
+    jobs = min(jobs or os.cpu_count() or 1, max(len(job_list), 1))
+    if jobs == 1:
+        init_worker(modules, options)
+        generated = [transpile_module(job) for job in job_list]
+    else:
+        chunksize = max(1, len(job_list) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(modules, options)) as executor:
+            generated = list(executor.map(transpile_module, job_list, chunksize=chunksize))
+
+    for result in generated:
+        entry = result.pop("entry")
+        result["cached"] = False
+        if cache and entry is not None:
+            cache.put(keys[result["module"]], entry)
+            cache.manifest[result["path"]]["output"] = keys[result["module"]]
+    if cache:
+        cache.save()
+        cache.evict()
+    results += generated
+    if cmake:
+        write_build_files(out_dir, results, modules)
+    return results
+
+
+def report(results, elapsed, report_types=False, stream=sys.stderr):
+    failed = [r for r in results if r["error"]]
+    for r in failed:
+        print(f"{r['path']}: {r['error']}", file=stream)
+    if report_types:
+        for r in results:
+            for fallback in r["fallbacks"]:
+                print(format_fallback(r["path"], fallback), file=stream)
+    total_bytes = sum(r["bytes"] for r in results)
+    cached = sum(1 for r in results if r.get("cached"))
+    elapsed = max(elapsed, 1e-9)
+    print(f"Transpiled {len(results) - len(failed)}/{len(results)} files "
+          f"({cached} from cache) in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.1f} files/s, {total_bytes / elapsed:.0f} bytes/s)",
+          file=stream)
+    return not failed
+
+
+def run_batch(paths, out_dir, jobs=None, cache=None, report_types=False, options=None, cmake=False):
+    start = time.perf_counter()
+    results = transpile_tree(paths, out_dir, jobs, cache, options, cmake)
+    return report(results, time.perf_counter() - start, report_types)
+
+
+def snapshot(paths):
+    state = {}
+    for _, path in discover(paths):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        state[path] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def watch(paths, out_dir, jobs=None, cache=None, interval=0.2, report_types=False, options=None,
+          cmake=False):
+    """
+    Re-runs the batch whenever a source file is added, removed or modified.
+    """
+    previous = None
+    try:
+        while True:
+            current = snapshot(paths)
+            if current != previous:
+                run_batch(paths, out_dir, jobs, cache, report_types, options, cmake)
+                previous = current
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,329 @@
+# bench.py
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from src.parser import parse_file
+from src.generator import GENERATOR_VERSION, CppGenerator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KERNEL_DIR = os.path.join(ROOT, "bench", "kernels")
+DEFAULT_HISTORY = os.path.join(ROOT, "bench", "history.jsonl")
+DEFAULT_BUILD_DIR = os.path.join(ROOT, "build-bench")
+
+# A kernel regresses when its native runtime exceeds the baseline by more
+# than this fraction; the baseline is the median of the last few runs.
+DEFAULT_THRESHOLD = 0.10
+BASELINE_RUNS = 5
+
+# Every kernel module defines this function; it takes no arguments, builds
+# its own inputs and returns a value both implementations must agree on.
+ENTRY_POINT = "bench"
+
+# Appended to each transpiled kernel. The entry point is called through a
+# volatile pointer so repeated runs cannot be folded into one; the result of
+# the first run goes to stdout, and the fastest run in nanoseconds and the
+# peak resident set in KiB go to stderr. The peak is read from VmHWM because
+# getrusage() also counts the forking parent's memory.
+NATIVE_HARNESS = """
+#include <chrono>
+#include <cstdlib>
+#include <fstream>
+#include <iomanip>
+#include <iostream>
+#include <string>
+
+int main(int argc, char** argv) {{
+    decltype(&{entry}) volatile entry = &{entry};
+    int repeat = argc > 1 ? std::atoi(argv[1]) : 1;
+    long long best = -1;
+    for (int i = 0; i < repeat; ++i) {{
+        auto start = std::chrono::steady_clock::now();
+        auto result = entry();
+        auto elapsed = std::chrono::steady_clock::now() - start;
+        long long ns = std::chrono::duration_cast<std::chrono::nanoseconds>(elapsed).count();
+        if (best < 0 || ns < best) {{
+            best = ns;
+        }}
+        if (i == 0) {{
+            std::cout << std::setprecision(17) << std::boolalpha << result << std::endl;
+        }}
+    }}
+    long long peak_kib = 0;
+    std::ifstream status("/proc/self/status");
+    for (std::string field; status >> field;) {{
+        if (field == "VmHWM:") {{
+            status >> peak_kib;
+        }}
+    }}
+    std::cerr << best << " " << peak_kib << std::endl;
+    return 0;
+}}
+"""
+
+# Runs a kernel under CPython with the same protocol as NATIVE_HARNESS.
+PYTHON_HARNESS = """
+import importlib.util, json, sys, time
+spec = importlib.util.spec_from_file_location("kernel", sys.argv[1])
+kernel = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(kernel)
+best = None
+for i in range(int(sys.argv[2])):
+    start = time.perf_counter_ns()
+    result = getattr(kernel, sys.argv[3])()
+    ns = time.perf_counter_ns() - start
+    best = ns if best is None else min(best, ns)
+    if i == 0:
+        print(result if isinstance(result, (str, int, float)) else json.dumps(result, separators=(",", ":")))
+peak_kib = 0
+try:
+    with open("/proc/self/status") as status:
+        peak_kib = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    pass
+print(best, peak_kib, file=sys.stderr)
+"""
+
+
+def find_kernels(names=None, kernel_dir=KERNEL_DIR):
+    """
+    Returns {name: path} for the kernel corpus, optionally restricted to
+    `names`.
+    """
+    kernels = {os.path.splitext(os.path.basename(p))[0]: p
+               for p in sorted(glob.glob(os.path.join(kernel_dir, "*.py")))}
+    if names:
+        unknown = [n for n in names if n not in kernels]
+        if unknown:
+            raise ValueError(f"unknown kernels: {', '.join(unknown)}")
+        kernels = {n: kernels[n] for n in names}
+    return kernels
+
+
+def transpile_kernel(path, parallel=True):
+    """
+    Returns the kernel's C++ translation with the native harness appended,
+    and the time spent parsing and generating it.
+    """
+    start = time.perf_counter()
+    cpp_code = CppGenerator(parallel=parallel).generate(parse_file(path))
+    elapsed = time.perf_counter() - start
+    return cpp_code + "\n" + NATIVE_HARNESS.format(entry=ENTRY_POINT), elapsed
+
+
+def build(sources, build_dir):
+    """
+    Writes the transpiled kernels and builds one executable per kernel
+    through the project's CMakeLists.txt. Returns {name: executable}, with
+    a BuildError in place of the executable of any kernel that failed.
+    """
+    source_dir = os.path.join(build_dir, "kernels")
+    os.makedirs(source_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(source_dir, "*.cpp")):
+        if os.path.splitext(os.path.basename(stale))[0] not in sources:
+            os.remove(stale)
+    for name, cpp_code in sources.items():
+        path = os.path.join(source_dir, f"{name}.cpp")
+        # Leave unchanged sources alone so CMake only rebuilds what changed.
+        if os.path.exists(path):
+            with open(path) as f:
+                if f.read() == cpp_code:
+                    continue
+        with open(path, "w") as f:
+            f.write(cpp_code)
+    subprocess.run(["cmake", "-S", ROOT, "-B", build_dir, "-DCMAKE_BUILD_TYPE=Release",
+                    f"-DBENCH_DIR={source_dir}"], check=True, stdout=subprocess.DEVNULL)
+    targets = [arg for name in sources for arg in ("--target", f"bench_{name}")]
+    if compile_targets(build_dir, targets) is None:
+        return {name: os.path.join(build_dir, f"bench_{name}") for name in sources}
+    # Something failed to compile; build the kernels one at a time to find out which.
+    built = {}
+    for name in sources:
+        error = compile_targets(build_dir, ["--target", f"bench_{name}"])
+        built[name] = os.path.join(build_dir, f"bench_{name}") if error is None else BuildError(error)
+    return built
+
+
+class BuildError(Exception):
+    pass
+
+
+def compile_targets(build_dir, targets):
+    """
+    Returns None on success, else the compiler output.
+    """
+    result = subprocess.run(["cmake", "--build", build_dir, "--parallel"] + targets,
+                            capture_output=True, text=True)
+    return None if result.returncode == 0 else (result.stderr or result.stdout).strip()
+
+
+def measure(command):
+    """
+    Runs `command` and returns (stdout, fastest run in seconds, peak RSS in
+    KiB), the last two as reported by the harness on its last stderr line.
+    """
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{command[0]} exited with {process.returncode}: {process.stderr.strip()}")
+    best_ns, peak_kib = process.stderr.split()[-2:]
+    return process.stdout.strip(), int(best_ns) / 1e9, int(peak_kib)
+
+
+def same_output(python_output, native_output):
+    """
+    Compares the printed results of both implementations. Numbers may be
+    formatted differently but must parse to the same value: the generated
+    code keeps Python's order of float operations.
+    """
+    if python_output == native_output:
+        return True
+    try:
+        a, b = as_number(python_output), as_number(native_output)
+    except ValueError:
+        return False
+    return a == b
+
+
+def as_number(text):
+    if text.lower() in ("true", "false"):
+        return float(text.lower() == "true")
+    return float(text)
+
+
+def run_kernel(path, executable, repeat):
+    python_output, python_s, python_rss = measure(
+        [sys.executable, "-c", PYTHON_HARNESS, path, str(repeat), ENTRY_POINT])
+    native_output, native_s, native_rss = measure([executable, str(repeat)])
+    return {
+        "match": same_output(python_output, native_output),
+        "python_s": python_s,
+        "native_s": native_s,
+        "speedup": python_s / max(native_s, 1e-9),
+        "python_rss_kib": python_rss,
+        "native_rss_kib": native_rss,
+        "binary_bytes": os.path.getsize(executable),
+    }
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, record):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def find_regressions(record, history, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares each kernel's native runtime with the median of its last
+    BASELINE_RUNS recorded runs under the same options. Returns a list of
+    (kernel, baseline seconds, current seconds).
+    """
+    regressions = []
+    for name, result in record["kernels"].items():
+        if "native_s" not in result:
+            continue
+        previous = [r["kernels"][name]["native_s"] for r in history
+                    if r.get("options") == record["options"] and "native_s" in r["kernels"].get(name, {})]
+        if not previous:
+            continue
+        baseline = statistics.median(previous[-BASELINE_RUNS:])
+        if result["native_s"] > baseline * (1 + threshold):
+            regressions.append((name, baseline, result["native_s"]))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names=None, repeat=5, parallel=True, build_dir=DEFAULT_BUILD_DIR, stream=sys.stderr):
+    """
+    Transpiles, builds and races every kernel against CPython. Returns a
+    history record.
+    """
+    kernels = find_kernels(names)
+    results = {}
+    sources = {}
+    for name, path in kernels.items():
+        try:
+            sources[name], transpile_s = transpile_kernel(path, parallel)
+            results[name] = {"transpile_s": transpile_s}
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    executables = build(sources, build_dir) if sources else {}
+    for name, executable in executables.items():
+        if isinstance(executable, BuildError):
+            results[name]["error"] = f"build failed: {executable}"
+            continue
+        print(f"Running {name}...", file=stream)
+        try:
+            results[name].update(run_kernel(kernels[name], executable, repeat))
+        except RuntimeError as e:
+            results[name]["error"] = str(e)
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "generator_version": GENERATOR_VERSION,
+        "options": {"parallel": parallel, "repeat": repeat},
+        "kernels": results,
+    }
+
+
+def report(record, regressions, stream=sys.stderr):
+    print(f"{'kernel':<20}{'python':>10}{'native':>10}{'speedup':>9}{'rss KiB':>10}{'binary':>10}"
+          f"{'transpile':>11}", file=stream)
+    failed = False
+    for name, r in record["kernels"].items():
+        if "error" in r:
+            print(f"{name:<20}error: {r['error']}", file=stream)
+            failed = True
+            continue
+        print(f"{name:<20}{r['python_s']:>9.4f}s{r['native_s']:>9.4f}s{r['speedup']:>8.1f}x"
+              f"{r['native_rss_kib']:>10}{r['binary_bytes']:>10}{r['transpile_s'] * 1000:>9.1f}ms", file=stream)
+        if not r["match"]:
+            print(f"{name:<20}outputs differ between CPython and the native build", file=stream)
+            failed = True
+    for name, baseline, current in regressions:
+        print(f"{name}: native runtime regressed from {baseline:.4f}s to {current:.4f}s", file=stream)
+    return not failed and not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Race transpiled kernels against CPython")
+    parser.add_argument("kernels", nargs="*", help="Kernel names from bench/kernels (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per kernel; the fastest one is recorded")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown against the recorded baseline, as a fraction")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON Lines file of previous runs")
+    parser.add_argument("--build-dir", default=DEFAULT_BUILD_DIR, help="CMake build directory for the kernels")
+    parser.add_argument("--sequential", action="store_true", help="Transpile without parallel algorithms")
+    parser.add_argument("--no-record", action="store_true", help="Do not append this run to the history")
+    args = parser.parse_args()
+
+    try:
+        record = run_suite(args.kernels, args.repeat, not args.sequential, args.build_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    regressions = find_regressions(record, load_history(args.history), args.threshold)
+    ok = report(record, regressions)
+    if not args.no_record:
+        append_history(args.history, record)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
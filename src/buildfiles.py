@@ -0,0 +1,99 @@
+# buildfiles.py
+import os
+
+from src.generator import RUNTIME_HEADERS
+
+PCH_NAME = "transpiled_pch.hpp"
+LIBRARY_TARGET = "transpiled"
+
+
+def write_if_changed(path, text):
+    """
+    Writes `text` to `path` unless the file already holds it, so unchanged
+    output keeps its mtime and build tools do not recompile it.
+    """
+    try:
+        with open(path) as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return True
+
+
+def pch_includes(results, modules):
+    """
+    Returns the runtime and standard headers used by any module of a batch,
+    leaving out the batch's own generated headers, which change too often to
+    be precompiled.
+    """
+    generated = {f'"{header}"' for header in modules.values()}
+    used = set()
+    for result in results:
+        if not result["error"]:
+            used.update(result["headers"])
+    used -= generated
+    provided = set()
+    for header in used:
+        provided |= RUNTIME_HEADERS.get(header, set())
+    return [f"#include {h}" for h in sorted(used - provided)]
+
+
+def precompiled_header(results, modules):
+    lines = ["#pragma once", ""]
+    includes = pch_includes(results, modules)
+    if includes:
+        lines += includes + [""]
+    return "\n".join(lines)
+
+
+def cmake_fragment(sources):
+    """
+    Returns a CMakeLists.txt that builds every generated .cpp as its own
+    translation unit of one library, sharing the precompiled header.
+    """
+    lines = [
+        "# Generated by python-cpp-transpiler; do not edit.",
+        "cmake_minimum_required(VERSION 3.16)",
+        "",
+        "set(TRANSPILED_SOURCES",
+    ]
+    lines += [f"    {source}" for source in sources]
+    lines += [
+        ")",
+        "",
+        f"add_library({LIBRARY_TARGET} STATIC ${{TRANSPILED_SOURCES}})",
+        f"target_include_directories({LIBRARY_TARGET} PUBLIC ${{CMAKE_CURRENT_SOURCE_DIR}})",
+        f"target_precompile_headers({LIBRARY_TARGET} PRIVATE {PCH_NAME})",
+        "",
+        "# ccache only reuses objects built against a precompiled header when",
+        "# told to ignore the PCH's defines and timestamps.",
+        "find_program(CCACHE_PROGRAM ccache)",
+        "if(CCACHE_PROGRAM)",
+        f"    set_target_properties({LIBRARY_TARGET} PROPERTIES CXX_COMPILER_LAUNCHER",
+        '        "${CMAKE_COMMAND};-E;env;CCACHE_SLOPPINESS=pch_defines,time_macros,include_file_mtime,include_file_ctime;${CCACHE_PROGRAM}")',
+        "endif()",
+        "",
+        "if(TARGET cpr::cpr)",
+        f"    target_link_libraries({LIBRARY_TARGET} PUBLIC cpr::cpr)",
+        "endif()",
+        "if(TARGET TBB::tbb)",
+        f"    target_link_libraries({LIBRARY_TARGET} PUBLIC TBB::tbb)",
+        "endif()",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def write_build_files(out_dir, results, modules):
+    """
+    Writes the precompiled header and CMakeLists.txt for a transpiled batch.
+    Sources are listed in sorted order and files are only rewritten when
+    their content changes, so repeated runs leave the build untouched.
+    """
+    sources = sorted(modules[r["module"]][:-len(".hpp")] + ".cpp" for r in results if not r["error"])
+    write_if_changed(os.path.join(out_dir, PCH_NAME), precompiled_header(results, modules))
+    write_if_changed(os.path.join(out_dir, "CMakeLists.txt"), cmake_fragment(sources))
@@ -0,0 +1,148 @@
+# cache.py
+import ast
+import hashlib
+import json
+import os
+
+from src.generator import GENERATOR_VERSION
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def imported_names(tree, module_name, is_package):
+    """
+    Returns every dotted name an import in `tree` could refer to. A
+    from-import lists both the module and `module.name`, since the name may
+    be a submodule.
+    """
+    package = module_name.split(".") if is_package else module_name.split(".")[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - node.level + 1]
+                module = ".".join(base + ([node.module] if node.module else []))
+            else:
+                module = node.module
+            names.add(module)
+            names.update(f"{module}.{alias.name}" if module else alias.name
+                         for alias in node.names)
+    names.discard("")
+    return sorted(names)
+
+
+class TranspileCache:
+    """
+    On-disk cache of generated modules keyed by content hash. A manifest
+    remembers each source file's stat, hash and imports so that unchanged
+    files are neither re-read nor re-parsed.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, options=""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.options = options
+        self.entries = os.path.join(directory, "entries")
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def source_info(self, path, module_name, is_package):
+        """
+        Returns the content hash and imported names of a source file,
+        reusing the manifest entry when the file's stat is unchanged.
+        """
+        st = os.stat(path)
+        stat = [st.st_mtime_ns, st.st_size]
+        info = self.manifest.get(path)
+        if info and info["stat"] == stat and info["module"] == module_name:
+            return info["hash"], info["imports"]
+        with open(path, "rb") as f:
+            data = f.read()
+        source_hash = hashlib.sha256(data).hexdigest()
+        if info and info["hash"] == source_hash and info["module"] == module_name:
+            imports = info["imports"]
+        else:
+            try:
+                imports = imported_names(ast.parse(data, filename=path), module_name, is_package)
+            except SyntaxError:
+                imports = []
+        self.manifest[path] = {"stat": stat, "hash": source_hash, "imports": imports,
+                               "module": module_name, "output": None}
+        return source_hash, imports
+
+    def module_keys(self, infos, modules):
+        """
+        Computes the cache key of every module from its own hash and those of
+        the batch modules it transitively imports, so a change to a module
+        also invalidates its dependents. `infos` maps module names to
+        (hash, imports) pairs.
+        """
+        keys = {}
+        for name in infos:
+            seen = {name}
+            pending = [name]
+            resolved = set()
+            while pending:
+                for imported in infos[pending.pop()][1]:
+                    resolved.add((imported, modules.get(imported)))
+                    if imported in infos and imported not in seen:
+                        seen.add(imported)
+                        pending.append(imported)
+            digest = hashlib.sha256()
+            digest.update(f"{GENERATOR_VERSION}\0{self.options}\0{name}\0{modules[name]}\0".encode())
+            for dep in sorted(seen):
+                digest.update(f"{dep}\0{infos[dep][0]}\0".encode())
+            for imported, header in sorted(resolved, key=lambda r: (r[0], r[1] or "")):
+                digest.update(f"{imported}\0{header}\0".encode())
+            keys[name] = digest.hexdigest()
+        return keys
+
+    def entry_path(self, key):
+        return os.path.join(self.entries, key[:2], key + ".json")
+
+    def get(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Touch the entry so eviction drops the least recently used first.
+        os.utime(path)
+        return entry
+
+    def put(self, key, entry):
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        files = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.entries):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                st = os.stat(path)
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,109 @@
+# emitter.py
+import ast
+import shutil
+import tempfile
+
+# Generated code is kept in memory up to this size, then spilled to disk.
+SPOOL_BYTES = 8 * 1024 * 1024
+
+# Operands of the expression nodes that FastVisitor.fold evaluates with an
+# explicit stack; these are the ones that nest deeply in real code, such as
+# `a + b + c + ...` or long attribute chains.
+OPERANDS = {
+    ast.BinOp: lambda node: (node.left, node.right),
+    ast.BoolOp: lambda node: node.values,
+    ast.Compare: lambda node: (node.left, node.comparators[0]),
+    ast.UnaryOp: lambda node: (node.operand,),
+    ast.Attribute: lambda node: (node.value,),
+}
+
+
+def node_classes(cls=ast.AST):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from node_classes(subclass)
+
+
+class FastVisitor(ast.NodeVisitor):
+    """
+    NodeVisitor whose dispatch goes through a table built once per class
+    instead of a getattr() per node. Subclasses may define
+    `fold_<NodeType>(node, *operands)` for the node types in OPERANDS; their
+    visit_ methods call `fold`, which evaluates nested expressions without
+    recursing.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.dispatch = {
+            node_class: getattr(cls, "visit_" + node_class.__name__, cls.generic_visit)
+            for node_class in node_classes()
+        }
+        cls.folds = {
+            node_class: getattr(cls, "fold_" + node_class.__name__)
+            for node_class in OPERANDS if hasattr(cls, "fold_" + node_class.__name__)
+        }
+
+    def visit(self, node):
+        method = self.dispatch.get(node.__class__)
+        if method is None:
+            method = getattr(type(self), "visit_" + node.__class__.__name__, type(self).generic_visit)
+        return method(self, node)
+
+    def fold(self, root):
+        """
+        Evaluates `root` bottom-up, visiting operands left to right and
+        combining them with the matching fold_ method.
+        """
+        values = []
+        stack = [(root, False)]
+        while stack:
+            node, ready = stack.pop()
+            combine = self.folds.get(node.__class__)
+            if combine is None:
+                values.append(self.visit(node))
+                continue
+            operands = OPERANDS[node.__class__](node)
+            if ready:
+                start = len(values) - len(operands)
+                args = values[start:]
+                del values[start:]
+                values.append(combine(self, node, *args))
+            else:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+        return values[0]
+
+
+class CodeStream:
+    """
+    Append-only list of output lines, written to a spooled temporary file as
+    they are produced rather than kept as separate strings.
+    """
+
+    def __init__(self, max_memory=SPOOL_BYTES):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+")
+        self.lines = 0
+
+    def append(self, line):
+        if self.lines:
+            self.file.write("\n")
+        self.file.write(line)
+        self.lines += 1
+
+    def __len__(self):
+        return self.lines
+
+    def write_to(self, out):
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, out)
+        self.file.seek(0, 2)
+
+    def getvalue(self):
+        self.file.seek(0)
+        text = self.file.read()
+        self.file.seek(0, 2)
+        return text
+
+    def close(self):
+        self.file.close()
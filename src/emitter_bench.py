@@ -0,0 +1,87 @@
+# emitter_bench.py
+import argparse
+import ast
+import gc
+import os
+import time
+import tracemalloc
+
+from src.generator import CppGenerator
+
+STATEMENTS_PER_FUNCTION = 40
+
+# Statement templates cycled through to fill each synthetic function; {i}
+# makes names unique per template position.
+TEMPLATES = [
+    "total{i} = n * {i} + len(xs)",
+    "label{i} = f\"item {{n}} of {i}\"",
+    "for x in xs:\n        total{i} += x * x - {i}",
+    "if total{i} > n and not flag:\n        total{i} = total{i} // 2\n    else:\n        total{i} += 1",
+    "names.append(label{i})",
+    "while total{i} > 1000:\n        total{i} = total{i} - 1000",
+    "result = result + total{i}",
+    "scaled{i} = [x * 2 for x in xs]",
+]
+
+
+def synthetic_module(statements, depth=200):
+    """
+    Returns the source of a module with at least `statements` statements,
+    split into functions, plus one expression nested `depth` levels deep.
+    """
+    body = "\n".join("    " + TEMPLATES[i % len(TEMPLATES)].format(i=i) for i in range(STATEMENTS_PER_FUNCTION))
+    function = ("(n: int, xs: list[int], flag: bool) -> int:\n"
+                "    result = 0\n    names = []\n" + body + "\n    return result")
+    per_function = sum(isinstance(node, ast.stmt) for node in ast.walk(ast.parse("def f" + function)))
+    count = -(-statements // per_function)
+    functions = [f"def f{i}{function}" for i in range(count)]
+    functions.append(f"def deep(n: int) -> int:\n    return {' + '.join(['n'] * depth)}")
+    return "\n\n\n".join(functions) + "\n"
+
+
+def measure(tree, streaming, trace):
+    """
+    Generates C++ for `tree` and returns (seconds, peak traced bytes). Peak
+    memory is only measured when `trace` is set, since tracing slows the run
+    down.
+    """
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    generator = CppGenerator()
+    if streaming:
+        with open(os.devnull, "w") as out:
+            generator.generate_to(tree, out)
+    else:
+        generator.generate(tree)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    generator.code.close()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure emitter throughput on a synthetic module")
+    parser.add_argument("--statements", type=int, default=100000, help="Statements in the synthetic module")
+    parser.add_argument("--depth", type=int, default=200, help="Nesting depth of the deepest expression")
+    args = parser.parse_args()
+
+    source = synthetic_module(args.statements, args.depth)
+    start = time.perf_counter()
+    tree = ast.parse(source)
+    parse_s = time.perf_counter() - start
+    nodes = sum(1 for _ in ast.walk(tree))
+    statements = sum(1 for node in ast.walk(tree) if isinstance(node, ast.stmt))
+    print(f"Synthetic module: {statements} statements, {nodes} nodes, "
+          f"{len(source) / 1e6:.1f} MB of Python, parsed in {parse_s:.2f}s")
+    for name, streaming in (("generate()", False), ("generate_to()", True)):
+        elapsed, _ = measure(tree, streaming, trace=False)
+        _, peak = measure(tree, streaming, trace=True)
+        print(f"{name:<14} {elapsed:6.2f}s  {nodes / elapsed:10.0f} nodes/s  peak {peak / 2**20:7.1f} MiB")
+
+if __name__ == "__main__":
+    main()
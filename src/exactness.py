@@ -0,0 +1,274 @@
+# exactness.py
+import ast
+
+from src.idioms import range_bounds
+from src.inference import BOOL, FLOAT, INT, NONE, NUMERIC, STR, annotation_type, element_type, list_of
+
+# Types whose native values hold exactly what the Python values do.
+SCALARS = (BOOL, INT, FLOAT, STR)
+VALUE_TYPES = SCALARS + tuple(list_of(t) for t in SCALARS)
+
+# Operators whose checked C++ versions match Python on numbers.
+ARITHMETIC_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod)
+COMPARE_OPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+class Inexact(Exception):
+    pass
+
+
+class Exactness:
+    """
+    Checks that a function compiled in checked mode computes what CPython
+    computes, or throws so that the call can be replayed in Python. Only
+    constructs known to lower that way are allowed; `reason` describes the
+    first other one, or is None. `signatures` maps the functions compiled
+    alongside to (parameter types, return type).
+    """
+
+    def __init__(self, function, types, signatures):
+        self.function = function
+        self.types = types
+        self.info = types.functions[function.name]
+        self.signatures = signatures
+        self.returns = annotation_type(function.returns)
+        # Variables of the comprehensions being checked.
+        self.scoped = set()
+        self.reason = None
+        try:
+            self.check_function()
+        except Inexact as e:
+            self.reason = str(e)
+
+    def check_function(self):
+        for name, t in {**self.info.params, **self.info.locals}.items():
+            if t not in VALUE_TYPES:
+                raise Inexact(f"'{name}' has no exact native type")
+        if self.returns != NONE and not terminates(self.function.body):
+            raise Inexact("may return None")
+        self.statements(self.function.body)
+
+    def statements(self, body):
+        for stmt in body:
+            self.statement(stmt)
+
+    def statement(self, node):
+        if isinstance(node, ast.Expr):
+            if isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+                return
+            self.append(node.value)
+        elif isinstance(node, ast.Assign):
+            if len(node.targets) != 1:
+                raise Inexact("assigns several targets at once")
+            self.assign(node.targets[0], node.value)
+        elif isinstance(node, ast.AnnAssign):
+            if node.value is None:
+                raise Inexact(f"declares '{node.target.id}' without a value")
+            self.assign(node.target, node.value)
+        elif isinstance(node, ast.AugAssign):
+            target = self.target(node.target)
+            if self.binop(node.op, target, self.expr(node.value)) != target:
+                raise Inexact("changes the type of a variable with an augmented assignment")
+        elif isinstance(node, ast.Return):
+            if node.value is None or self.expr(node.value) != self.returns:
+                raise Inexact("returns a value of another type than annotated")
+        elif isinstance(node, (ast.If, ast.While)):
+            if isinstance(node, ast.While) and node.orelse:
+                raise Inexact("uses while/else")
+            self.test(node.test)
+            self.statements(node.body)
+            self.statements(node.orelse)
+        elif isinstance(node, ast.For):
+            if node.orelse:
+                raise Inexact("uses for/else")
+            # The C++ loop variable goes out of scope with the loop.
+            inside = {id(n) for n in ast.walk(node)}
+            if any(isinstance(n, ast.Name) and n.id == getattr(node.target, "id", None) and id(n) not in inside
+                   for n in ast.walk(self.function)):
+                raise Inexact(f"uses the loop variable '{node.target.id}' outside its loop")
+            self.loop(node.target, node.iter, node.body)
+            self.statements(node.body)
+        elif not isinstance(node, ast.Pass):
+            raise Inexact(f"uses a {type(node).__name__.lower()} statement")
+
+    def append(self, node):
+        """
+        Allows `xs.append(value)` on a local list as a statement.
+        """
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "append"
+                and isinstance(node.func.value, ast.Name) and len(node.args) == 1 and not node.keywords):
+            raise Inexact("uses an expression statement other than list.append()")
+        items = self.expr(node.func.value)
+        if self.expr(node.args[0]) != element_type(items):
+            raise Inexact("appends a value of another type than the list's elements")
+
+    def assign(self, target, value):
+        t = self.target(target)
+        if isinstance(value, ast.Name) and t.name == "list":
+            # Python would share the list; the native copy would not see changes.
+            raise Inexact(f"makes '{value.id}' and another name share a list")
+        if isinstance(value, ast.List) and not value.elts and t.name == "list":
+            return
+        if self.expr(value) != t:
+            raise Inexact("assigns a value of another type than the variable's")
+
+    def target(self, node):
+        if isinstance(node, ast.Name):
+            return self.info.params.get(node.id) or self.info.locals[node.id]
+        if isinstance(node, ast.Subscript):
+            return self.subscript(node)
+        raise Inexact("assigns to a target other than a name or list item")
+
+    def test(self, node):
+        if self.expr(node) not in NUMERIC:
+            raise Inexact("tests the truth of a value other than a number")
+
+    def loop(self, target, iter, body):
+        """
+        Allows `for target in` a list or a range with constant step, as long
+        as the body rebinds neither the target nor what the loop reads.
+        """
+        if not isinstance(target, ast.Name):
+            raise Inexact("unpacks a loop target")
+        stored = {n.id for stmt in body for n in ast.walk(stmt)
+                  if isinstance(n, ast.Name) and not isinstance(n.ctx, ast.Load)}
+        bounds = range_bounds(iter)
+        if bounds:
+            start, stop, step = bounds
+            if step is not None and not (isinstance(step, ast.Constant) and type(step.value) is int and step.value):
+                raise Inexact("uses range() with a step that is not a nonzero constant")
+            for bound in (start, stop):
+                if bound is not None and self.expr(bound) not in (INT, BOOL):
+                    raise Inexact("uses range() with a bound that is not an int")
+            read = {n.id for bound in (start, stop) if bound is not None
+                    for n in ast.walk(bound) if isinstance(n, ast.Name)}
+        elif isinstance(iter, ast.Name) and self.expr(iter).name == "list":
+            read = {iter.id}
+            for node in (n for stmt in body for n in ast.walk(stmt)):
+                if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and isinstance(node.func.value, ast.Name) and node.func.value.id == iter.id):
+                    raise Inexact(f"changes '{iter.id}' while iterating over it")
+        else:
+            raise Inexact("iterates over something other than a list or range()")
+        if target.id in stored or read & stored:
+            raise Inexact("rebinds a loop variable or bound inside the loop")
+
+    def expr(self, node):
+        """
+        Checks `node` and returns its type.
+        """
+        t = self.types.expr_type(node)
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if isinstance(value, str) and not value.isascii():
+                raise Inexact("uses a non-ASCII string")
+            if type(value) is int and not -2 ** 63 <= value < 2 ** 63:
+                raise Inexact("uses an int literal outside 64 bits")
+            if not isinstance(value, (bool, int, float, str)):
+                raise Inexact(f"uses the constant {value!r}")
+        elif isinstance(node, ast.Name):
+            if node.id not in self.info.params and node.id not in self.info.locals and node.id not in self.scoped:
+                raise Inexact(f"reads '{node.id}', which is not a local")
+        elif isinstance(node, ast.BinOp):
+            t = self.binop(node.op, self.expr(node.left), self.expr(node.right))
+        elif isinstance(node, ast.UnaryOp):
+            t = self.unaryop(node.op, self.expr(node.operand))
+        elif isinstance(node, ast.BoolOp):
+            # `and`/`or` return an operand, which is only a bool for bools.
+            if any(self.expr(value) != BOOL for value in node.values):
+                raise Inexact("uses and/or on values other than bools")
+            t = BOOL
+        elif isinstance(node, ast.Compare):
+            self.compare(node)
+            t = BOOL
+        elif isinstance(node, ast.Call):
+            t = self.call(node)
+        elif isinstance(node, ast.Subscript):
+            t = self.subscript(node)
+        elif isinstance(node, ast.List):
+            if any(self.expr(elt) != element_type(t) for elt in node.elts):
+                raise Inexact("builds a list of mixed types")
+        elif isinstance(node, ast.ListComp):
+            outer = self.scoped
+            for generator in node.generators:
+                self.loop(generator.target, generator.iter, [])
+                self.scoped = self.scoped | {generator.target.id}
+                for condition in generator.ifs:
+                    self.test(condition)
+            if self.expr(node.elt) != element_type(t):
+                raise Inexact("builds a list of mixed types")
+            self.scoped = outer
+        else:
+            raise Inexact(f"uses a {type(node).__name__} expression")
+        if t not in VALUE_TYPES:
+            raise Inexact("computes a value with no exact native type")
+        return t
+
+    def binop(self, op, left, right):
+        if left in NUMERIC and right in NUMERIC and isinstance(op, ARITHMETIC_OPS):
+            if isinstance(op, ast.Div) or FLOAT in (left, right):
+                return FLOAT
+            return INT
+        if left == STR and right == STR and isinstance(op, ast.Add):
+            return STR
+        raise Inexact(f"uses {type(op).__name__} on unsupported operands")
+
+    def unaryop(self, op, operand):
+        if isinstance(op, ast.Not) and operand in NUMERIC:
+            return BOOL
+        if operand == INT or operand == FLOAT and not isinstance(op, ast.Invert):
+            return operand
+        raise Inexact(f"uses {type(op).__name__} on unsupported operands")
+
+    def compare(self, node):
+        if len(node.ops) != 1 or not isinstance(node.ops[0], COMPARE_OPS):
+            raise Inexact("uses a chained, identity or membership comparison")
+        left = self.expr(node.left)
+        right = self.expr(node.comparators[0])
+        # C++ converts an int compared with a float to double, rounding it;
+        # Python compares them exactly.
+        if not ({left, right} <= {BOOL, INT} or left == right and left in (FLOAT, STR)):
+            raise Inexact("compares values of different or unsupported types")
+
+    def subscript(self, node):
+        items = self.expr(node.value)
+        if items.name != "list" or isinstance(node.slice, ast.Slice) or self.expr(node.slice) not in (INT, BOOL):
+            raise Inexact("indexes something other than a list with an int")
+        return element_type(items)
+
+    def call(self, node):
+        func = node.func
+        if node.keywords or not isinstance(func, ast.Name):
+            raise Inexact("calls a method or passes keyword arguments")
+        args = [self.expr(arg) for arg in node.args]
+        name = func.id
+        if name in self.signatures:
+            params, returns = self.signatures[name]
+            if args != params:
+                raise Inexact(f"passes '{name}' arguments of other types than annotated")
+            return returns
+        if name == "len" and len(args) == 1 and (args[0] == STR or args[0].name == "list"):
+            return INT
+        if name in ("min", "max") and len(args) > 1 and len(set(args)) == 1 and args[0] in (INT, FLOAT):
+            return args[0]
+        if name == "float" and len(args) == 1 and args[0] in NUMERIC:
+            return FLOAT
+        if name == "int" and len(args) == 1 and args[0] in (INT, BOOL):
+            return INT
+        if name == "str" and len(args) == 1 and args[0] in (INT, STR):
+            return STR
+        raise Inexact(f"calls {name}() in a way that may not match Python")
+
+
+def terminates(body):
+    """
+    True when every path through `body` ends in a return statement.
+    """
+    if not body:
+        return False
+    last = body[-1]
+    if isinstance(last, ast.Return):
+        return True
+    if isinstance(last, ast.If):
+        return terminates(last.body) and terminates(last.orelse)
+    return False
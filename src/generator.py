@@ -1,16 +1,160 @@
 # generator.py
 import ast
-
-class CppGenerator(ast.NodeVisitor):
-    def __init__(self):
-        self.code = []
+import re
+
+from src.emitter import CodeStream, FastVisitor
+from src.idioms import (
+    REDUCTION_OPS, dumps_format, is_pure, is_request, match_reduction, match_request_comprehension,
+    match_request_loop, range_bounds, simple_generator, step_sign,
+)
+from src.inference import (
+    BOOL, DYNAMIC, FLOAT, INT, NONE, NUMERIC, RESPONSE, STR, STR_METHODS, element_type, infer_module,
+    sum_type,
+)
+from src.json_access import JsonAccess
+from src.ownership import Ownership, is_trivial, stored_names
+
+# Bump whenever the emitted code changes so cached output is regenerated.
+GENERATOR_VERSION = "18"
+
+# Runtime headers that already pull in other headers; those are dropped from
+# the include list when the runtime header is present.
+RUNTIME_HEADERS = {
+    '"requests.hpp"': {'"cpr/cpr.h"', '"nlohmann/json.hpp"'},
+    '"json_select.hpp"': {'"nlohmann/json.hpp"'},
+    '"pyjson.hpp"': {'"nlohmann/json.hpp"'},
+}
+
+
+# Helpers that checked code calls for these operators, which throw where
+# int64_t arithmetic would overflow or a divisor is zero.
+CHECKED_OPS = {ast.Add: "add", ast.Sub: "sub", ast.Mult: "mul", ast.Div: "truediv"}
+
+# C++ spelling and required header of each scalar type.
+SCALAR_TYPES = {
+    INT: ("int64_t", "<cstdint>"),
+    FLOAT: ("double", None),
+    BOOL: ("bool", None),
+    STR: ("std::string", "<string>"),
+    NONE: ("void", None),
+    RESPONSE: ("cpr::Response", '"cpr/cpr.h"'),
+    DYNAMIC: ("nlohmann::json", '"nlohmann/json.hpp"'),
+}
+
+
+def field_names(paths):
+    """
+    Returns a distinct C++ member name for each JSON path, spelled from its
+    steps, e.g. ("user", "login") becomes `user_login_`.
+    """
+    names = []
+    for path in paths:
+        base = re.sub(r"[^0-9A-Za-z]+", "_", "_".join(path)).strip("_") or "value"
+        if base[0].isdigit():
+            base = "at_" + base
+        name = base
+        while f"{name}_" in names:
+            name = f"{base}_{len(names)}"
+        names.append(f"{name}_")
+    return names
+
+
+def cpp_string(text):
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"')
+    escaped = escaped.replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    return f'"{escaped}"'
+
+
+class CppGenerator(FastVisitor):
+    def __init__(self, modules=None, module_name=None, types=None, parallel=True, checked=False):
+        self.code = CodeStream()
         self.indentation_level = 0
         self.headers = set()
+        # Maps the dotted name of every module in a batch to its header path.
+        self.modules = modules or {}
+        self.module_name = module_name
+        self.module_aliases = {}
+        self.declarations = []
+        # Headers the declarations need, which a module's .hpp includes; the
+        # rest of `headers` only goes into its .cpp.
+        self.declaration_headers = set()
+        self.ownership = None
+        self.local_types = {}
+        # Result of type inference; computed from the module when not given.
+        self.types = types
+        self.function_types = None
+        self.declared = set()
+        # Lower side-effect-free loops and comprehensions to parallel
+        # algorithms; when False the output stays strictly sequential.
+        self.parallel = parallel
+        # Throw instead of overflowing, indexing out of bounds or dividing
+        # by zero, wherever C++ would silently differ from Python.
+        self.checked = checked
+        # Assignments whose value was fetched ahead of their loop, mapped to
+        # the expression reading the prefetched value.
+        self.prefetched = {}
+        # Maps id() of each JSON parse in the current function to the name
+        # of the selection of paths it reads, when it does not use them all.
+        self.json_selections = {}
+        # For parses extracted into a struct: id() of the parse mapped to its
+        # Fields, id() of each expression reading a value mapped to its
+        # member, and the local bound to the document mapped to the struct.
+        self.json_records = {}
+        self.record_members = {}
+        self.record_locals = {}
 
     def indent(self):
         return " " * self.indentation_level * 4
 
+    def cpp_type(self, t):
+        """
+        Returns the C++ spelling of an inferred type, recording its headers.
+        Types that could not be inferred become nlohmann::json.
+        """
+        if t is None:
+            t = DYNAMIC
+        if t in SCALAR_TYPES:
+            name, header = SCALAR_TYPES[t]
+            if header:
+                self.headers.add(header)
+            return name
+        if t.name == "list":
+            self.headers.add("<vector>")
+            return f"std::vector<{self.cpp_type(t.args[0])}>"
+        if t.name == "dict":
+            self.headers.add("<unordered_map>")
+            return f"std::unordered_map<{self.cpp_type(t.args[0])}, {self.cpp_type(t.args[1])}>"
+        return self.cpp_type(DYNAMIC)
+
+    def expr_type(self, node):
+        return self.types.expr_type(node)
+
+    def variable_type(self, name):
+        if self.function_types:
+            return self.function_types.locals.get(name)
+        return self.types.globals.get(name)
+
+    def declare(self, name, t):
+        """
+        Returns the declaration prefix for the first assignment to `name`, or
+        an empty string when it is already declared.
+        """
+        if name in self.declared:
+            return ""
+        self.declared.add(name)
+        if name in self.record_locals:
+            self.local_types[name] = self.record_locals[name]
+            return f"{self.record_locals[name]} "
+        if t is None:
+            self.local_types[name] = None
+            return "auto "
+        var_type = self.cpp_type(t)
+        self.local_types[name] = var_type
+        return f"{var_type} "
+
     def visit_Module(self, node):
+        if self.types is None:
+            self.types = infer_module(node)
         for stmt in node.body:
             self.visit(stmt)
 
@@ -18,80 +162,532 @@ class CppGenerator(ast.NodeVisitor):
         for alias in node.names:
             if alias.name == "requests":
                 self.headers.add('"requests.hpp"')
+            elif alias.name == "json":
+                self.headers.add('"nlohmann/json.hpp"')
+            elif alias.name in self.modules:
+                self.headers.add(f'"{self.modules[alias.name]}"')
+                if alias.asname:
+                    self.module_aliases[alias.asname] = alias.name
+                else:
+                    # `import a.b` binds `a`, so the whole prefix resolves.
+                    parts = alias.name.split(".")
+                    for i in range(1, len(parts) + 1):
+                        self.module_aliases[".".join(parts[:i])] = ".".join(parts[:i])
+
+    def visit_ImportFrom(self, node):
+        module = self.resolve_module(node.module, node.level)
+        namespace = module.replace(".", "::")
+        for alias in node.names:
+            submodule = f"{module}.{alias.name}" if module else alias.name
+            if submodule in self.modules:
+                self.headers.add(f'"{self.modules[submodule]}"')
+                self.module_aliases[alias.asname or alias.name] = submodule
+                continue
+            if module not in self.modules:
+                continue
+            self.headers.add(f'"{self.modules[module]}"')
+            if alias.asname:
+                self.code.append(f"{self.indent()}constexpr auto& {alias.asname} = {namespace}::{alias.name};")
+            else:
+                self.code.append(f"{self.indent()}using {namespace}::{alias.name};")
+
+    def resolve_module(self, module, level):
+        if not level:
+            return module
+        package = (self.module_name or "").split(".")
+        if self.modules.get(self.module_name, "").endswith("__init__.hpp"):
+            # Inside a package's __init__, `.` is the package itself.
+            level -= 1
+        package = package[:len(package) - level]
+        if module:
+            package.append(module)
+        return ".".join(p for p in package if p)
 
     def visit_FunctionDef(self, node):
-        return_type = self.visit(node.returns) if node.returns else "void"
+        self.function_types = self.types.functions[node.name]
         function_name = node.name
+        self.ownership = Ownership(node.body, [arg.arg for arg in node.args.args])
+        self.local_types = {}
+        self.declared = set(self.function_types.params)
+        body_headers, self.headers = self.headers, set()
+        return_type = self.cpp_type(self.function_types.returns)
         args = [self.visit(arg) for arg in node.args.args]
-        self.code.append(f"{return_type} {function_name}({', '.join(args)}) {{")
+        signature = f"{return_type} {function_name}({', '.join(args)})"
+        self.declaration_headers |= self.headers
+        self.headers |= body_headers
+        access = JsonAccess(node, {**self.function_types.params, **self.function_types.locals},
+                            self.function_types.returns)
+        for i, (call, paths) in enumerate(access.selections.items()):
+            name = f"{function_name}_selection{i}_"
+            self.json_selections[call] = name
+            self.headers.add('"json_select.hpp"')
+            if call in access.records:
+                self.json_record(f"{function_name}_record{i}_", f"{function_name}_fields{i}_",
+                                 call, access.records[call])
+            self.code.append(f"static const json_select::Selection {name}{{{', '.join(map(cpp_string, paths))}}};")
+        self.declarations.append(f"{signature};")
+        self.code.append(f"{signature} {{")
         self.indentation_level += 1
+        if self.checked:
+            self.headers.add('"pyops.hpp"')
+            self.code.append(f"{self.indent()}pyops::CallDepth depth_;")
+        for name in self.function_types.hoisted:
+            var_type = self.record_locals.get(name) or self.cpp_type(self.variable_type(name))
+            self.declared.add(name)
+            self.local_types[name] = var_type
+            self.code.append(f"{self.indent()}{var_type} {name}{{}};")
         for stmt in node.body:
             self.visit(stmt)
         self.indentation_level -= 1
         self.code.append("}")
+        self.ownership = None
+        self.function_types = None
+        self.declared = set()
+        self.json_selections = {}
+        self.json_records = {}
+        self.record_members = {}
+        self.record_locals = {}
+
+    def json_record(self, struct, fields, call, record):
+        """
+        Emits the struct a parse is extracted into, with one member per
+        path, and records how the function's reads map onto it.
+        """
+        members = field_names([path for path, _ in record.fields])
+        self.code.append(f"struct {struct} {{")
+        for member, (_, t) in zip(members, record.fields):
+            self.code.append(f"    {self.cpp_type(t)} {member};")
+        self.code.append("};")
+        pointers = ", ".join(f"&{struct}::{member}" for member in members)
+        self.code.append(f"static const json_select::Fields<{struct}> {fields}{{{pointers}}};")
+        self.json_records[call] = fields
+        for leaf, index in record.leaves.items():
+            self.record_members[leaf] = members[index]
+        if record.name is not None:
+            self.record_locals[record.name] = struct
 
     def visit_arg(self, node):
-        arg_type = self.visit(node.annotation)
+        arg_type = self.cpp_type(self.function_types.params[node.arg])
+        self.local_types[node.arg] = arg_type
+        if self.ownership and not is_trivial(arg_type) and self.ownership.is_readonly(node.arg):
+            return f"const {arg_type}& {node.arg}"
         return f"{arg_type} {node.arg}"
 
     def visit_Name(self, node):
-        if node.id == 'int':
-            return 'int'
-        elif node.id == 'str':
-            self.headers.add("<string>")
-            return 'std::string'
-        elif node.id == 'dict':
-            self.headers.add('"nlohmann/json.hpp"')
-            return 'nlohmann::json'
+        if self.ownership and id(node) in self.ownership.moves:
+            var_type = self.local_types.get(node.id)
+            if var_type and not is_trivial(var_type):
+                self.headers.add("<utility>")
+                return f"std::move({node.id})"
         return node.id
 
     def visit_Constant(self, node):
         if isinstance(node.value, str):
-            return f'"{node.value}"'
+            return cpp_string(node.value)
+        if isinstance(node.value, bool):
+            return "true" if node.value else "false"
+        if node.value is None:
+            return "nullptr"
         return str(node.value)
 
     def visit_JoinedStr(self, node):
         return " + ".join([self.visit(value) for value in node.values])
 
     def visit_FormattedValue(self, node):
-        return self.visit(node.value)
-
-    def visit_Assign(self, node):
-        target = self.visit(node.targets[0])
         value = self.visit(node.value)
-        if "requests::get" in value:
-            self.headers.add('"cpr/cpr.h"')
-            var_type = "cpr::Response"
-        else:
-            var_type = "int"
+        if self.expr_type(node.value) in NUMERIC:
+            self.headers.add("<string>")
+            return f"std::to_string({value})"
+        return value
 
-        self.code.append(f"{self.indent()}{var_type} {target} = {value};")
+    def visit_List(self, node):
+        return f"{{{', '.join(self.visit(elt) for elt in node.elts)}}}"
+
+    def visit_Dict(self, node):
+        items = [f"{{{self.visit(k)}, {self.visit(v)}}}" for k, v in zip(node.keys, node.values)]
+        return f"{{{', '.join(items)}}}"
+
+    def visit_Assign(self, node):
+        value = self.prefetched.pop(id(node), None) or self.visit(node.value)
+        for target_node in node.targets:
+            target = self.visit(target_node)
+            prefix = ""
+            if isinstance(target_node, ast.Name):
+                prefix = self.declare(target, self.variable_type(target))
+            self.code.append(f"{self.indent()}{prefix}{target} = {value};")
+
+    def visit_AnnAssign(self, node):
+        target = self.visit(node.target)
+        prefix = ""
+        if isinstance(node.target, ast.Name):
+            prefix = self.declare(target, self.variable_type(target))
+        if node.value is None:
+            if prefix:
+                self.code.append(f"{self.indent()}{prefix}{target}{{}};")
+            return
+        self.code.append(f"{self.indent()}{prefix}{target} = {self.visit(node.value)};")
 
     def visit_Call(self, node):
+        reduction = self.visit_reduction_call(node)
+        if reduction is not None:
+            return reduction
         func = self.visit(node.func)
         args = [self.visit(arg) for arg in node.args]
-        if func == "requests.get":
-            return f"requests::get({', '.join(args)})"
-        elif func.endswith(".json"):
-            obj = func.replace(".json", "")
+        builtin = self.visit_builtin(node, args)
+        if builtin is not None:
+            return builtin
+        if is_request(node, "get") or is_request(node, "post"):
+            options = self.request_options(node)
+            return f"requests::{node.func.attr}({', '.join(args + options)})"
+        elif id(node) in self.json_selections:
+            text = args[0] if func == "json.loads" else f"{self.visit(node.func.value)}.text"
+            if id(node) in self.json_records:
+                return (f"json_select::extract({text}, {self.json_selections[id(node)]}, "
+                        f"{self.json_records[id(node)]})")
+            return f"json_select::parse({text}, {self.json_selections[id(node)]})"
+        elif func == "json.loads":
+            return f"nlohmann::json::parse({', '.join(args)})"
+        elif func == "json.dumps":
+            return self.json_dumps(node, args[0])
+        elif isinstance(node.func, ast.Attribute) and node.func.attr == "json":
             self.headers.add('"nlohmann/json.hpp"')
-            return f"nlohmann::json::parse({obj}.text)"
+            return f"nlohmann::json::parse({self.visit(node.func.value)}.text)"
         return f"{func}({', '.join(args)})"
 
+    def visit_builtin(self, node, args):
+        """
+        Lowers calls to builtins and container methods whose C++ spelling
+        depends on the argument types. Returns None for any other call.
+        """
+        func = node.func
+        if isinstance(func, ast.Name) and len(args) == 1:
+            arg_type = self.expr_type(node.args[0])
+            if func.id == "len":
+                self.headers.add("<cstdint>")
+                return f"static_cast<int64_t>({args[0]}.size())"
+            if func.id == "str":
+                if arg_type in NUMERIC:
+                    self.headers.add("<string>")
+                    return f"std::to_string({args[0]})"
+                return args[0] if arg_type == STR else None
+            if func.id in ("int", "float"):
+                target = INT if func.id == "int" else FLOAT
+                if arg_type == STR:
+                    self.headers.add("<string>")
+                    return f"std::{'stoll' if target == INT else 'stod'}({args[0]})"
+                if arg_type in NUMERIC:
+                    return f"static_cast<{self.cpp_type(target)}>({args[0]})"
+        if isinstance(func, ast.Attribute):
+            receiver = self.expr_type(func.value)
+            if receiver and receiver.name == "list" and func.attr == "append" and len(args) == 1:
+                return f"{self.visit(func.value)}.push_back({args[0]})"
+            if (receiver == STR and func.attr in STR_METHODS and not node.keywords
+                    and len(args) in STR_METHODS[func.attr][1]):
+                self.headers.add('"pyops.hpp"')
+                return f"pyops::{func.attr}({', '.join([self.visit(func.value)] + args)})"
+        return None
+
+    def json_dumps(self, node, value):
+        """
+        Lowers json.dumps() to pyjson::dumps, which writes Python's format
+        rather than nlohmann's compact one. Options it cannot lower are
+        reported by inference and left at their defaults.
+        """
+        self.headers.add('"pyjson.hpp"')
+        options = dumps_format(node)
+        if options is None or options == (-1, ", ", ": ", True):
+            return f"pyjson::dumps({value})"
+        indent, item, key, ensure_ascii = options
+        fields = [str(indent), cpp_string(item), cpp_string(key), "true" if ensure_ascii else "false"]
+        return f"pyjson::dumps({value}, pyjson::Format{{{', '.join(fields)}}})"
+
+    def request_options(self, node):
+        """
+        Lowers the keyword arguments of requests.get/post to the option types
+        of the requests.hpp runtime.
+        """
+        options = []
+        for keyword in node.keywords:
+            value = keyword.value
+            if keyword.arg in ("params", "headers") or (keyword.arg == "data" and self.is_mapping(value)):
+                kind = {"params": "Params", "headers": "Headers", "data": "Form"}[keyword.arg]
+                if isinstance(value, ast.Dict):
+                    items = [f"{{{self.visit(k)}, {self.string_value(v)}}}" for k, v in zip(value.keys, value.values)]
+                    options.append(f"requests::{kind}{{{', '.join(items)}}}")
+                else:
+                    options.append(f"requests::{kind}({self.visit(value)})")
+            elif keyword.arg == "data":
+                options.append(f"requests::Body{{{self.visit(value)}}}")
+            elif keyword.arg == "json":
+                self.headers.add('"nlohmann/json.hpp"')
+                options.append(f"requests::Json{{nlohmann::json({self.visit(value)})}}")
+            elif keyword.arg == "timeout":
+                options.append(f"requests::Timeout({self.visit(value)})")
+        return options
+
+    def is_mapping(self, node):
+        t = self.expr_type(node)
+        return isinstance(node, ast.Dict) or (t is not None and t.name == "dict")
+
+    def string_value(self, node):
+        value = self.visit(node)
+        if self.expr_type(node) in NUMERIC:
+            self.headers.add("<string>")
+            return f"std::to_string({value})"
+        return value
+
+    def batched_requests(self, generator, call):
+        """
+        Returns a call to requests::map_get that issues the request of every
+        iteration concurrently, with the URL computed per element.
+        """
+        url = self.lambda_expr(generator.target, call.args[0], generator.iter)
+        options = self.request_options(call)
+        return f"requests::map_get({', '.join([self.visit(generator.iter), url] + options)})"
+
+    def is_list(self, node):
+        t = self.expr_type(node)
+        return isinstance(node, ast.Name) and t is not None and t.name == "list"
+
+    def execution_policy(self, iter_node, body=None):
+        """
+        Returns the execution policy for an algorithm over `iter_node` that
+        evaluates `body` per element. Vectorized execution may not allocate,
+        so `par_unseq` is kept for bodies that only compute with numbers.
+        """
+        self.headers.add("<execution>")
+        types = [element_type(self.expr_type(iter_node))]
+        if body is not None:
+            types += [self.expr_type(n) for n in ast.walk(body) if isinstance(n, ast.expr)]
+        if all(t is None or t in NUMERIC for t in types) and types[0] is not None:
+            return "std::execution::par_unseq, "
+        return "std::execution::par, "
+
+    def reorderable(self, t):
+        """
+        True when parallel algorithms may regroup sums and products of `t`.
+        Integer arithmetic is associative; float arithmetic rounds
+        differently when regrouped, while Python adds strictly in order.
+        """
+        return t in (INT, BOOL)
+
+    def lambda_expr(self, target, body, iter_node):
+        """
+        Returns a lambda taking one element of `iter_node` as `target` and
+        returning `body`.
+        """
+        element = element_type(self.expr_type(iter_node))
+        if element in NUMERIC:
+            param = f"{self.cpp_type(element)} {target.id}"
+        else:
+            param = f"const auto& {target.id}"
+        return f"[&]({param}) {{ return {self.visit(body)}; }}"
+
+    def comprehension_loops(self, node, body):
+        """
+        Returns the nested loops of a comprehension around `body`.
+        """
+        parts = []
+        closing = 0
+        for generator in node.generators:
+            parts.append(self.loop_header(generator.target, generator.iter) + " {")
+            closing += 1
+            for condition in generator.ifs:
+                parts.append(f"if ({self.visit(condition)}) {{")
+                closing += 1
+        return " ".join(parts + [body] + ["}"] * closing)
+
+    def reserve_size(self, node):
+        generator = simple_generator(node)
+        if generator is None:
+            return None
+        if self.is_list(generator.iter):
+            return f"{generator.iter.id}.size()"
+        bounds = range_bounds(generator.iter)
+        if bounds and bounds[2] is None and isinstance(bounds[1], (ast.Name, ast.Constant)):
+            start, stop, _ = bounds
+            self.headers.add("<algorithm>")
+            if start is None:
+                return f"std::max<int64_t>({self.visit(stop)}, 0)"
+            if isinstance(start, (ast.Name, ast.Constant)):
+                return f"std::max<int64_t>({self.visit(stop)} - {self.visit(start)}, 0)"
+        return None
+
+    def visit_ListComp(self, node):
+        requests = match_request_comprehension(node, self.expr_type)
+        if requests:
+            generator, call, parse_json = requests
+            batched = self.batched_requests(generator, call)
+            return f"requests::json_all({batched})" if parse_json else batched
+        out_type = self.cpp_type(self.expr_type(node))
+        generator = simple_generator(node)
+        if (self.parallel and generator and not generator.ifs and self.is_list(generator.iter)
+                and is_pure(node.elt, self.expr_type) and self.expr_type(node.elt) != BOOL):
+            # std::vector<bool> packs its items into shared words, which
+            # threads cannot write concurrently.
+            iterable = generator.iter.id
+            self.headers.add("<algorithm>")
+            function = self.lambda_expr(generator.target, node.elt, generator.iter)
+            return (f"[&] {{ {out_type} out_({iterable}.size()); "
+                    f"std::transform({self.execution_policy(generator.iter, node.elt)}{iterable}.begin(), {iterable}.end(), "
+                    f"out_.begin(), {function}); return out_; }}()")
+        parts = [f"{out_type} out_;"]
+        size = self.reserve_size(node)
+        if size:
+            parts.append(f"out_.reserve({size});")
+        parts.append(self.comprehension_loops(node, f"out_.emplace_back({self.visit(node.elt)});"))
+        return f"[&] {{ {' '.join(parts)} return out_; }}()"
+
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_reduction_call(self, node):
+        """
+        Lowers sum(), min(), max(), any() and all() over lists and generator
+        expressions to standard algorithms. Returns None for other calls.
+        """
+        func = node.func
+        if not (isinstance(func, ast.Name) and func.id in ("sum", "min", "max", "any", "all")
+                and node.args and not node.keywords):
+            return None
+        if func.id in ("min", "max") and len(node.args) > 1:
+            self.headers.add("<algorithm>")
+            result = self.cpp_type(self.expr_type(node))
+            args = ", ".join(self.visit(arg) for arg in node.args)
+            return f"std::{func.id}<{result}>({{{args}}})"
+        if len(node.args) != 1:
+            return None
+        arg = node.args[0]
+        if self.is_list(arg):
+            return self.reduce_list(func.id, arg)
+        if isinstance(arg, (ast.GeneratorExp, ast.ListComp)):
+            return self.reduce_generator(func.id, arg)
+        return None
+
+    def reduce_list(self, name, arg):
+        iterable = arg.id
+        begin_end = f"{iterable}.begin(), {iterable}.end()"
+        policy = self.execution_policy(arg) if self.parallel else ""
+        element = element_type(self.expr_type(arg))
+        if name == "sum":
+            if element not in NUMERIC:
+                return None
+            self.headers.add("<numeric>")
+            init = f"{self.cpp_type(sum_type(element))}{{}}"
+            if self.parallel and self.reorderable(element):
+                return f"std::reduce({policy}{begin_end}, {init})"
+            return f"std::accumulate({begin_end}, {init})"
+        self.headers.add("<algorithm>")
+        if name in ("min", "max"):
+            return f"*std::{name}_element({policy}{begin_end})"
+        truth = "!v.empty()" if element == STR else "static_cast<bool>(v)"
+        return f"std::{name}_of({policy}{begin_end}, [](const auto& v) {{ return {truth}; }})"
+
+    def reduce_generator(self, name, node):
+        generator = simple_generator(node)
+        result = self.expr_type(node.elt)
+        if name == "sum":
+            result = sum_type(result)
+        if (self.parallel and generator and not generator.ifs and self.is_list(generator.iter)
+                and is_pure(node.elt, self.expr_type)
+                and (name in ("any", "all") or result in NUMERIC and (name != "sum" or self.reorderable(result)))):
+            iterable = generator.iter.id
+            begin_end = f"{iterable}.begin(), {iterable}.end()"
+            policy = self.execution_policy(generator.iter, node.elt)
+            function = self.lambda_expr(generator.target, node.elt, generator.iter)
+            if name in ("any", "all"):
+                self.headers.add("<algorithm>")
+                return f"std::{name}_of({policy}{begin_end}, {function})"
+            self.headers.add("<numeric>")
+            result_type = self.cpp_type(result)
+            if name == "sum":
+                return f"std::transform_reduce({policy}{begin_end}, {result_type}{{}}, std::plus<>(), {function})"
+            self.headers.update({"<algorithm>", "<limits>"})
+            init = f"std::numeric_limits<{result_type}>::{'max' if name == 'min' else 'lowest'}()"
+            combine = f"[]({result_type} a, {result_type} b) {{ return std::{name}(a, b); }}"
+            return f"std::transform_reduce({policy}{begin_end}, {init}, {combine}, {function})"
+        return self.reduce_loop(name, node, result)
+
+    def reduce_loop(self, name, node, result):
+        value = self.visit(node.elt)
+        if name == "any":
+            body = f"if ({value}) {{ return true; }}"
+            return f"[&] {{ {self.comprehension_loops(node, body)} return false; }}()"
+        if name == "all":
+            body = f"if (!({value})) {{ return false; }}"
+            return f"[&] {{ {self.comprehension_loops(node, body)} return true; }}()"
+        result_type = self.cpp_type(result)
+        if name == "sum":
+            body = f"acc_ += {value};"
+            return f"[&] {{ {result_type} acc_{{}}; {self.comprehension_loops(node, body)} return acc_; }}()"
+        compare = "<" if name == "min" else ">"
+        body = (f"{result_type} v_ = {value}; "
+                f"if (first_ || v_ {compare} best_) {{ best_ = v_; first_ = false; }}")
+        return (f"[&] {{ bool first_ = true; {result_type} best_{{}}; "
+                f"{self.comprehension_loops(node, body)} return best_; }}()")
+
     def visit_Attribute(self, node):
-        value = self.visit(node.value)
+        return self.fold(node)
+
+    def fold_Attribute(self, node, value):
+        if value in self.module_aliases:
+            module = self.module_aliases[value]
+            if f"{module}.{node.attr}" in self.modules:
+                return f"{module}.{node.attr}"
+            return f"{module.replace('.', '::')}::{node.attr}"
         return f"{value}.{node.attr}"
 
+    def visit_Expr(self, node):
+        if isinstance(node.value, ast.Constant):
+            # Docstrings and other bare literals have no effect.
+            return
+        self.code.append(f"{self.indent()}{self.visit(node.value)};")
+
     def visit_Return(self, node):
         value = self.visit(node.value)
         self.code.append(f"{self.indent()}return {value};")
 
     def visit_BinOp(self, node):
-        left = self.visit(node.left)
+        return self.fold(node)
+
+    def fold_BinOp(self, node, left, right):
+        special = self.arithmetic(node.op, left, right, self.expr_type(node.left), self.expr_type(node.right))
+        if special is not None:
+            return special
         op = self.visit(node.op)
-        right = self.visit(node.right)
+        if (isinstance(node.op, ast.Div) and self.expr_type(node.left) in (INT, BOOL)
+                and self.expr_type(node.right) in (INT, BOOL)):
+            # Python's `/` is true division even between integers.
+            left = f"static_cast<double>({left})"
         return f"{left} {op} {right}"
 
+    def arithmetic(self, op, left, right, left_type, right_type):
+        """
+        Returns the C++ for a numeric `left op right` whose C++ operator
+        differs from Python's, or None when the plain operator matches.
+        """
+        if left_type not in NUMERIC or right_type not in NUMERIC:
+            return None
+        if isinstance(op, (ast.FloorDiv, ast.Mod)):
+            # C++ division truncates toward zero; Python's `//` and `%` floor.
+            self.headers.add('"pyops.hpp"')
+            helper = "floordiv" if isinstance(op, ast.FloorDiv) else "mod"
+            return f"pyops::{helper}({left}, {right})"
+        if self.checked and type(op) in CHECKED_OPS:
+            if isinstance(op, ast.Div) or FLOAT not in (left_type, right_type):
+                self.headers.add('"pyops.hpp"')
+                return f"pyops::{CHECKED_OPS[type(op)]}({left}, {right})"
+        return None
+
+    def visit_UnaryOp(self, node):
+        return self.fold(node)
+
+    def fold_UnaryOp(self, node, operand):
+        if self.checked and isinstance(node.op, ast.USub) and self.expr_type(node.operand) == INT:
+            self.headers.add('"pyops.hpp"')
+            return f"pyops::neg({operand})"
+        op = {ast.USub: "-", ast.UAdd: "+", ast.Not: "!", ast.Invert: "~"}[type(node.op)]
+        return f"{op}{operand}"
+
     def visit_Add(self, node):
         return "+"
 
@@ -104,6 +700,19 @@ class CppGenerator(ast.NodeVisitor):
     def visit_Div(self, node):
         return "/"
 
+    def visit_FloorDiv(self, node):
+        return "/"
+
+    def visit_Mod(self, node):
+        return "%"
+
+    def visit_BoolOp(self, node):
+        return self.fold(node)
+
+    def fold_BoolOp(self, node, *values):
+        op = " && " if isinstance(node.op, ast.And) else " || "
+        return op.join(values)
+
     def visit_If(self, node):
         test = self.visit(node.test)
         self.code.append(f"{self.indent()}if ({test}) {{")
@@ -121,12 +730,35 @@ class CppGenerator(ast.NodeVisitor):
         else:
             self.code.append(f"{self.indent()}}}")
 
+    def visit_While(self, node):
+        test = self.visit(node.test)
+        self.code.append(f"{self.indent()}while ({test}) {{")
+        self.indentation_level += 1
+        for stmt in node.body:
+            self.visit(stmt)
+        self.indentation_level -= 1
+        self.code.append(f"{self.indent()}}}")
+
     def visit_Compare(self, node):
-        left = self.visit(node.left)
+        return self.fold(node)
+
+    def fold_Compare(self, node, left, right):
+        if isinstance(node.ops[0], (ast.In, ast.NotIn)):
+            return self.membership(left, right, node.comparators[0], isinstance(node.ops[0], ast.NotIn))
         op = self.visit(node.ops[0])
-        right = self.visit(node.comparators[0])
         return f"{left} {op} {right}"
 
+    def membership(self, item, container, container_node, negate):
+        t = self.expr_type(container_node)
+        if t == STR:
+            found = f"{container}.find({item}) != std::string::npos"
+        elif t is not None and t.name == "dict" or t == DYNAMIC:
+            found = f"{container}.count({item}) != 0"
+        else:
+            self.headers.add("<algorithm>")
+            found = f"std::find({container}.begin(), {container}.end(), {item}) != {container}.end()"
+        return f"!({found})" if negate else found
+
     def visit_Gt(self, node):
         return ">"
 
@@ -146,39 +778,185 @@ class CppGenerator(ast.NodeVisitor):
         return "<="
 
     def visit_Subscript(self, node):
+        if id(node) in self.record_members:
+            document = node.value
+            while isinstance(document, ast.Subscript):
+                document = document.value
+            return f"{self.visit(document)}.{self.record_members[id(node)]}"
         value = self.visit(node.value)
         slice = self.visit(node.slice)
-        if value == "list":
-            self.headers.add("<vector>")
-            return f"std::vector<{slice}>"
+        t = self.expr_type(node.value)
+        if self.checked and t is not None and t.name == "list":
+            self.headers.add('"pyops.hpp"')
+            return f"pyops::at({value}, {slice})"
+        if isinstance(node.ctx, ast.Load) and t is not None and t.name == "dict":
+            # Reading a missing key is an error in Python, and operator[]
+            # would insert it (and cannot be used on a const reference).
+            return f"{value}.at({slice})"
         return f"{value}[{slice}]"
 
+    def loop_header(self, target_node, iter_node, binding="const auto&"):
+        """
+        Returns the `for (...)` header binding `target_node` to each element
+        of `iter_node`; range() becomes a counted loop.
+        """
+        bounds = range_bounds(iter_node)
+        if bounds and isinstance(target_node, ast.Name):
+            return self.range_header(target_node.id, *bounds)
+        if isinstance(target_node, ast.Tuple):
+            target = f"[{', '.join(self.visit(elt) for elt in target_node.elts)}]"
+        else:
+            target = self.visit(target_node)
+        iter = self.visit(iter_node)
+        iter_type = self.expr_type(iter_node)
+        if iter_type is not None and iter_type.name == "dict" and isinstance(target_node, ast.Name):
+            # Iterating a dict yields its keys.
+            return f"for (const auto& [{target}, {target}_value_] : {iter})"
+        element = element_type(iter_type)
+        if binding != "auto&" and element in NUMERIC and isinstance(target_node, ast.Name):
+            # Scalars are cheaper to copy than to reference.
+            binding = self.cpp_type(element)
+        return f"for ({binding} {target} : {iter})"
+
+    def range_header(self, name, start, stop, step):
+        self.headers.add("<cstdint>")
+        start = self.visit(start) if start else "0"
+        limit = self.visit(stop)
+        init = f"int64_t {name} = {start}"
+        if not isinstance(stop, (ast.Name, ast.Constant)):
+            # range() evaluates its bounds once.
+            init += f", {name}_stop = {limit}"
+            limit = f"{name}_stop"
+        sign = step_sign(step)
+        if sign == 1:
+            condition = f"{name} < {limit}"
+        elif sign == -1:
+            condition = f"{name} > {limit}"
+        else:
+            condition = f"({self.visit(step)} > 0 ? {name} < {limit} : {name} > {limit})"
+        increment = f"++{name}" if step is None else f"{name} += {self.visit(step)}"
+        return f"for ({init}; {condition}; {increment})"
+
     def visit_For(self, node):
-        target = self.visit(node.target)
-        iter = self.visit(node.iter)
-        # This is a simplification. We are assuming the type is `int`.
-        self.code.append(f"{self.indent()}for (auto {target} : {iter}) {{")
+        reduction = match_reduction(node, self.expr_type) if self.parallel else None
+        if (reduction and self.is_list(node.iter) and reduction.accumulator in self.declared
+                and self.reorderable(self.variable_type(reduction.accumulator))):
+            self.code.append(f"{self.indent()}{reduction.accumulator} = {self.reduce_loop_expr(reduction)};")
+            return
+        requests = match_request_loop(node, self.expr_type) if self.is_list(node.iter) else None
+        if requests:
+            assign, call = requests
+            name = assign.targets[0].id
+            self.headers.add("<cstddef>")
+            self.code.append(f"{self.indent()}auto {name}_batch = {self.batched_requests(node, call)};")
+            self.code.append(f"{self.indent()}std::size_t {name}_index = 0;")
+            self.prefetched[id(assign)] = f"std::move({name}_batch[{name}_index++])"
+            self.headers.add("<utility>")
+        binding = self.ownership.loop_binding(node) if self.ownership else "const auto&"
+        names = stored_names(node.target)
+        body_prefix = []
+        if range_bounds(node.iter) and any(n in Ownership(node.body).rebound for n in names):
+            # Rebinding the loop variable must not change the iteration.
+            counter = f"{node.target.id}_"
+            header = self.loop_header(ast.Name(id=counter, ctx=ast.Store()), node.iter)
+            body_prefix.append(f"int64_t {node.target.id} = {counter};")
+        else:
+            header = self.loop_header(node.target, node.iter, binding)
+        self.code.append(f"{self.indent()}{header} {{")
         self.indentation_level += 1
+        outer_declared = set(self.declared)
+        self.declared.update(names)
+        for line in body_prefix:
+            self.code.append(f"{self.indent()}{line}")
         for stmt in node.body:
             self.visit(stmt)
+        self.declared = outer_declared
         self.indentation_level -= 1
         self.code.append(f"{self.indent()}}}")
 
+    def reduce_loop_expr(self, reduction):
+        iterable = reduction.loop.iter.id
+        begin_end = f"{iterable}.begin(), {iterable}.end()"
+        policy = self.execution_policy(reduction.loop.iter, reduction.value)
+        accumulator = reduction.accumulator
+        combine, _ = REDUCTION_OPS[type(reduction.op)]
+        self.headers.add("<numeric>")
+        target = reduction.loop.target
+        if isinstance(reduction.value, ast.Name) and reduction.value.id == target.id:
+            if isinstance(reduction.op, ast.Add):
+                return f"std::reduce({policy}{begin_end}, {accumulator})"
+            return f"std::reduce({policy}{begin_end}, {accumulator}, {combine})"
+        function = self.lambda_expr(target, reduction.value, reduction.loop.iter)
+        return f"std::transform_reduce({policy}{begin_end}, {accumulator}, {combine}, {function})"
+
     def visit_AugAssign(self, node):
         target = self.visit(node.target)
-        op = self.visit(node.op)
         value = self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            target_type = self.variable_type(node.target.id)
+        else:
+            target_type = self.expr_type(node.target)
+        special = self.arithmetic(node.op, target, value, target_type, self.expr_type(node.value))
+        if special is not None:
+            self.code.append(f"{self.indent()}{target} = {special};")
+            return
+        op = self.visit(node.op)
         self.code.append(f"{self.indent()}{target} {op}= {value};")
 
+    def include_lines(self, headers=None):
+        if headers is None:
+            headers = self.headers
+        provided = set()
+        for header in headers:
+            provided |= RUNTIME_HEADERS.get(header, set())
+        sorted_headers = sorted(headers - provided)
+        return [f"#include {h}" for h in sorted_headers]
+
     def generate(self, node):
         self.visit(node)
-        sorted_headers = sorted(list(self.headers))
-        header_str = "\n".join([f"#include {h}" for h in sorted_headers])
+        header_str = "\n".join(self.include_lines())
         if header_str:
-            return f"{header_str}\n\n" + "\n".join(self.code)
-        return "\n".join(self.code)
-
-
-def generate_cpp(ast_tree):
-    generator = CppGenerator()
+            return f"{header_str}\n\n" + self.code.getvalue()
+        return self.code.getvalue()
+
+    def generate_to(self, node, out):
+        """
+        Like generate(), but writes to the file object `out`. The body is
+        spooled while it is generated and copied after the include
+        prologue, so the output is never held as one string.
+        """
+        self.visit(node)
+        header_str = "\n".join(self.include_lines())
+        if header_str:
+            out.write(f"{header_str}\n\n")
+        self.code.write_to(out)
+
+    def generate_module(self, node):
+        """
+        Generates a header of declarations and a source file for one module
+        of a batch, both wrapped in the module's namespace. The header only
+        includes what the declarations need, so that modules depending on it
+        do not also parse the headers its implementation uses.
+        """
+        self.visit(node)
+        namespace = self.module_name.replace(".", "::")
+        header = ["#pragma once", ""]
+        includes = self.include_lines(self.declaration_headers)
+        if includes:
+            header += includes + [""]
+        header += [f"namespace {namespace} {{", ""]
+        if self.declarations:
+            header += self.declarations + [""]
+        header.append(f"}} // namespace {namespace}")
+        source = [f'#include "{self.modules[self.module_name]}"']
+        source += self.include_lines(self.headers - self.declaration_headers)
+        source += ["", f"namespace {namespace} {{", ""]
+        if self.code:
+            source += [self.code.getvalue(), ""]
+        source.append(f"}} // namespace {namespace}")
+        return "\n".join(header) + "\n", "\n".join(source) + "\n"
+
+
+def generate_cpp(ast_tree, parallel=True):
+    generator = CppGenerator(parallel=parallel)
     return generator.generate(ast_tree)
\ No newline at end of file
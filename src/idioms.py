@@ -0,0 +1,245 @@
+# idioms.py
+import ast
+
+# Builtins and methods that neither mutate their arguments nor have other
+# side effects, so calls to them may run in any order or in parallel.
+# Methods are keyed by the inferred type of their receiver.
+PURE_FUNCTIONS = {"abs", "min", "max", "len", "int", "float", "bool", "str", "round"}
+PURE_METHODS = {
+    "str": {"upper", "lower", "strip", "lstrip", "rstrip", "startswith", "endswith", "find",
+            "count", "replace", "split", "join"},
+    "dict": {"get"},
+    "list": {"count"},
+}
+
+REDUCTION_OPS = {ast.Add: ("std::plus<>()", "0"), ast.Mult: ("std::multiplies<>()", "1")}
+
+
+def no_types(node):
+    return None
+
+
+def is_pure(node, expr_type=no_types):
+    """
+    Returns True when evaluating `node` cannot have side effects.
+    `expr_type` maps an expression to its inferred type; a method call is
+    only pure on a receiver known to be a str, dict or list.
+    """
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            func = child.func
+            if child.keywords:
+                return False
+            if isinstance(func, ast.Name) and func.id in PURE_FUNCTIONS:
+                continue
+            if isinstance(func, ast.Attribute):
+                receiver = expr_type(func.value)
+                if receiver is not None and func.attr in PURE_METHODS.get(receiver.name, ()):
+                    continue
+            return False
+        if isinstance(child, (ast.NamedExpr, ast.Await, ast.Yield, ast.YieldFrom, ast.Lambda)):
+            return False
+    return True
+
+
+def reads(node, name):
+    return any(isinstance(n, ast.Name) and n.id == name for n in ast.walk(node))
+
+
+def writes(node, name):
+    """
+    True when `node` rebinds `name` or stores into or deletes one of its
+    items or attributes.
+    """
+    if not isinstance(getattr(node, "ctx", None), (ast.Store, ast.Del)):
+        return False
+    if isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return isinstance(node, ast.Name) and node.id == name
+
+
+class Reduction:
+    """
+    A loop of the form `for x in xs: acc <op>= f(x)`.
+    """
+
+    def __init__(self, loop, accumulator, op, value):
+        self.loop = loop
+        self.accumulator = accumulator
+        self.op = op
+        self.value = value
+
+
+def match_reduction(loop, expr_type=no_types):
+    """
+    Recognizes a for loop whose body only folds a side-effect-free function
+    of the loop variable into an accumulator with + or *.
+    """
+    if loop.orelse or len(loop.body) != 1 or not isinstance(loop.target, ast.Name):
+        return None
+    stmt = loop.body[0]
+    if not (isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name)
+            and type(stmt.op) in REDUCTION_OPS):
+        return None
+    accumulator = stmt.target.id
+    if accumulator == loop.target.id or reads(stmt.value, accumulator) or reads(loop.iter, accumulator):
+        return None
+    if not is_pure(stmt.value, expr_type) or not is_pure(loop.iter, expr_type):
+        return None
+    return Reduction(loop, accumulator, stmt.op, stmt.value)
+
+
+def is_identity(comprehension_elt, target):
+    return isinstance(comprehension_elt, ast.Name) and comprehension_elt.id == target.id
+
+
+def simple_generator(node):
+    """
+    Returns the single generator of a comprehension when it iterates one
+    container with a plain variable, else None.
+    """
+    if len(node.generators) != 1:
+        return None
+    generator = node.generators[0]
+    if generator.is_async or not isinstance(generator.target, ast.Name):
+        return None
+    return generator
+
+
+def range_bounds(node):
+    """
+    Returns (start, stop, step) expressions for a call to range(), or None.
+    """
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id == "range" and 1 <= len(node.args) <= 3 and not node.keywords):
+        return None
+    args = list(node.args)
+    if len(args) == 1:
+        return None, args[0], None
+    if len(args) == 2:
+        return args[0], args[1], None
+    return args[0], args[1], args[2]
+
+
+def step_sign(step):
+    """
+    Returns the sign of a constant range step, or None if it is not constant.
+    """
+    if step is None:
+        return 1
+    if isinstance(step, ast.Constant) and isinstance(step.value, int):
+        return (step.value > 0) - (step.value < 0)
+    if (isinstance(step, ast.UnaryOp) and isinstance(step.op, ast.USub)
+            and isinstance(step.operand, ast.Constant) and isinstance(step.operand.value, int)):
+        return -1 if step.operand.value else 0
+    return None
+
+
+def dumps_format(call):
+    """
+    Returns (indent, item separator, key separator, ensure_ascii) for a call
+    to json.dumps() whose options are constants pyjson.hpp supports, with
+    -1 for no indent. Returns None for any other call.
+    """
+    if len(call.args) != 1:
+        return None
+    options = {"indent": None, "separators": None, "ensure_ascii": True, "sort_keys": False}
+    for keyword in call.keywords:
+        value = keyword.value
+        if keyword.arg == "separators":
+            if not (isinstance(value, ast.Tuple) and len(value.elts) == 2
+                    and all(isinstance(e, ast.Constant) and isinstance(e.value, str) for e in value.elts)):
+                return None
+            options["separators"] = tuple(e.value for e in value.elts)
+        elif keyword.arg in options and isinstance(value, ast.Constant):
+            options[keyword.arg] = value.value
+        else:
+            return None
+    indent = options["indent"]
+    if not (indent is None or type(indent) is int and indent >= 0):
+        return None
+    if not all(isinstance(options[name], bool) for name in ("ensure_ascii", "sort_keys")):
+        return None
+    # Like Python, a space follows commas only on single-line output.
+    item, key = options["separators"] or ((", " if indent is None else ","), ": ")
+    return (-1 if indent is None else indent), item, key, options["ensure_ascii"]
+
+
+def is_request(node, method="get"):
+    func = node.func if isinstance(node, ast.Call) else None
+    return (isinstance(func, ast.Attribute) and func.attr == method
+            and isinstance(func.value, ast.Name) and func.value.id == "requests")
+
+
+def request_call(node):
+    """
+    Returns (call, parse_json) when `node` is `requests.get(...)`, optionally
+    followed by `.json()`, else (None, False).
+    """
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "json" and not node.args and not node.keywords):
+        call, _ = request_call(node.func.value)
+        return call, call is not None
+    if is_request(node) and len(node.args) == 1:
+        return node, False
+    return None, False
+
+
+def independent_request(call, target, expr_type, loop_body=()):
+    """
+    Returns True when a request's URL is a side-effect-free function of the
+    loop variable and its options do not depend on the loop at all, so every
+    request of the loop can be issued up front.
+    """
+    stored = {n.id for stmt in loop_body for n in ast.walk(stmt)
+              if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+    url = call.args[0]
+    if not is_pure(url, expr_type) or any(reads(url, name) for name in stored):
+        return False
+    return all(is_pure(k.value, expr_type) and not reads(k.value, target) and
+               not any(reads(k.value, name) for name in stored) for k in call.keywords)
+
+
+def match_request_comprehension(node, expr_type=no_types):
+    """
+    Recognizes `[requests.get(url(x)) for x in xs]`, optionally with
+    `.json()` on each response. Returns (generator, call, parse_json) or None.
+    """
+    generator = simple_generator(node)
+    if generator is None or generator.ifs:
+        return None
+    call, parse_json = request_call(node.elt)
+    if call is None or not independent_request(call, generator.target.id, expr_type):
+        return None
+    return generator, call, parse_json
+
+
+def match_request_loop(loop, expr_type=no_types):
+    """
+    Recognizes a for loop whose body starts with `r = requests.get(url(x))`
+    and cannot exit early. Returns the assignment and the call, or None.
+    Issuing the requests up front must not be observable, so the rest of
+    the body may only make side-effect-free calls and must leave the
+    iterated list alone.
+    """
+    if loop.orelse or not isinstance(loop.target, ast.Name) or not loop.body:
+        return None
+    first = loop.body[0]
+    if not (isinstance(first, ast.Assign) and len(first.targets) == 1
+            and isinstance(first.targets[0], ast.Name) and first.targets[0].id != loop.target.id):
+        return None
+    call, parse_json = request_call(first.value)
+    if call is None or parse_json:
+        return None
+    iterable = loop.iter.id if isinstance(loop.iter, ast.Name) else None
+    for stmt in loop.body:
+        for node in ast.walk(stmt):
+            if isinstance(node, (ast.Break, ast.Return, ast.Raise, ast.Try)):
+                return None
+            if isinstance(node, ast.Call) and node is not call and not is_pure(node, expr_type):
+                return None
+            if writes(node, iterable):
+                return None
+    if not independent_request(call, loop.target.id, expr_type, loop.body):
+        return None
+    return first, call
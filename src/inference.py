@@ -0,0 +1,568 @@
+# inference.py
+import ast
+
+from src.idioms import dumps_format
+
+class Type:
+    """
+    A Python-level type: a name plus type arguments, e.g. `list[int]` is
+    Type("list", (INT,)). An argument of None is an element type that has not
+    been inferred (yet), as in the type of `[]`.
+    """
+
+    def __init__(self, name, args=()):
+        self.name = name
+        self.args = tuple(args)
+
+    def __eq__(self, other):
+        return isinstance(other, Type) and (self.name, self.args) == (other.name, other.args)
+
+    def __hash__(self):
+        return hash((self.name, self.args))
+
+    def __repr__(self):
+        if self.args:
+            return f"{self.name}[{', '.join(repr(a) if a else '?' for a in self.args)}]"
+        return self.name
+
+
+INT = Type("int")
+FLOAT = Type("float")
+BOOL = Type("bool")
+STR = Type("str")
+NONE = Type("None")
+RANGE = Type("range")
+RESPONSE = Type("Response")
+# Values whose shape is only known at runtime; lowered to nlohmann::json.
+DYNAMIC = Type("json")
+
+NUMERIC = (BOOL, INT, FLOAT)
+
+
+def list_of(element):
+    return Type("list", (element,))
+
+
+def dict_of(key, value):
+    return Type("dict", (key, value))
+
+
+SCALAR_ANNOTATIONS = {"int": INT, "float": FLOAT, "bool": BOOL, "str": STR, "None": NONE}
+
+# Return types of builtins that do not depend on their arguments.
+BUILTIN_RETURNS = {"len": INT, "int": INT, "float": FLOAT, "str": STR, "bool": BOOL,
+                   "range": RANGE, "print": NONE, "any": BOOL, "all": BOOL}
+
+# str methods lowered to pyops helpers: return type and accepted numbers of
+# arguments.
+STR_METHODS = {"upper": (STR, (0,)), "lower": (STR, (0,)), "strip": (STR, (0, 1)),
+               "lstrip": (STR, (0, 1)), "rstrip": (STR, (0, 1)), "replace": (STR, (2,)),
+               "join": (STR, (1,)), "split": (list_of(STR), (0, 1)), "startswith": (BOOL, (1,)),
+               "endswith": (BOOL, (1,)), "find": (INT, (1,)), "count": (INT, (1,))}
+
+# Functions of the json module, lowered to nlohmann::json.
+JSON_FUNCTIONS = {"loads": DYNAMIC, "dumps": STR}
+
+RESPONSE_ATTRIBUTES = {"text": STR, "status_code": INT, "url": STR}
+
+
+def join(a, b):
+    """
+    Returns the least type both `a` and `b` fit in.
+    """
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    if a in NUMERIC and b in NUMERIC:
+        return INT if FLOAT not in (a, b) else FLOAT
+    if a.name == b.name and a.name in ("list", "dict"):
+        return Type(a.name, [join(x, y) for x, y in zip(a.args, b.args)])
+    return DYNAMIC
+
+
+def element_type(t):
+    if t is None:
+        return None
+    if t.name in ("list", "dict"):
+        return t.args[0]
+    if t == STR:
+        return STR
+    if t == RANGE:
+        return INT
+    if t == DYNAMIC:
+        return DYNAMIC
+    return None
+
+
+def sum_type(t):
+    """
+    The type of `sum()` over values of type `t`; bools add up to an int.
+    """
+    return INT if t == BOOL else t
+
+
+def annotation_type(node):
+    """
+    Translates an annotation expression into a Type, or None when the
+    annotation is not understood.
+    """
+    if node is None:
+        return None
+    if isinstance(node, ast.Constant) and node.value is None:
+        return NONE
+    if isinstance(node, ast.Name):
+        if node.id in SCALAR_ANNOTATIONS:
+            return SCALAR_ANNOTATIONS[node.id]
+        if node.id == "list":
+            return list_of(DYNAMIC)
+        if node.id in ("dict", "Any", "object"):
+            return DYNAMIC
+        return None
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        args = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+        args = [annotation_type(arg) for arg in args]
+        if node.value.id in ("list", "List") and len(args) == 1 and args[0]:
+            return list_of(args[0])
+        if node.value.id in ("dict", "Dict") and len(args) == 2 and all(args):
+            return dict_of(*args)
+    return None
+
+
+class FunctionTypes:
+    def __init__(self, node):
+        self.node = node
+        self.params = {}
+        self.returns = None
+        self.locals = {}
+        # Locals first assigned inside a nested block; C++ scoping needs
+        # them declared at the top of the function.
+        self.hoisted = []
+
+
+class ModuleTypes:
+    """
+    Types of every function signature, local and expression in a module,
+    plus the places where inference had to fall back to a dynamic type.
+    """
+
+    def __init__(self):
+        self.functions = {}
+        self.globals = {}
+        self.expr_types = {}
+        self.fallbacks = []
+
+    def expr_type(self, node):
+        return self.expr_types.get(id(node))
+
+
+class TypeInferrer:
+    MAX_PASSES = 8
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.types = ModuleTypes()
+        self.call_args = {}
+        self.current = None
+        self.env = {}
+        # (function, variable) pairs where incompatible types met.
+        self.conflicts = set()
+        # Set for the last pass, which reports fallbacks.
+        self.reporting = False
+
+    def infer(self):
+        functions = [n for n in self.tree.body if isinstance(n, ast.FunctionDef)]
+        for node in functions:
+            info = FunctionTypes(node)
+            for arg in node.args.args:
+                info.params[arg.arg] = annotation_type(arg.annotation)
+            info.returns = annotation_type(node.returns)
+            self.types.functions[node.name] = info
+
+        # Unannotated parameters and return types are learned from call sites
+        # and return statements, so iterate until the signatures settle.
+        for _ in range(self.MAX_PASSES):
+            before = self.signatures()
+            self.call_args = {}
+            self.run_body(None, [n for n in self.tree.body if not isinstance(n, ast.FunctionDef)])
+            for node in functions:
+                self.run_function(node)
+            self.learn_parameters()
+            if self.signatures() == before:
+                break
+        self.finish(functions)
+        return self.types
+
+    def signatures(self):
+        return {name: (dict(info.params), info.returns, dict(info.locals))
+                for name, info in self.types.functions.items()}
+
+    def learn_parameters(self):
+        for name, arg_types in self.call_args.items():
+            info = self.types.functions[name]
+            for arg, arg_type in zip(info.node.args.args, arg_types):
+                if arg.annotation is None:
+                    info.params[arg.arg] = join(info.params[arg.arg], arg_type)
+
+    def run_function(self, node):
+        info = self.types.functions[node.name]
+        self.current = info
+        self.env = dict(info.locals)
+        self.env.update({k: v for k, v in info.params.items() if v is not None})
+        self.returned = None
+        self.returns_value = False
+        self.run_body(node, node.body)
+        if node.returns is None:
+            if self.returns_value:
+                info.returns = join(info.returns, self.returned)
+            else:
+                info.returns = NONE
+        for name, t in self.env.items():
+            if name not in info.params:
+                info.locals[name] = t
+        self.current = None
+
+    def run_body(self, node, body):
+        if node is None:
+            self.env = dict(self.types.globals)
+        for stmt in body:
+            self.statement(stmt)
+        if node is None:
+            self.types.globals.update(self.env)
+
+    def bind(self, name, t):
+        old = self.env.get(name)
+        new = join(old, t)
+        if new == DYNAMIC and DYNAMIC not in (old, t) and None not in (old, t):
+            self.conflicts.add((self.current.node.name if self.current else None, name))
+        self.env[name] = new
+
+    def statement(self, node):
+        if isinstance(node, ast.Assign):
+            value = self.expr(node.value)
+            for target in node.targets:
+                self.assign(target, value)
+        elif isinstance(node, ast.AnnAssign):
+            declared = annotation_type(node.annotation)
+            value = self.expr(node.value) if node.value else None
+            if isinstance(node.target, ast.Name):
+                self.env[node.target.id] = declared or join(self.env.get(node.target.id), value)
+        elif isinstance(node, ast.AugAssign):
+            value = self.expr(node.value)
+            target = self.expr(node.target)
+            self.assign(node.target, self.binop(node.op, target, value))
+        elif isinstance(node, ast.For):
+            self.assign(node.target, element_type(self.expr(node.iter)))
+            for stmt in node.body + node.orelse:
+                self.statement(stmt)
+        elif isinstance(node, (ast.While, ast.If)):
+            self.expr(node.test)
+            for stmt in node.body + node.orelse:
+                self.statement(stmt)
+        elif isinstance(node, ast.Return):
+            if node.value:
+                self.returns_value = True
+                self.returned = join(self.returned, self.expr(node.value))
+        elif isinstance(node, ast.Expr):
+            self.expr(node.value)
+
+    def assign(self, target, t):
+        if isinstance(target, ast.Name):
+            self.bind(target.id, t)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self.assign(elt, DYNAMIC if t == DYNAMIC else None)
+        elif isinstance(target, ast.Subscript):
+            container = self.expr(target.value)
+            self.expr(target.slice)
+            name = target.value.id if isinstance(target.value, ast.Name) else None
+            if name and container and container.name == "dict":
+                self.bind(name, dict_of(self.expr_type(target.slice), t))
+        else:
+            self.expr(target)
+
+    def expr_type(self, node):
+        return self.types.expr_types.get(id(node))
+
+    def expr(self, node):
+        t = self.compute(node)
+        self.types.expr_types[id(node)] = t
+        return t
+
+    def compute(self, node):
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool):
+                return BOOL
+            if isinstance(node.value, int):
+                return INT
+            if isinstance(node.value, float):
+                return FLOAT
+            if isinstance(node.value, str):
+                return STR
+            if node.value is None:
+                return NONE
+            return None
+        if isinstance(node, ast.Name):
+            if node.id in self.env:
+                return self.env[node.id]
+            return self.types.globals.get(node.id)
+        if isinstance(node, ast.BinOp):
+            # `a + b + c + ...` nests to the left; type the chain bottom-up
+            # without recursing so long expressions cannot exhaust the stack.
+            chain = [node]
+            while isinstance(chain[-1].left, ast.BinOp):
+                chain.append(chain[-1].left)
+            t = self.expr(chain[-1].left)
+            for link in reversed(chain):
+                t = self.binop(link.op, t, self.expr(link.right))
+                if link is not node:
+                    self.types.expr_types[id(link)] = t
+            return t
+        if isinstance(node, ast.UnaryOp):
+            operand = self.expr(node.operand)
+            if isinstance(node.op, ast.Not):
+                return BOOL
+            return INT if operand == BOOL else operand
+        if isinstance(node, ast.BoolOp):
+            t = None
+            for value in node.values:
+                t = join(t, self.expr(value))
+            return t
+        if isinstance(node, ast.Compare):
+            self.expr(node.left)
+            for comparator in node.comparators:
+                self.expr(comparator)
+            return BOOL
+        if isinstance(node, ast.IfExp):
+            self.expr(node.test)
+            return join(self.expr(node.body), self.expr(node.orelse))
+        if isinstance(node, (ast.JoinedStr, ast.FormattedValue)):
+            for value in ast.iter_child_nodes(node):
+                if isinstance(value, ast.expr):
+                    self.expr(value)
+            return STR
+        if isinstance(node, (ast.List, ast.Set)):
+            t = None
+            for elt in node.elts:
+                t = join(t, self.expr(elt))
+            return list_of(t)
+        if isinstance(node, ast.Dict):
+            key = value = None
+            for k, v in zip(node.keys, node.values):
+                key = join(key, self.expr(k) if k else None)
+                value = join(value, self.expr(v))
+            return dict_of(key, value)
+        if isinstance(node, ast.Subscript):
+            container = self.expr(node.value)
+            index = self.expr(node.slice)
+            if isinstance(node.slice, ast.Slice) or container is None:
+                return container
+            if container.name == "list":
+                return container.args[0]
+            if container.name == "dict":
+                return container.args[1]
+            if container in (STR, DYNAMIC):
+                return container
+            return None
+        if isinstance(node, (ast.ListComp, ast.GeneratorExp, ast.SetComp)):
+            outer = self.comprehension(node.generators)
+            t = list_of(self.expr(node.elt))
+            self.env = outer
+            return t
+        if isinstance(node, ast.DictComp):
+            outer = self.comprehension(node.generators)
+            t = dict_of(self.expr(node.key), self.expr(node.value))
+            self.env = outer
+            return t
+        if isinstance(node, ast.Attribute):
+            value = self.expr(node.value)
+            if value == RESPONSE:
+                return RESPONSE_ATTRIBUTES.get(node.attr)
+            return None
+        if isinstance(node, ast.Call):
+            return self.call(node)
+        return None
+
+    def comprehension(self, generators):
+        """
+        Binds the comprehension variables in a copy of the environment, since
+        they live in their own scope in Python 3 and must not change the
+        types of function locals of the same name. Returns the enclosing
+        environment, which the caller restores after typing the element.
+        """
+        outer = self.env
+        self.env = dict(outer)
+        for generator in generators:
+            t = element_type(self.expr(generator.iter))
+            for target in ast.walk(generator.target):
+                if isinstance(target, ast.Name):
+                    self.env.pop(target.id, None)
+            self.assign(generator.target, t)
+            for condition in generator.ifs:
+                self.expr(condition)
+        return outer
+
+    def binop(self, op, left, right):
+        if isinstance(op, ast.Div):
+            return FLOAT if left in NUMERIC and right in NUMERIC else join(left, right)
+        if isinstance(op, ast.Mult) and STR in (left, right) and INT in (left, right):
+            return STR
+        if isinstance(op, ast.Mult) and left and left.name == "list" and right == INT:
+            return left
+        if left in (BOOL,) and right in (BOOL,):
+            return INT
+        return join(left, right)
+
+    def call(self, node):
+        args = [self.expr(arg) for arg in node.args]
+        for keyword in node.keywords:
+            self.expr(keyword.value)
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id in self.types.functions:
+                known = self.call_args.setdefault(func.id, [None] * len(args))
+                self.call_args[func.id] = [join(a, b) for a, b in zip(known, args)]
+                return self.types.functions[func.id].returns
+            if func.id in BUILTIN_RETURNS:
+                return BUILTIN_RETURNS[func.id]
+            if func.id in ("abs", "min", "max", "sum") and args:
+                if len(args) == 1:
+                    t = element_type(args[0])
+                    return sum_type(t) if func.id == "sum" else t
+                t = None
+                for arg in args:
+                    t = join(t, arg)
+                return t
+            return None
+        if isinstance(func, ast.Attribute):
+            if isinstance(func.value, ast.Name) and func.value.id == "requests" and func.attr in ("get", "post"):
+                return RESPONSE
+            if isinstance(func.value, ast.Name) and func.value.id == "json" and func.attr in JSON_FUNCTIONS:
+                if func.attr == "dumps" and dumps_format(node) is None:
+                    self.fallback(node, self.current and self.current.node.name, "json.dumps()",
+                                  "options have no C++ lowering; using the defaults")
+                return JSON_FUNCTIONS[func.attr]
+            receiver = self.expr(func.value)
+            if receiver == RESPONSE and func.attr == "json":
+                return DYNAMIC
+            if receiver == STR:
+                returns, arities = STR_METHODS.get(func.attr, (None, ()))
+                if len(args) not in arities or node.keywords:
+                    self.fallback(node, self.current and self.current.node.name, f"str.{func.attr}()",
+                                  "method has no C++ lowering for this call")
+                return returns
+            if receiver and receiver.name == "list":
+                name = func.value.id if isinstance(func.value, ast.Name) else None
+                if func.attr in ("append", "insert") and args:
+                    if name:
+                        self.bind(name, list_of(args[-1]))
+                    return NONE
+                if func.attr == "extend" and args and name:
+                    self.bind(name, list_of(element_type(args[0])))
+                    return NONE
+                if func.attr == "pop":
+                    return receiver.args[0]
+                return None
+            if receiver and receiver.name == "dict" and func.attr == "get":
+                return receiver.args[1]
+            if receiver == DYNAMIC:
+                return DYNAMIC
+        return None
+
+    def finish(self, functions):
+        """
+        Runs a last pass with settled signatures to record expression types,
+        fills in dynamic fallbacks and reports them.
+        """
+        self.types.expr_types = {}
+        self.reporting = True
+        self.run_body(None, [n for n in self.tree.body if not isinstance(n, ast.FunctionDef)])
+        for node in functions:
+            info = self.types.functions[node.name]
+            for arg in node.args.args:
+                if has_unknown(info.params[arg.arg]):
+                    self.fallback(arg, node.name, arg.arg, "parameter type could not be inferred; using nlohmann::json")
+                    info.params[arg.arg] = fill_unknown(info.params[arg.arg])
+            self.run_function(node)
+            if has_unknown(info.returns):
+                self.fallback(node, node.name, "return", "return type could not be inferred; using nlohmann::json")
+                info.returns = fill_unknown(info.returns)
+            info.hoisted = hoisted_locals(node, info)
+            bindings = first_bindings(node)
+            for name, t in info.locals.items():
+                line = bindings.get(name, node)
+                if t is None and name not in info.hoisted:
+                    self.fallback(line, node.name, name, "local type could not be inferred; left to C++ auto")
+                elif has_unknown(t):
+                    self.fallback(line, node.name, name, "local type could not be inferred; using nlohmann::json")
+                elif (node.name, name) in self.conflicts:
+                    self.fallback(line, node.name, name, "local is assigned incompatible types; using nlohmann::json")
+
+    def fallback(self, node, function, name, reason):
+        if not self.reporting:
+            return
+        self.types.fallbacks.append((getattr(node, "lineno", 0), function, name, reason))
+
+
+def first_bindings(function):
+    """
+    Maps every name stored in `function` to the earliest node storing it.
+    """
+    first = {}
+    for node in ast.walk(function):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            known = first.get(node.id)
+            if known is None or (node.lineno, node.col_offset) < (known.lineno, known.col_offset):
+                first[node.id] = node
+    return first
+
+
+def has_unknown(t):
+    return t is None or any(has_unknown(arg) for arg in t.args)
+
+
+def fill_unknown(t):
+    if t is None:
+        return DYNAMIC
+    return Type(t.name, [fill_unknown(arg) for arg in t.args])
+
+
+def hoisted_locals(function, info):
+    """
+    Returns the locals whose first assignment is nested inside a block, in
+    order of first assignment.
+    """
+    seen = set(info.params)
+    hoisted = []
+
+    def visit(body, nested):
+        for stmt in body:
+            targets = []
+            if isinstance(stmt, ast.Assign):
+                targets = [t for t in stmt.targets if isinstance(t, ast.Name)]
+            elif isinstance(stmt, (ast.AnnAssign, ast.AugAssign)) and isinstance(stmt.target, ast.Name):
+                targets = [stmt.target]
+            for target in targets:
+                if target.id not in seen:
+                    seen.add(target.id)
+                    if nested:
+                        hoisted.append(target.id)
+            if isinstance(stmt, ast.For):
+                # The loop variable is declared by the loop itself.
+                if isinstance(stmt.target, ast.Name):
+                    seen.add(stmt.target.id)
+                visit(stmt.body + stmt.orelse, True)
+            elif isinstance(stmt, (ast.If, ast.While)):
+                visit(stmt.body + stmt.orelse, True)
+
+    visit(function.body, False)
+    return hoisted
+
+
+def format_fallback(path, fallback):
+    lineno, function, name, reason = fallback
+    return f"{path}:{lineno}: in {function or '<module>'}: {name}: {reason}"
+
+
+def infer_module(tree):
+    return TypeInferrer(tree).infer()
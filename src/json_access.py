@@ -0,0 +1,235 @@
+# json_access.py
+import ast
+
+from src.inference import BOOL, DYNAMIC, FLOAT, INT, STR
+
+# Path step that matches every item of an array or member of an object.
+EVERY = "*"
+
+
+def is_json_parse(node):
+    """
+    True for `json.loads(text)` and `response.json()`.
+    """
+    if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute) or node.keywords:
+        return False
+    func = node.func
+    if isinstance(func.value, ast.Name) and func.value.id == "json" and func.attr == "loads":
+        return len(node.args) == 1
+    return func.attr == "json" and not node.args
+
+
+def constant_step(index):
+    """
+    Returns the path step for a constant key or non-negative index, or None
+    when the subscript is not a plain constant.
+    """
+    if not isinstance(index, ast.Constant) or isinstance(index.value, bool):
+        return None
+    if isinstance(index.value, str) and index.value != EVERY:
+        return index.value
+    if isinstance(index.value, int) and index.value >= 0:
+        return str(index.value)
+    return None
+
+
+def json_pointer(path):
+    return "".join("/" + step.replace("~", "~0").replace("/", "~1") for step in path)
+
+
+class Record:
+    """
+    A parsed document whose values are all read as scalars at constant
+    paths, so it can be extracted into a struct. `fields` lists each path
+    with the type it is read as, in selection order; `leaves` maps id() of
+    every expression reading one to its index in `fields`; `name` is the
+    local bound to the document, or None when it is only indexed directly.
+    """
+
+    def __init__(self, name, fields, leaves):
+        self.name = name
+        self.fields = fields
+        self.leaves = leaves
+
+
+class JsonAccess:
+    """
+    The parts of each JSON document a function parses that it actually
+    reads. A document, or a JSON local or loop variable bound from it, that
+    is only indexed with constant keys and iterated contributes the paths
+    of the values finally used; any other use keeps the whole subtree at
+    that point. `selections` maps id(parse call) to its JSON pointers, with
+    "*" for every item; parses whose whole document is used are left out.
+    `records` holds a Record for those of them that qualify.
+    """
+
+    def __init__(self, function, local_types, returns=None):
+        self.function = function
+        self.local_types = local_types
+        self.returns = returns
+        self.parents = {}
+        for node in ast.walk(function):
+            for child in ast.iter_child_nodes(node):
+                self.parents[id(child)] = node
+        self.selections = {}
+        self.records = {}
+        for node in ast.walk(function):
+            if is_json_parse(node):
+                # Filled in by uses(): the expressions where paths end, and
+                # the locals bound along the way.
+                self.leaves = []
+                self.bindings = []
+                paths = self.uses(node, ())
+                if () not in paths:
+                    paths = expand(paths)
+                    self.selections[id(node)] = [json_pointer(p) for p in paths]
+                    record = self.record(node, paths)
+                    if record is not None:
+                        self.records[id(node)] = record
+
+    def uses(self, node, prefix):
+        """
+        Returns the paths below `prefix` that are read through the
+        expression `node`, which evaluates to the value at `prefix`.
+        """
+        parent = self.parents.get(id(node))
+        while (isinstance(parent, ast.Subscript) and parent.value is node and isinstance(parent.ctx, ast.Load)
+               and constant_step(parent.slice) is not None):
+            prefix += (constant_step(parent.slice),)
+            node, parent = parent, self.parents.get(id(parent))
+        if isinstance(parent, (ast.Assign, ast.AnnAssign)) and parent.value is node:
+            targets = parent.targets if isinstance(parent, ast.Assign) else [parent.target]
+            if len(targets) == 1 and isinstance(targets[0], ast.Name) and self.is_json(targets[0].id):
+                self.bindings.append((targets[0].id, prefix))
+                return self.name_uses(targets[0].id, prefix, self.function)
+        if isinstance(parent, ast.For) and parent.iter is node and isinstance(parent.target, ast.Name):
+            if self.is_json(parent.target.id):
+                return self.name_uses(parent.target.id, prefix + (EVERY,), self.function)
+        if isinstance(parent, ast.comprehension) and parent.iter is node and isinstance(parent.target, ast.Name):
+            return self.name_uses(parent.target.id, prefix + (EVERY,), self.parents[id(parent)])
+        self.leaves.append((node, parent, prefix))
+        return {prefix}
+
+    def is_json(self, name):
+        # Binding a document to a variable of another type converts it, so
+        # the value is used whole there.
+        return self.local_types.get(name) in (DYNAMIC, None)
+
+    def scalar_use(self, node, parent):
+        """
+        Returns the scalar type that the value of `node` is assigned or
+        returned as, or None when it is used any other way.
+        """
+        if isinstance(parent, ast.Return):
+            t = self.returns
+        elif isinstance(parent, (ast.Assign, ast.AnnAssign)) and parent.value is node:
+            targets = parent.targets if isinstance(parent, ast.Assign) else [parent.target]
+            if len(targets) != 1 or not isinstance(targets[0], ast.Name):
+                return None
+            t = self.local_types.get(targets[0].id)
+        else:
+            return None
+        return t if t in (BOOL, INT, FLOAT, STR) else None
+
+    def record(self, parse, paths):
+        """
+        Returns the Record for the current parse, or None unless every path
+        is constant and read as one scalar type, every read runs whenever
+        the parse does, and the document is bound to no local but one
+        assigned only here.
+        """
+        if not paths or any(EVERY in path for path in paths):
+            return None
+        # Extraction reads every field up front and throws if one is
+        # missing, so a read that Python might skip must not be a field.
+        if not all(self.always_reached(parse, node) for node, _, _ in self.leaves):
+            return None
+        if len(self.bindings) > 1 or any(prefix for _, prefix in self.bindings):
+            return None
+        name = self.bindings[0][0] if self.bindings else None
+        if name is not None and self.stores(name) != 1:
+            return None
+        types = dict.fromkeys(paths)
+        leaves = {}
+        for node, parent, path in self.leaves:
+            t = self.scalar_use(node, parent)
+            if t is None or path not in types or types[path] not in (None, t):
+                return None
+            types[path] = t
+            leaves[id(node)] = paths.index(path)
+        if None in types.values():
+            return None
+        return Record(name, [(path, types[path]) for path in paths], leaves)
+
+    def statement(self, node):
+        while not isinstance(node, ast.stmt):
+            node = self.parents[id(node)]
+        return node
+
+    def always_reached(self, parse, node):
+        """
+        True when the statement evaluating `node` runs whenever the one
+        evaluating `parse` does: it is the same statement, or a later one
+        in the same block with no statement in between that can leave it.
+        """
+        start, end = self.statement(parse), self.statement(node)
+        if start is end:
+            return True
+        parent = self.parents.get(id(start))
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(parent, field, None)
+            if isinstance(block, list) and any(stmt is start for stmt in block):
+                break
+        else:
+            return False
+        positions = {id(stmt): i for i, stmt in enumerate(block)}
+        if id(end) not in positions or positions[id(end)] < positions[id(start)]:
+            return False
+        between = block[positions[id(start)]:positions[id(end)]]
+        return not any(isinstance(n, (ast.Return, ast.Raise, ast.Break, ast.Continue))
+                       for stmt in between for n in ast.walk(stmt))
+
+    def stores(self, name):
+        params = [arg.arg for arg in self.function.args.args]
+        return params.count(name) + sum(
+            1 for node in ast.walk(self.function)
+            if isinstance(node, ast.Name) and node.id == name and not isinstance(node.ctx, ast.Load))
+
+    def name_uses(self, name, prefix, scope):
+        """
+        Collects the paths read through every load of `name` in `scope`.
+        Loads of other variables of the same name only add paths, so this
+        stays safe when the name is rebound.
+        """
+        paths = set()
+        for node in ast.walk(scope):
+            if isinstance(node, ast.Name) and node.id == name and isinstance(node.ctx, ast.Load):
+                paths |= self.uses(node, prefix)
+        if not paths and prefix and prefix[-1] == EVERY:
+            # The items are iterated but never read; keep them so the
+            # iteration count is unchanged.
+            paths.add(prefix)
+        return paths
+
+
+def expand(paths):
+    """
+    Returns the paths without those below another selected path, and with
+    each path under "*" copied under sibling keys that are selected on
+    their own, since those keys take precedence over "*" when extracting.
+    """
+    paths = set(paths)
+    changed = True
+    while changed:
+        changed = False
+        for path in list(paths):
+            for i, step in enumerate(path):
+                if step != EVERY:
+                    continue
+                for other in list(paths):
+                    if len(other) > i and other[:i] == path[:i] and other[i] != EVERY:
+                        copy = other[:i + 1] + path[i + 1:]
+                        if copy not in paths:
+                            paths.add(copy)
+                            changed = True
+    return sorted(p for p in paths if not any(p[:i] in paths for i in range(len(p))))
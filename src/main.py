@@ -1,16 +1,58 @@
 # main.py
 import argparse
+import os
+import sys
 from src.parser import parse_file
-from src.generator import generate_cpp
+from src.generator import CppGenerator
+from src.inference import format_fallback
+from src.batch import run_batch, watch
+from src.cache import DEFAULT_MAX_BYTES, TranspileCache
 
 def main():
     parser = argparse.ArgumentParser(description="Python to C++ Transpiler")
-    parser.add_argument("file", help="The Python file to transpile")
+    parser.add_argument("paths", nargs="+", help="Python files, directories or glob patterns to transpile")
+    parser.add_argument("-o", "--out-dir", help="Write mirrored .hpp/.cpp files here instead of printing to stdout")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("--cache-dir", help="Incremental cache location (default: OUT_DIR/.transpile-cache)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Maximum cache size in MiB before old entries are evicted")
+    parser.add_argument("--no-cache", action="store_true", help="Regenerate every module")
+    parser.add_argument("--cmake", action="store_true",
+                        help="Also write a precompiled header and a CMakeLists.txt building the batch")
+    parser.add_argument("--watch", action="store_true", help="Re-transpile whenever a source file changes")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Keep loops and comprehensions strictly sequential instead of using parallel algorithms")
+    parser.add_argument("--report-types", action="store_true",
+                        help="Report every place where type inference fell back to a dynamic type")
     args = parser.parse_args()
 
-    ast_tree = parse_file(args.file)
-    cpp_code = generate_cpp(ast_tree)
-    print(cpp_code)
+    if args.watch and not args.out_dir:
+        parser.error("--watch requires --out-dir")
+    if args.cmake and not args.out_dir:
+        parser.error("--cmake requires --out-dir")
+    options = {"parallel": not args.sequential}
+    if args.out_dir:
+        cache = None
+        if not args.no_cache:
+            cache_dir = args.cache_dir or os.path.join(args.out_dir, ".transpile-cache")
+            cache = TranspileCache(cache_dir, args.cache_size * 1024 * 1024,
+                                   options="sequential" if args.sequential else "")
+        if args.watch:
+            watch(args.paths, args.out_dir, args.jobs, cache, report_types=args.report_types, options=options,
+                  cmake=args.cmake)
+            return
+        ok = run_batch(args.paths, args.out_dir, args.jobs, cache, args.report_types, options, args.cmake)
+        sys.exit(0 if ok else 1)
+
+    if len(args.paths) != 1 or not os.path.isfile(args.paths[0]):
+        parser.error("printing to stdout takes a single file; use --out-dir for batches")
+    ast_tree = parse_file(args.paths[0])
+    generator = CppGenerator(**options)
+    generator.generate_to(ast_tree, sys.stdout)
+    print()
+    if args.report_types:
+        for fallback in generator.types.fallbacks:
+            print(format_fallback(args.paths[0], fallback), file=sys.stderr)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
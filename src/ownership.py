@@ -0,0 +1,161 @@
+# ownership.py
+import ast
+
+# Methods that mutate the receiver in place (list, dict and set APIs).
+MUTATING_METHODS = {
+    "append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+    "update", "setdefault", "popitem", "add", "discard",
+}
+
+# C++ types that are cheaper to copy than to pass by reference.
+TRIVIAL_TYPES = {
+    "bool", "char", "int", "long", "float", "double", "size_t",
+    "int8_t", "int16_t", "int32_t", "int64_t",
+    "uint8_t", "uint16_t", "uint32_t", "uint64_t",
+}
+
+SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+          ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+LOOPS = (ast.For, ast.AsyncFor, ast.While)
+
+
+def is_trivial(cpp_type):
+    return cpp_type in TRIVIAL_TYPES or cpp_type.endswith("*")
+
+
+def root_name(node):
+    """
+    Returns the variable at the root of `a.b[c].d`, or None.
+    """
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def stored_names(target):
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return [n for elt in target.elts for n in stored_names(elt)]
+    if isinstance(target, ast.Starred):
+        return stored_names(target.value)
+    return []
+
+
+class Ownership:
+    """
+    Escape and mutation facts for a function body: which names are rebound,
+    which are mutated in place, and which reads are the last use of a
+    variable and may be moved from.
+    """
+
+    def __init__(self, body, params=()):
+        self.params = set(params)
+        self.rebound = set()
+        self.mutated = set()
+        self.moves = set()
+        # Every read of a name in evaluation order, with the innermost
+        # statement containing it and whether it sits inside a loop.
+        self.loads = {}
+        self.candidates = set()
+        self.loops = []
+        for stmt in body:
+            self.scan(stmt)
+        self.propagate_loop_mutations()
+        self.find_moves()
+
+    def scan(self, root):
+        # Pre-order walk with an explicit stack; deeply nested expressions
+        # would otherwise exhaust the recursion limit.
+        stack = [(root, root, False)]
+        while stack:
+            node, stmt, in_loop = stack.pop()
+            self.scan_node(node, stmt, in_loop, stack)
+
+    def scan_node(self, node, stmt, in_loop, stack):
+        if isinstance(node, ast.stmt):
+            stmt = node
+        if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Delete)):
+            targets = node.targets if isinstance(node, (ast.Assign, ast.Delete)) else [node.target]
+            for target in targets:
+                self.record_store(target)
+            if isinstance(node, (ast.Assign, ast.AnnAssign)) and isinstance(node.value, ast.Name):
+                self.candidates.add(id(node.value))
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            self.record_store(node.target)
+            self.loops.append(node)
+        elif isinstance(node, ast.Call):
+            self.candidates.update(id(arg) for arg in node.args if isinstance(arg, ast.Name))
+            if isinstance(node.func, ast.Attribute) and node.func.attr in MUTATING_METHODS:
+                name = root_name(node.func.value)
+                if name:
+                    self.mutated.add(name)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            self.loads.setdefault(node.id, []).append((node, stmt, in_loop))
+
+        if isinstance(node, SCOPES):
+            # Nested scopes capture variables; anything they read is never
+            # safe to move from.
+            for child in ast.walk(node):
+                if isinstance(child, ast.Name):
+                    self.loads.setdefault(child.id, []).append((child, stmt, True))
+            return
+        children = []
+        for field, value in ast.iter_fields(node):
+            for child in value if isinstance(value, list) else [value]:
+                if isinstance(child, ast.AST):
+                    loops = isinstance(node, LOOPS) and field != "iter"
+                    children.append((child, stmt, in_loop or loops))
+        stack.extend(reversed(children))
+
+    def record_store(self, target):
+        if isinstance(target, (ast.Subscript, ast.Attribute)):
+            name = root_name(target)
+            if name:
+                self.mutated.add(name)
+        else:
+            self.rebound.update(stored_names(target))
+
+    def propagate_loop_mutations(self):
+        # Mutating a loop variable in place mutates the container it came from.
+        changed = True
+        while changed:
+            changed = False
+            for loop in self.loops:
+                name = root_name(loop.iter)
+                if (name and name not in self.mutated
+                        and any(n in self.mutated for n in stored_names(loop.target))):
+                    self.mutated.add(name)
+                    changed = True
+
+    def find_moves(self):
+        for name, loads in self.loads.items():
+            if name not in self.rebound and name not in self.params:
+                continue
+            if name in self.params and self.is_readonly(name):
+                # Read-only parameters are passed by const reference.
+                continue
+            node, stmt, in_loop = loads[-1]
+            if in_loop or id(node) not in self.candidates:
+                continue
+            # Unsequenced reads in the same statement would see a moved-from value.
+            if len(loads) > 1 and loads[-2][1] is stmt:
+                continue
+            self.moves.add(id(node))
+
+    def is_readonly(self, name):
+        return name not in self.rebound and name not in self.mutated
+
+    def loop_binding(self, node):
+        """
+        Returns the C++ declaration for a for-loop variable: a const reference
+        when the body only reads it, a reference when the body mutates the
+        element in place, and a copy when the body rebinds it.
+        """
+        names = stored_names(node.target)
+        body = Ownership(node.body)
+        if any(name in body.rebound for name in names):
+            return "auto"
+        if any(name in body.mutated for name in names):
+            return "auto&"
+        return "const auto&"
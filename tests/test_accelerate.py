@@ -0,0 +1,194 @@
+# test_accelerate.py
+import array
+import ast
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from src.accelerate import accelerate, compiler, select_functions, wrapper_source
+
+SOURCE = """
+LIMIT = 10
+
+def scale(xs: list[float], k: float) -> list[float]:
+    return [x * k for x in xs]
+
+def total(xs: list[int]) -> int:
+    result = 0
+    for x in xs:
+        result += x
+    return result
+
+def push(xs: list[int], x: int) -> None:
+    xs.append(x)
+
+def untyped(a, b):
+    return a + b
+
+def clamp(n: int) -> int:
+    return min(n, LIMIT)
+
+def twice_total(xs: list[int]) -> int:
+    return 2 * total(xs)
+"""
+
+# Functions whose native versions must agree with Python exactly, or fall
+# back to it.
+EXACT_SOURCE = """
+def fdiv(a: int, b: int) -> int:
+    return a // b
+
+def fact(n: int) -> int:
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    return result
+
+def at(xs: list[int], i: int) -> int:
+    return xs[i]
+
+def size(s: str) -> int:
+    return len(s)
+
+def shout(s: str) -> str:
+    return s.upper()
+
+def keyword(new: int) -> int:
+    return new + 1
+
+def uses_keyword(x: int) -> int:
+    return keyword(x) * 2
+"""
+
+def load(out_dir, name):
+    sys.path.insert(0, out_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(out_dir, f"{name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(out_dir)
+    return module
+
+class TestAccelerate(unittest.TestCase):
+    def test_select_functions(self):
+        functions, skipped = select_functions(ast.parse(SOURCE))
+        self.assertEqual([f.name for f in functions], ["scale", "total", "twice_total"])
+        self.assertEqual(skipped, {
+            "push": "mutates its list parameter 'xs'",
+            "untyped": "return type is not annotated with a supported type",
+            "clamp": "uses 'LIMIT', which stays in Python",
+        })
+
+    def test_select_only_exact_functions(self):
+        _, skipped = select_functions(ast.parse("""
+def mixed(n: int) -> float:
+    x = 1
+    if n > 0:
+        x = 0.5
+    return x
+
+def pick(a: int, b: int) -> int:
+    return a or b
+
+def text(x: float) -> str:
+    return str(x)
+
+def stepped(n: int, k: int) -> int:
+    total = 0
+    for i in range(0, n, k):
+        total += i
+    return total
+
+def open_ended(n: int) -> int:
+    if n > 0:
+        return n
+
+def power(n: int) -> int:
+    return n ** 2
+"""))
+        self.assertEqual(skipped, {
+            "mixed": "assigns a value of another type than the variable's",
+            "pick": "uses and/or on values other than bools",
+            "text": "calls str() in a way that may not match Python",
+            "stepped": "uses range() with a step that is not a nonzero constant",
+            "open_ended": "may return None",
+            "power": "uses Pow on unsupported operands",
+        })
+
+    def test_wrapper_source(self):
+        functions, _ = select_functions(ast.parse(SOURCE))
+        cpp_code = wrapper_source("mod", functions)
+        self.assertIn("PyInit__mod_native()", cpp_code)
+        self.assertIn("    std::vector<double> a0;\n    double a1;\n", cpp_code)
+        self.assertIn("return pyaccel::to_python(mod::scale(a0, a1));", cpp_code)
+        self.assertIn('const char* names[] = {"scale", "total", "twice_total"};', cpp_code)
+
+    @unittest.skipUnless(shutil.which(compiler()[0]), "no C++ compiler")
+    def test_accelerate_falls_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "src", "mod.py")
+            os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(SOURCE)
+            out_dir = os.path.join(tmp, "out")
+            accelerated, _ = accelerate(path, out_dir)
+            self.assertEqual(accelerated, ["scale", "total", "twice_total"])
+            mod = load(out_dir, "mod")
+        self.assertEqual(type(mod.total).__name__, "builtin_function_or_method")
+        self.assertEqual(mod.total([1, 2, 3]), 6)
+        self.assertEqual(mod.twice_total(array.array("q", [1, 2, 3])), 12)
+        self.assertEqual(mod.scale(array.array("d", [1.0, 2.0]), 2.0), [2.0, 4.0])
+        # Arguments the native version cannot take run the Python definition.
+        self.assertEqual(mod.total(xs=[1, 2]), 3)
+        self.assertEqual(mod.total([1.5, 2]), 3.5)
+        self.assertEqual(mod.total([2 ** 70]), 2 ** 70)
+        self.assertEqual(mod.scale([1.0], 2), [2.0])
+        with self.assertRaises(TypeError):
+            mod.total([None])
+
+    @unittest.skipUnless(shutil.which(compiler()[0]), "no C++ compiler")
+    def test_accelerate_matches_python(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "src", "exact.py")
+            os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(EXACT_SOURCE)
+            out_dir = os.path.join(tmp, "out")
+            accelerated, skipped = accelerate(path, out_dir)
+            self.assertEqual(accelerated, ["fdiv", "fact", "at", "size"])
+            self.assertEqual(skipped["shout"], "calls a method or passes keyword arguments")
+            # A function that fails to compile is kept in Python together
+            # with its callers; the rest still builds.
+            self.assertTrue(skipped["keyword"].startswith("does not compile natively: "))
+            self.assertEqual(skipped["uses_keyword"], skipped["keyword"])
+            mod = load(out_dir, "exact")
+        self.assertEqual(type(mod.fdiv).__name__, "builtin_function_or_method")
+        self.assertEqual(mod.fdiv(-7, 2), -4)
+        with self.assertRaises(ZeroDivisionError):
+            mod.fdiv(1, 0)
+        self.assertEqual(mod.fact(25), 15511210043330985984000000)
+        self.assertEqual(mod.at([1, 2, 3], -1), 3)
+        with self.assertRaises(IndexError):
+            mod.at([1, 2, 3], 3)
+        self.assertEqual(mod.size("h\u00e9llo"), 5)
+        self.assertEqual(mod.shout("abc"), "ABC")
+        self.assertEqual(mod.uses_keyword(1), 4)
+
+    @unittest.skipUnless(shutil.which(compiler()[0]), "no C++ compiler")
+    def test_shim_written_when_nothing_builds(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "src", "m2.py")
+            os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write("def keyword(new: int) -> int:\n    return new + 1\n")
+            out_dir = os.path.join(tmp, "out")
+            accelerated, _ = accelerate(path, out_dir)
+            self.assertEqual(accelerated, [])
+            mod = load(out_dir, "m2")
+        self.assertEqual(mod.keyword(1), 2)
+
+if __name__ == "__main__":
+    unittest.main()
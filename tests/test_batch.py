@@ -0,0 +1,93 @@
+# test_batch.py
+import os
+import tempfile
+import unittest
+from src.batch import discover, module_name, transpile_tree
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src")
+        self.out = os.path.join(self.tmp.name, "out")
+        os.makedirs(os.path.join(self.src, "pkg"))
+        self.write("pkg/util.py", "def add(a: int, b: int) -> int:\n    return a + b\n")
+        self.write("pkg/use.py", "import pkg.util\n\ndef twice(a: int) -> int:\n    return pkg.util.add(a, a)\n")
+        self.write("pkg/broken.py", "def broken(:\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, text):
+        with open(os.path.join(self.src, relative), "w") as f:
+            f.write(text)
+
+    def read(self, relative):
+        with open(os.path.join(self.out, relative)) as f:
+            return f.read()
+
+    def test_discover_directory_and_glob(self):
+        from_dir = discover([self.src])
+        from_glob = discover([os.path.join(self.src, "pkg", "*.py")])
+        self.assertEqual(len(from_dir), 3)
+        self.assertEqual([module_name(*f) for f in from_dir], ["pkg.broken", "pkg.use", "pkg.util"])
+        self.assertEqual([module_name(*f) for f in from_glob], ["broken", "use", "util"])
+
+    def test_transpile_tree_resolves_imports(self):
+        results = transpile_tree([self.src], self.out, jobs=2)
+        errors = {r["module"]: r["error"] for r in results}
+        self.assertIsNone(errors["pkg.util"])
+        self.assertIsNone(errors["pkg.use"])
+        self.assertIn("SyntaxError", errors["pkg.broken"])
+        self.assertEqual(self.read("pkg/use.hpp"), """#pragma once
+
+#include <cstdint>
+
+namespace pkg::use {
+
+int64_t twice(int64_t a);
+
+} // namespace pkg::use
+""")
+        self.assertEqual(self.read("pkg/use.cpp"), """#include "pkg/use.hpp"
+#include "pkg/util.hpp"
+
+namespace pkg::use {
+
+int64_t twice(int64_t a) {
+    return pkg::util::add(a, a);
+}
+
+} // namespace pkg::use
+""")
+    def test_header_includes_only_declaration_types(self):
+        self.write("pkg/stats.py", "import requests\n\ndef total(xs: list[int]) -> int:\n    return sum(xs)\n")
+        transpile_tree([self.src], self.out, jobs=1)
+        self.assertEqual(self.read("pkg/stats.hpp"), """#pragma once
+
+#include <cstdint>
+#include <vector>
+
+namespace pkg::stats {
+
+int64_t total(const std::vector<int64_t>& xs);
+
+} // namespace pkg::stats
+""")
+        self.assertTrue(self.read("pkg/stats.cpp").startswith(
+            '#include "pkg/stats.hpp"\n#include "requests.hpp"\n#include <execution>\n#include <numeric>\n'))
+
+    def test_transpile_tree_writes_build_files(self):
+        transpile_tree([self.src], self.out, jobs=1, cmake=True)
+        self.assertEqual(self.read("transpiled_pch.hpp"), "#pragma once\n\n#include <cstdint>\n")
+        cmake = self.read("CMakeLists.txt")
+        self.assertIn("set(TRANSPILED_SOURCES\n    pkg/use.cpp\n    pkg/util.cpp\n)", cmake)
+        self.assertIn("target_precompile_headers(transpiled PRIVATE transpiled_pch.hpp)", cmake)
+        # Unchanged output must keep its mtime so the build does not redo it.
+        for name in ("CMakeLists.txt", "transpiled_pch.hpp", "pkg/use.cpp"):
+            os.utime(os.path.join(self.out, name), ns=(0, 0))
+        transpile_tree([self.src], self.out, jobs=1, cmake=True)
+        for name in ("CMakeLists.txt", "transpiled_pch.hpp", "pkg/use.cpp"):
+            self.assertEqual(os.stat(os.path.join(self.out, name)).st_mtime_ns, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+# test_bench.py
+import unittest
+from src.bench import ENTRY_POINT, find_kernels, find_regressions, same_output, transpile_kernel
+
+class TestBench(unittest.TestCase):
+    def test_kernels_transpile(self):
+        kernels = find_kernels()
+        self.assertIn("json_records", kernels)
+        for name, path in kernels.items():
+            cpp_code, elapsed = transpile_kernel(path)
+            self.assertIn(f"{ENTRY_POINT}() {{", cpp_code, name)
+            self.assertIn("int main(int argc, char** argv) {", cpp_code, name)
+            self.assertNotIn("None", cpp_code, name)
+            self.assertGreater(elapsed, 0)
+
+    def test_same_output(self):
+        self.assertTrue(same_output("True", "true"))
+        self.assertTrue(same_output("7499988497.041667", "7499988497.0416670"))
+        self.assertTrue(same_output("0.30000000000000004", "0.30000000000000004441"))
+        self.assertFalse(same_output("0.30000000000000004", "0.29999999999999999"))
+        self.assertFalse(same_output("10", "11"))
+        self.assertFalse(same_output("abc", "abd"))
+
+    def test_find_regressions(self):
+        options = {"parallel": True, "repeat": 5}
+        history = [{"options": options, "kernels": {"loop": {"native_s": s}}} for s in (1.0, 1.2, 0.9)]
+        history.append({"options": {"parallel": False, "repeat": 5}, "kernels": {"loop": {"native_s": 0.1}}})
+        record = {"options": options, "kernels": {"loop": {"native_s": 1.05}, "new": {"native_s": 5.0},
+                                                 "broken": {"error": "build failed"}}}
+        self.assertEqual(find_regressions(record, history, threshold=0.1), [])
+        record["kernels"]["loop"]["native_s"] = 1.2
+        self.assertEqual(find_regressions(record, history, threshold=0.1), [("loop", 1.0, 1.2)])
+
+if __name__ == "__main__":
+    unittest.main()
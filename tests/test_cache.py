@@ -0,0 +1,57 @@
+# test_cache.py
+import os
+import tempfile
+import unittest
+from src.batch import transpile_tree
+from src.cache import TranspileCache
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src")
+        self.out = os.path.join(self.tmp.name, "out")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        os.makedirs(self.src)
+        self.write("util.py", "def add(a: int, b: int) -> int:\n    return a + b\n")
+        self.write("use.py", "import util\n\ndef twice(a: int) -> int:\n    return util.add(a, a)\n")
+        self.write("other.py", "def one() -> int:\n    return 1\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, text):
+        path = os.path.join(self.src, relative)
+        with open(path, "w") as f:
+            f.write(text)
+        # Make sure the stat changes even on coarse-grained filesystems.
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    def run_batch(self):
+        cache = TranspileCache(self.cache_dir)
+        results = transpile_tree([self.src], self.out, jobs=1, cache=cache)
+        return {r["module"]: r["cached"] for r in results}
+
+    def test_only_changed_modules_and_dependents_regenerate(self):
+        self.assertEqual(self.run_batch(), {"other": False, "use": False, "util": False})
+        self.assertEqual(self.run_batch(), {"other": True, "use": True, "util": True})
+        self.write("util.py", "def add(a: int, b: int) -> int:\n    return b + a\n")
+        self.assertEqual(self.run_batch(), {"other": True, "use": False, "util": False})
+        with open(os.path.join(self.out, "util.cpp")) as f:
+            self.assertIn("return b + a;", f.read())
+
+    def test_outputs_restored_from_cache(self):
+        self.run_batch()
+        os.remove(os.path.join(self.out, "other.cpp"))
+        self.assertTrue(self.run_batch()["other"])
+        self.assertTrue(os.path.exists(os.path.join(self.out, "other.cpp")))
+
+    def test_evict_keeps_cache_under_limit(self):
+        cache = TranspileCache(self.cache_dir, max_bytes=0)
+        cache.put("ab" * 32, {"header": "", "source": "x" * 100, "headers": []})
+        self.assertIsNotNone(cache.get("ab" * 32))
+        cache.evict()
+        self.assertIsNone(cache.get("ab" * 32))
+
+if __name__ == "__main__":
+    unittest.main()
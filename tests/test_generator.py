@@ -1,13 +1,23 @@
 # test_generator.py
+import ast
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
 import unittest
+from src.accelerate import INCLUDE_DIRS, compiler
 from src.parser import parse_file
-from src.generator import generate_cpp
+from src.generator import CppGenerator, cpp_string, generate_cpp
 
 class TestGenerator(unittest.TestCase):
     def test_generate_simple_function(self):
         ast_tree = parse_file("examples/simple.py")
         cpp_code = generate_cpp(ast_tree)
-        expected_code = """int add(int a, int b) {
+        expected_code = """#include <cstdint>
+
+int64_t add(int64_t a, int64_t b) {
     return a + b;
 }"""
         self.assertEqual(cpp_code, expected_code)
@@ -15,7 +25,9 @@ class TestGenerator(unittest.TestCase):
     def test_generate_if_else(self):
         ast_tree = parse_file("examples/if_else.py")
         cpp_code = generate_cpp(ast_tree)
-        expected_code = """int max(int a, int b) {
+        expected_code = """#include <cstdint>
+
+int64_t max(int64_t a, int64_t b) {
     if (a > b) {
         return a;
     } else {
@@ -26,29 +38,175 @@ class TestGenerator(unittest.TestCase):
 
     def test_generate_list(self):
         ast_tree = parse_file("examples/list.py")
-        cpp_code = generate_cpp(ast_tree)
-        expected_code = """#include <vector>
+        cpp_code = generate_cpp(ast_tree, parallel=False)
+        expected_code = """#include <cstdint>
+#include <vector>
 
-int sum(std::vector<int> a) {
-    int total = 0;
-    for (int x : a) {
+int64_t sum(const std::vector<int64_t>& a) {
+    int64_t total = 0;
+    for (int64_t x : a) {
         total += x;
     }
     return total;
 }"""
         self.assertEqual(cpp_code, expected_code)
 
+    def test_generate_list_parallel(self):
+        ast_tree = parse_file("examples/list.py")
+        cpp_code = generate_cpp(ast_tree)
+        expected_code = """#include <cstdint>
+#include <execution>
+#include <numeric>
+#include <vector>
+
+int64_t sum(const std::vector<int64_t>& a) {
+    int64_t total = 0;
+    total = std::reduce(std::execution::par_unseq, a.begin(), a.end(), total);
+    return total;
+}"""
+        self.assertEqual(cpp_code, expected_code)
+
     def test_generate_requests_example(self):
         ast_tree = parse_file("examples/requests_example.py")
         cpp_code = generate_cpp(ast_tree)
         expected_code = """#include "requests.hpp"
 #include <string>
 
-nlohmann::json get_github_user(std::string username) {
+nlohmann::json get_github_user(const std::string& username) {
     cpr::Response response = requests::get("https://api.github.com/users/" + username);
     return nlohmann::json::parse(response.text);
 }"""
         self.assertEqual(cpp_code, expected_code)
 
+    def test_generate_copy_elimination(self):
+        ast_tree = ast.parse("""
+def tag(rows: list[str], prefix: str, seen: list[str]) -> int:
+    seen.append(prefix)
+    for row in rows:
+        log(row)
+    response = requests.get(prefix)
+    store(response)
+    return 0
+""")
+        cpp_code = generate_cpp(ast_tree)
+        self.assertIn("int64_t tag(const std::vector<std::string>& rows, const std::string& prefix, std::vector<std::string> seen) {", cpp_code)
+        self.assertIn("for (const auto& row : rows) {", cpp_code)
+        self.assertIn("store(std::move(response));", cpp_code)
+
+    def test_generate_loop_bindings(self):
+        ast_tree = ast.parse("""
+def f(rows: list[list[int]], xs: list[int]) -> int:
+    for row in rows:
+        row.append(0)
+    for x in xs:
+        x += 1
+    return 0
+""")
+        cpp_code = generate_cpp(ast_tree)
+        self.assertIn("int64_t f(std::vector<std::vector<int64_t>> rows, const std::vector<int64_t>& xs) {", cpp_code)
+        self.assertIn("for (auto& row : rows) {", cpp_code)
+        self.assertIn("for (int64_t x : xs) {", cpp_code)
+
+    def test_generate_while_membership_and_dict_iteration(self):
+        cpp_code = generate_cpp(ast.parse("""
+def f(n: int, counts: dict[str, int], text: str) -> int:
+    while n > 1 and "a" not in counts:
+        n = n // 2
+    for key in counts:
+        n += counts[key]
+    if "x" in text:
+        n += 1
+    quoted = "say \\"hi\\"\\n"
+    return n + len(quoted)
+"""))
+        self.assertIn('while (n > 1 && !(counts.count("a") != 0)) {', cpp_code)
+        self.assertIn("n = pyops::floordiv(n, 2);", cpp_code)
+        self.assertIn("for (const auto& [key, key_value_] : counts) {", cpp_code)
+        self.assertIn("n += counts.at(key);", cpp_code)
+        self.assertIn('if (text.find("x") != std::string::npos) {', cpp_code)
+        self.assertIn('std::string quoted = "say \\"hi\\"\\n";', cpp_code)
+
+    def test_generate_json(self):
+        cpp_code = generate_cpp(ast.parse("""
+import json
+
+def f(text: str, xs: list[int]) -> str:
+    doc = json.loads(text)
+    compact = json.dumps(xs, separators=(",", ":"))
+    pretty = json.dumps(xs, indent=2, ensure_ascii=False)
+    return json.dumps(doc) + compact + pretty
+"""))
+        self.assertIn('#include "pyjson.hpp"', cpp_code)
+        self.assertNotIn('#include "nlohmann/json.hpp"', cpp_code)
+        self.assertIn("nlohmann::json doc = nlohmann::json::parse(text);", cpp_code)
+        self.assertIn('std::string compact = pyjson::dumps(xs, pyjson::Format{-1, ",", ":", true});', cpp_code)
+        self.assertIn('std::string pretty = pyjson::dumps(xs, pyjson::Format{2, ",", ": ", false});', cpp_code)
+        self.assertIn("return pyjson::dumps(std::move(doc)) + compact + pretty;", cpp_code)
+
+    @unittest.skipUnless(shutil.which(compiler()[0]), "no C++ compiler")
+    def test_json_dumps_matches_python(self):
+        value = {"a": [], "b": {}, "c": {"d": [True, None, "x\u00e9\n\u007f\U0001f600"]},
+                 "e": [1, 2.5, 1e15, 1e16, 0.0001, 1e-05, -0.0, 123456789.125]}
+        floats = [float("nan"), float("-inf"), 0.1, 1e300]
+        cases = [{}, {"separators": (",", ":")}, {"indent": 2}, {"indent": 0}, {"ensure_ascii": False}]
+        source = "import json\n" + "".join(f"""
+def dump{i}(text: str) -> str:
+    return json.dumps(json.loads(text){"".join(f", {k}={v!r}" for k, v in options.items())})
+""" for i, options in enumerate(cases)) + """
+def dump_floats(xs: list[float]) -> str:
+    return json.dumps(xs)
+"""
+        calls = "".join(f"    std::cout << dump{i}(text) << '\\0';\n" for i in range(len(cases)))
+        calls += ("    std::cout << dump_floats({std::nan(\"\"), -HUGE_VAL, 0.1, 1e300}) << '\\0';\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            main = os.path.join(tmp, "main.cpp")
+            with open(main, "w") as f:
+                f.write(generate_cpp(ast.parse(source)))
+                f.write(f"\n#include <iostream>\nint main() {{\n    std::string text = {cpp_string(json.dumps(value))};\n"
+                        f"{calls}}}\n")
+            executable = os.path.join(tmp, "main")
+            build = subprocess.run(compiler() + ["-std=c++17", main, "-o", executable]
+                                   + [f"-I{d}" for d in INCLUDE_DIRS], capture_output=True, text=True)
+            self.assertEqual(build.returncode, 0, build.stderr)
+            output = subprocess.run([executable], capture_output=True, text=True).stdout.split("\0")[:-1]
+        # nlohmann::json keeps object keys sorted, so compare with
+        # sort_keys=True.
+        expected = [json.dumps(value, sort_keys=True, **options) for options in cases] + [json.dumps(floats)]
+        self.assertEqual(output, expected)
+
+    def test_generate_floor_division(self):
+        cpp_code = generate_cpp(ast.parse("""
+def f(a: int, b: int, x: float) -> float:
+    q = a // b
+    q //= -2
+    return q + x // 2.0
+"""))
+        self.assertIn('#include "pyops.hpp"', cpp_code)
+        self.assertIn("int64_t q = pyops::floordiv(a, b);", cpp_code)
+        self.assertIn("q = pyops::floordiv(q, -2);", cpp_code)
+        self.assertIn("return q + pyops::floordiv(x, 2.0);", cpp_code)
+
+    def test_generate_modulo(self):
+        cpp_code = generate_cpp(ast.parse("""
+def f(a: int, x: float) -> float:
+    r = a % -3
+    r %= 2
+    return r + x % 1.5
+"""))
+        self.assertIn("int64_t r = pyops::mod(a, -3);", cpp_code)
+        self.assertIn("r = pyops::mod(r, 2);", cpp_code)
+        self.assertIn("return r + pyops::mod(x, 1.5);", cpp_code)
+
+    def test_generate_deep_expression(self):
+        terms = " + ".join(["n"] * 2000)
+        cpp_code = generate_cpp(ast.parse(f"def f(n: int) -> int:\n    return {terms}\n"))
+        self.assertIn(f"    return {terms};", cpp_code)
+
+    def test_generate_to_stream(self):
+        ast_tree = parse_file("examples/requests_example.py")
+        out = io.StringIO()
+        CppGenerator().generate_to(ast_tree, out)
+        self.assertEqual(out.getvalue(), generate_cpp(parse_file("examples/requests_example.py")))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,160 @@
+# test_idioms.py
+import ast
+import unittest
+from src.generator import generate_cpp
+from src.idioms import is_pure, match_reduction, match_request_loop
+from src.inference import infer_module
+
+class TestIdioms(unittest.TestCase):
+    def test_match_reduction(self):
+        loop = ast.parse("for x in xs:\n    total += x * x\n").body[0]
+        reduction = match_reduction(loop)
+        self.assertEqual(reduction.accumulator, "total")
+        self.assertIsInstance(reduction.op, ast.Add)
+        impure = ast.parse("for x in xs:\n    total += log(x)\n").body[0]
+        self.assertIsNone(match_reduction(impure))
+        dependent = ast.parse("for x in xs:\n    total += total * x\n").body[0]
+        self.assertIsNone(match_reduction(dependent))
+
+    def test_is_pure(self):
+        tree = ast.parse("""
+import requests
+
+def f(s: str, xs: list[int], counts: dict[str, int], u: str) -> None:
+    abs(xs[0]) + len(s.upper()) + counts.get(s, 0)
+    xs.pop() + 1
+    len(requests.get(u).text)
+    len(t.upper())
+""")
+        types = infer_module(tree)
+        pure, pop, request, unknown = [stmt.value for stmt in tree.body[1].body]
+        self.assertTrue(is_pure(pure, types.expr_type))
+        self.assertFalse(is_pure(pop, types.expr_type))
+        # Methods are judged by their receiver, not by name.
+        self.assertFalse(is_pure(request, types.expr_type))
+        self.assertFalse(is_pure(unknown, types.expr_type))
+        self.assertFalse(is_pure(pure))
+
+    def test_generate_parallel_algorithms(self):
+        cpp_code = generate_cpp(ast.parse("""
+def kernel(xs: list[float], ns: list[int]) -> float:
+    scaled = [x * 2.0 for x in xs]
+    return sum(x * x for x in scaled) + max(xs) + sum(n * n for n in ns)
+"""))
+        self.assertIn("std::transform(std::execution::par_unseq, xs.begin(), xs.end(), out_.begin(), [&](double x) { return x * 2.0; })", cpp_code)
+        self.assertIn("std::transform_reduce(std::execution::par_unseq, ns.begin(), ns.end(), int64_t{}, std::plus<>(), [&](int64_t n) { return n * n; })", cpp_code)
+        self.assertIn("*std::max_element(std::execution::par_unseq, xs.begin(), xs.end())", cpp_code)
+        # Python adds floats strictly left to right; regrouping could round
+        # differently.
+        self.assertIn("[&] { double acc_{}; for (double x : scaled) { acc_ += x * x; } return acc_; }()", cpp_code)
+
+    def test_generate_float_reductions_in_order(self):
+        cpp_code = generate_cpp(ast.parse("""
+def kernel(xs: list[float], ns: list[int]) -> float:
+    total = 0.0
+    for x in xs:
+        total += x
+    count = 0
+    for n in ns:
+        count += n
+    return total + sum(xs) + count
+"""))
+        self.assertIn("for (double x : xs) {", cpp_code)
+        self.assertIn("std::accumulate(xs.begin(), xs.end(), double{})", cpp_code)
+        self.assertIn("count = std::reduce(std::execution::par_unseq, ns.begin(), ns.end(), count);", cpp_code)
+
+    def test_generate_bool_comprehension_sequentially(self):
+        cpp_code = generate_cpp(ast.parse("""
+def kernel(xs: list[int]) -> list[bool]:
+    return [x > 0 for x in xs]
+"""))
+        # std::vector<bool> shares words between items, so it is not
+        # written from several threads.
+        self.assertNotIn("std::transform", cpp_code)
+        self.assertIn("std::vector<bool> out_; out_.reserve(xs.size()); for (int64_t x : xs) { out_.emplace_back(x > 0); }",
+                      cpp_code)
+
+    def test_generate_requests_not_parallel(self):
+        cpp_code = generate_cpp(ast.parse("""
+import requests
+
+def kernel(urls: list[str]) -> int:
+    return sum(len(requests.get(u).text) for u in urls)
+"""))
+        self.assertNotIn("std::execution", cpp_code)
+        self.assertIn("for (const auto& u : urls) { acc_ += static_cast<int64_t>(requests::get(u).text.size()); }",
+                      cpp_code)
+
+    def test_generate_sequential_loops(self):
+        source = """
+def kernel(n: int) -> list[int]:
+    return [i * i for i in range(n) if i % 3 == 0]
+"""
+        expected = "[&] { std::vector<int64_t> out_; out_.reserve(std::max<int64_t>(n, 0)); for (int64_t i = 0; i < n; ++i) { if (pyops::mod(i, 3) == 0) { out_.emplace_back(i * i); } } return out_; }()"
+        for parallel in (True, False):
+            self.assertIn(expected, generate_cpp(ast.parse(source), parallel=parallel))
+        cpp_code = generate_cpp(ast.parse("""
+def kernel(xs: list[int]) -> int:
+    return sum(xs) + sum([x for x in xs])
+"""), parallel=False)
+        self.assertNotIn("std::execution", cpp_code)
+        self.assertIn("std::accumulate(xs.begin(), xs.end(), int64_t{}) + [&] { int64_t acc_{}; for (int64_t x : xs) { acc_ += x; } return acc_; }()", cpp_code)
+
+    def test_generate_reductions_match_python(self):
+        cpp_code = generate_cpp(ast.parse("""
+def kernel(flags: list[bool], names: list[str], xs: list[int]) -> int:
+    shout = [s + "!" for s in names]
+    ok = any(names) and all(names)
+    return sum(flags) + sum(f for f in flags) + sum(x % 7 for x in xs) + len(shout)
+"""))
+        self.assertIn("std::reduce(std::execution::par_unseq, flags.begin(), flags.end(), int64_t{})", cpp_code)
+        self.assertIn("std::transform_reduce(std::execution::par_unseq, flags.begin(), flags.end(), int64_t{}, "
+                      "std::plus<>(), [&](bool f) { return f; })", cpp_code)
+        self.assertIn("[&](int64_t x) { return pyops::mod(x, 7); }", cpp_code)
+        self.assertIn("std::any_of(std::execution::par, names.begin(), names.end(), "
+                      "[](const auto& v) { return !v.empty(); })", cpp_code)
+        # Building strings allocates, which `par_unseq` does not allow.
+        self.assertIn("std::transform(std::execution::par, names.begin()", cpp_code)
+
+    def test_match_request_loop(self):
+        loop = ast.parse("for u in users:\n    r = requests.get(base + u)\n    total += len(r.text)\n").body[0]
+        self.assertEqual(match_request_loop(loop)[0].targets[0].id, "r")
+        for body in ("    r = requests.get(u)\n    break\n",
+                     "    r = requests.get(base)\n    base = r.text\n",
+                     # Other side effects would move after every GET.
+                     "    r = requests.get(u)\n    requests.post(log, data=r.text)\n",
+                     "    r = requests.get(u)\n    print(r.text)\n",
+                     # Growing the list would read past the prefetched batch.
+                     "    r = requests.get(u)\n    users.append(r.text)\n",
+                     "    r = requests.get(u)\n    users[0] = r.text\n"):
+            self.assertIsNone(match_request_loop(ast.parse("for u in users:\n" + body).body[0]))
+
+    def test_generate_batched_requests(self):
+        cpp_code = generate_cpp(ast.parse("""
+def fetch(users: list[str], token: str) -> int:
+    docs = [requests.get(f"https://api.github.com/users/{u}", timeout=5).json() for u in users]
+    ok = 0
+    for u in users:
+        r = requests.get(u, headers={"Authorization": token}, params={"page": 1})
+        ok += r.status_code
+    return ok + len(docs)
+"""))
+        self.assertIn('std::vector<nlohmann::json> docs = requests::json_all(requests::map_get(users, [&](const auto& u) { return "https://api.github.com/users/" + u; }, requests::Timeout(5)));', cpp_code)
+        self.assertIn('auto r_batch = requests::map_get(users, [&](const auto& u) { return u; }, requests::Headers{{"Authorization", token}}, requests::Params{{"page", std::to_string(1)}});', cpp_code)
+        self.assertIn("r = std::move(r_batch[r_index++]);", cpp_code)
+
+    def test_generate_request_loop_with_side_effects(self):
+        cpp_code = generate_cpp(ast.parse("""
+def sync(users: list[str], log: str) -> int:
+    ok = 0
+    for u in users:
+        r = requests.get(u)
+        requests.post(log, data=r.text)
+        ok += r.status_code
+    return ok
+"""))
+        self.assertNotIn("map_get", cpp_code)
+        self.assertIn("        r = requests::get(u);\n        requests::post(log, requests::Body{r.text});", cpp_code)
+
+if __name__ == "__main__":
+    unittest.main()
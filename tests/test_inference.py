@@ -0,0 +1,136 @@
+# test_inference.py
+import ast
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from src.accelerate import INCLUDE_DIRS, compiler
+from src.generator import generate_cpp
+from src.inference import DYNAMIC, FLOAT, INT, STR, infer_module, list_of
+
+class TestInference(unittest.TestCase):
+    def test_infer_locals_and_returns(self):
+        source = """
+def mean(xs: list[float]):
+    total = 0
+    for x in xs:
+        total += x
+    return total / len(xs)
+
+def words(text: str):
+    found = []
+    for word in text.split():
+        found.append(word.upper())
+    return found
+"""
+        types = infer_module(ast.parse(source))
+        mean = types.functions["mean"]
+        self.assertEqual(mean.locals["total"], FLOAT)
+        self.assertEqual(mean.returns, FLOAT)
+        self.assertEqual(types.functions["words"].returns, list_of(STR))
+        self.assertEqual(types.fallbacks, [])
+        cpp_code = generate_cpp(ast.parse(source))
+        self.assertIn("for (const auto& word : pyops::split(text)) {", cpp_code)
+        self.assertIn("found.push_back(pyops::upper(word));", cpp_code)
+        if shutil.which(compiler()[0]):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "words.cpp")
+                with open(path, "w") as f:
+                    f.write(cpp_code)
+                result = subprocess.run(compiler() + ["-std=c++17", "-fsyntax-only"]
+                                        + [f"-I{d}" for d in INCLUDE_DIRS] + [path],
+                                        capture_output=True, text=True)
+                self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_infer_parameters_from_call_sites(self):
+        types = infer_module(ast.parse("""
+def scale(value, factor):
+    return value * factor
+
+def run() -> float:
+    return scale(3, 2.5)
+"""))
+        scale = types.functions["scale"]
+        self.assertEqual(scale.params, {"value": INT, "factor": FLOAT})
+        self.assertEqual(scale.returns, FLOAT)
+
+    def test_comprehension_scope(self):
+        source = """
+def f(xs: list[int]) -> int:
+    x = "abc"
+    ys = [x * 2 for x in xs]
+    return len(x) + len(ys)
+"""
+        types = infer_module(ast.parse(source))
+        f = types.functions["f"]
+        self.assertEqual(f.locals["x"], STR)
+        self.assertEqual(f.locals["ys"], list_of(INT))
+        self.assertEqual(types.fallbacks, [])
+        cpp_code = generate_cpp(ast.parse(source))
+        self.assertIn("std::string x = \"abc\";", cpp_code)
+        self.assertIn("[&](int64_t x) { return x * 2; }", cpp_code)
+
+    def test_report_fallbacks(self):
+        types = infer_module(ast.parse("""
+def orphan(value):
+    result = value
+    result = "text"
+    return result
+
+def mixed(flag: bool):
+    result = 1
+    if flag:
+        result = "text"
+    return result
+"""))
+        self.assertEqual(types.functions["orphan"].params["value"], DYNAMIC)
+        self.assertEqual(types.functions["orphan"].returns, DYNAMIC)
+        self.assertEqual([(line, name) for line, _, name, _ in types.fallbacks],
+                         [(2, "value"), (8, "result")])
+        types = infer_module(ast.parse("""
+def label(name: str) -> str:
+    return "<{}>".format(name).strip()
+
+def dump(xs: list[int]) -> str:
+    return json.dumps(xs, indent="\\t")
+"""))
+        self.assertEqual(types.fallbacks,
+                         [(3, "label", "str.format()", "method has no C++ lowering for this call"),
+                          (6, "dump", "json.dumps()", "options have no C++ lowering; using the defaults")])
+
+    def test_generate_native_types(self):
+        cpp_code = generate_cpp(ast.parse("""
+def stats(xs: list[int], flag: bool) -> float:
+    count = 0
+    if flag:
+        biggest = 0
+        for x in xs:
+            count += 1
+            biggest = x
+    ratio = count / len(xs)
+    counts: dict[str, int] = {}
+    return ratio
+"""))
+        self.assertEqual(cpp_code, """#include <cstdint>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+double stats(const std::vector<int64_t>& xs, bool flag) {
+    int64_t biggest{};
+    int64_t count = 0;
+    if (flag) {
+        biggest = 0;
+        for (int64_t x : xs) {
+            count += 1;
+            biggest = x;
+        }
+    }
+    double ratio = static_cast<double>(count) / static_cast<int64_t>(xs.size());
+    std::unordered_map<std::string, int64_t> counts = {};
+    return ratio;
+}""")
+
+if __name__ == "__main__":
+    unittest.main()
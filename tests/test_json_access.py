@@ -0,0 +1,199 @@
+# test_json_access.py
+import ast
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from src.accelerate import INCLUDE_DIRS, compiler
+from src.generator import generate_cpp
+from src.inference import FLOAT, INT, STR, infer_module
+from src.json_access import JsonAccess
+
+def selections(source):
+    tree = ast.parse(source)
+    function = tree.body[-1]
+    info = infer_module(tree).functions[function.name]
+    return list(JsonAccess(function, {**info.params, **info.locals}).selections.values())
+
+class TestJsonAccess(unittest.TestCase):
+    def test_constant_paths(self):
+        self.assertEqual(selections("""
+import json
+
+def f(text: str) -> int:
+    doc = json.loads(text)
+    name: str = doc["user"]["name"]
+    total = 0
+    for item in doc["items"]:
+        total += item["price"] * 2
+    return total + len(name) + len([tag["id"] for tag in doc["tags"]])
+"""), [["/items/*/price", "/tags/*/id", "/user/name"]])
+
+    def test_exact_index_keeps_every_path(self):
+        self.assertEqual(selections("""
+import json
+
+def f(text: str) -> int:
+    rows = json.loads(text)
+    first: int = rows[0]["b"]
+    for row in rows:
+        first += row["a"]
+    return first
+"""), [["/*/a", "/0/a", "/0/b"]])
+
+    def test_dynamic_access_keeps_subtree(self):
+        self.assertEqual(selections("""
+import json
+
+def f(text: str, key: str) -> int:
+    doc = json.loads(text)
+    n: int = doc["counts"][key]
+    return n + len(doc["names"])
+"""), [["/counts", "/names"]])
+        self.assertEqual(selections("""
+import requests
+
+def f(url: str) -> dict:
+    response = requests.get(url)
+    return response.json()
+"""), [])
+
+    def test_generate_selected_parse(self):
+        cpp_code = generate_cpp(ast.parse("""
+import requests
+
+def login(url: str) -> str:
+    data = requests.get(url).json()
+    return data["user"]["login"] + data["user"]["name"]
+"""))
+        self.assertIn('#include "json_select.hpp"', cpp_code)
+        self.assertIn('static const json_select::Selection login_selection0_{"/user/login", "/user/name"};\n'
+                      "std::string login(const std::string& url) {", cpp_code)
+        self.assertIn("nlohmann::json data = json_select::parse(requests::get(url).text, login_selection0_);",
+                      cpp_code)
+
+    def test_records(self):
+        tree = ast.parse("""
+import json
+
+def f(text: str) -> float:
+    doc: dict = json.loads(text)
+    n: int = doc["stats"]["count"]
+    name: str = doc["name"]
+    return doc["items"][0]["price"]
+
+def g(text: str) -> int:
+    doc = json.loads(text)
+    n: int = doc["a"]
+    doc = json.loads(text)
+    return n
+
+def h(text: str) -> int:
+    return json.loads(text)["a"] + 1
+
+def pick(text: str, flag: bool) -> int:
+    data = json.loads(text)
+    if flag:
+        return data["a"]
+    return 0
+
+def late(text: str, flag: bool) -> int:
+    data = json.loads(text)
+    a: int = data["a"]
+    if flag:
+        return a
+    b: int = data["b"]
+    return a + b
+
+def branch(text: str, flag: bool) -> int:
+    if flag:
+        data = json.loads(text)
+        a: int = data["a"]
+        return a
+    return json.loads(text)["b"]
+""")
+        types = infer_module(tree)
+        records = []
+        for function in tree.body[1:]:
+            info = types.functions[function.name]
+            access = JsonAccess(function, {**info.params, **info.locals}, info.returns)
+            records.append(list(access.records.values()))
+        record, = records[0]
+        self.assertEqual(record.name, "doc")
+        self.assertEqual(record.fields, [(("items", "0", "price"), FLOAT), (("name",), STR),
+                                         (("stats", "count"), INT)])
+        self.assertEqual(sorted(record.leaves.values()), [0, 1, 2])
+        # Rebinding the document, or reading a value as anything but a
+        # scalar of known type, keeps the JSON DOM.
+        self.assertEqual(records[1:3], [[], []])
+        # So does a read that may not run, which must not fail the parse
+        # when its value is missing.
+        self.assertEqual(records[3:5], [[], []])
+        self.assertEqual([[r.fields for r in rs] for rs in records[5:]], [[[(("a",), INT)], [(("b",), INT)]]])
+
+    @unittest.skipUnless(shutil.which(compiler()[0]), "no C++ compiler")
+    def test_conditional_read_of_missing_value(self):
+        cpp_code = generate_cpp(ast.parse("""
+import json
+
+def pick(text: str, flag: bool) -> int:
+    data = json.loads(text)
+    if flag:
+        return data["a"]
+    return 0
+"""))
+        self.assertNotIn("json_select::extract", cpp_code)
+        with tempfile.TemporaryDirectory() as tmp:
+            main = os.path.join(tmp, "main.cpp")
+            with open(main, "w") as f:
+                f.write(cpp_code)
+                f.write('\n#include <iostream>\nint main() {\n'
+                        '    std::cout << pick("{}", false) << " " << pick("{\\"a\\": 5}", true) << "\\n";\n}\n')
+            executable = os.path.join(tmp, "main")
+            build = subprocess.run(compiler() + ["-std=c++17", main, "-o", executable]
+                                   + [f"-I{d}" for d in INCLUDE_DIRS], capture_output=True, text=True)
+            self.assertEqual(build.returncode, 0, build.stderr)
+            output = subprocess.run([executable], capture_output=True, text=True)
+        self.assertEqual(output.stdout, "0 5\n", output.stderr)
+
+    def test_generate_record(self):
+        cpp_code = generate_cpp(ast.parse("""
+import json
+
+def f(text: str) -> float:
+    doc: dict = json.loads(text)
+    n: int = doc["stats"]["count"]
+    price: float = json.loads(text)["items"][0]["price"]
+    return price * n
+"""))
+        self.assertIn("""struct f_record0_ {
+    int64_t stats_count_;
+};
+static const json_select::Fields<f_record0_> f_fields0_{&f_record0_::stats_count_};
+static const json_select::Selection f_selection0_{"/stats/count"};
+struct f_record1_ {
+    double items_0_price_;
+};
+""", cpp_code)
+        self.assertIn("f_record0_ doc = json_select::extract(text, f_selection0_, f_fields0_);", cpp_code)
+        self.assertIn("int64_t n = doc.stats_count_;", cpp_code)
+        self.assertIn("double price = json_select::extract(text, f_selection1_, f_fields1_).items_0_price_;",
+                      cpp_code)
+
+    def test_generate_receiver_with_json_in_url(self):
+        cpp_code = generate_cpp(ast.parse("""
+import requests
+
+def fetch(n: int) -> str:
+    doc = requests.get("http://x/a.json").json()
+    data = requests.get("http://x/b.json").json()
+    print(data)
+    return doc["name"]
+"""))
+        self.assertIn('json_select::extract(requests::get("http://x/a.json").text, fetch_selection0_, '
+                      'fetch_fields0_)', cpp_code)
+        self.assertIn('nlohmann::json::parse(requests::get("http://x/b.json").text)', cpp_code)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+# test_requests.py
+import http.server
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from src.accelerate import INCLUDE_DIRS, ROOT, compiler
+
+CPR_INCLUDE = os.path.join(ROOT, "third_party", "cpr", "include")
+BUILD_FLAGS = ["-std=c++17", "-O1"] + [f"-I{d}" for d in INCLUDE_DIRS + [CPR_INCLUDE]]
+LINK_FLAGS = ["-lcpr", "-lpthread"]
+
+CLIENT = """
+#include <iostream>
+#include <string>
+#include <vector>
+#include "requests.hpp"
+
+int main(int argc, char** argv) {
+    std::string base = argv[1];
+    std::vector<int> ids;
+    for (int i = 0; i < 12; ++i) {
+        ids.push_back(i);
+    }
+    requests::set_max_concurrency(3);
+    auto responses = requests::map_get(ids, [&](int i) { return base + "/item/" + std::to_string(i); });
+    for (const auto& response : responses) {
+        std::cout << response.status_code << " " << response.text << "\\n";
+    }
+    for (int i = 0; i < 4; ++i) {
+        std::cout << requests::get(base + "/again").text << "\\n";
+    }
+}
+"""
+
+
+def build(source, output):
+    with open(output + ".cpp", "w") as f:
+        f.write(source)
+    command = compiler() + BUILD_FLAGS + [output + ".cpp", "-o", output] + LINK_FLAGS
+    return subprocess.run(command, capture_output=True, text=True)
+
+
+def has_cpr():
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            probe = "#include <cpr/cpr.h>\nint main() { cpr::Session session; }\n"
+            return build(probe, os.path.join(tmp, "probe")).returncode == 0
+    except OSError:
+        return False
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """
+    Answers every GET with its path after a short delay, recording the
+    largest number of requests in flight and the client port of each path.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.ports = {}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.ports.setdefault(self.path, set()).add(self.client_address[1])
+        time.sleep(0.05)
+        with server.lock:
+            server.active -= 1
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipUnless(has_cpr(), "cpr is not available")
+class TestRequests(unittest.TestCase):
+    def test_get_many_against_local_server(self):
+        server = Server()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                executable = os.path.join(tmp, "client")
+                result = build(CLIENT, executable)
+                self.assertEqual(result.returncode, 0, result.stderr)
+                base = f"http://127.0.0.1:{server.server_address[1]}"
+                output = subprocess.run([executable, base], capture_output=True, text=True, timeout=60)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(output.returncode, 0, output.stderr)
+        lines = output.stdout.splitlines()
+        # Responses come back in the order of the items, whatever order
+        # they completed in.
+        self.assertEqual(lines[:12], [f"200 /item/{i}" for i in range(12)])
+        self.assertEqual(lines[12:], ["/again"] * 4)
+        self.assertGreater(server.max_active, 1)
+        self.assertLessEqual(server.max_active, 3)
+        # Consecutive requests to one host reuse a pooled connection.
+        self.assertEqual(len(server.ports["/again"]), 1)
+
+if __name__ == "__main__":
+    unittest.main()